@@ -1,39 +1,108 @@
-import os
 import json
 import asyncio
 from typing import Optional, List, Dict, Any
 from contextlib import AsyncExitStack, asynccontextmanager
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 from dotenv import load_dotenv
-from openai import OpenAI
+from .llm_client import chat_completion
+from .context_budget import ContextBudget, tool_result_text
+from .replay import ReplaySession, replay_mode
+from lightrag.tracing import span
 import gc
 
 
 class BaseClient:
-    def __init__(self):
+    def __init__(self, max_turns: int = 8):
+        if max_turns < 1:
+            raise ValueError(f"max_turns must be at least 1, got {max_turns}")
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
         self.model: str = "deepseek-v3-250324"
-        self.client = OpenAI(
-            api_key=os.getenv("API_KEY"), base_url=os.getenv("BASE_URL")
-        )
+        self.provider: str = "default"
+        # 转换为 function calling 格式的工具列表, 服务端通知工具变化时失效
+        self._tools: Optional[List[Dict[str, Any]]] = None
+        # 工具调用的最大轮数, 以及工具结果和整个对话的 token 上限
+        self.max_turns: int = max_turns
+        self.context_budget = ContextBudget()
 
     async def connect_to_server(
         self, command: str, args: List[str], env: Optional[Dict[str, str]] = None
     ) -> None:
         """Connect to the MCP server via stdio protocol."""
+        mode = replay_mode()
+        if mode == "replay":
+            # 回放时不启动 MCP 服务, 工具结果全部来自录制文件
+            self.session = ReplaySession()
+            self._tools = None
+            await self.get_tools()
+            return
+
         server_params = StdioServerParameters(command=command, args=args, env=env)
         stdio_reader, stdio_writer = await self.exit_stack.enter_async_context(
             stdio_client(server_params)
         )
         self.session = await self.exit_stack.enter_async_context(
-            ClientSession(stdio_reader, stdio_writer)
+            ClientSession(
+                stdio_reader, stdio_writer, message_handler=self._handle_message
+            )
         )
 
         await self.session.initialize()
-        tools = await self.session.list_tools()
-        print("🛠️  Available tools:", [tool.name for tool in tools.tools])
+        if mode == "record":
+            self.session = ReplaySession(self.session)
+        self._tools = None
+        tools = await self.get_tools()
+        print("🛠️  Available tools:", [tool["function"]["name"] for tool in tools])
+
+    async def _handle_message(self, message) -> None:
+        """处理服务端消息, 工具列表变化时清除缓存"""
+        notification = getattr(message, "root", message)
+        if isinstance(notification, types.ToolListChangedNotification):
+            print("🛠️  Tool list changed, refreshing on next query")
+            self._tools = None
+
+    async def get_tools(self) -> List[Dict[str, Any]]:
+        """返回当前会话的工具列表, 每个会话只获取和转换一次"""
+        if self._tools is None:
+            tool_list_response = await self.session.list_tools()
+            self._tools = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": tool.name,
+                        "description": (tool.description or "")[:1024],
+                        "parameters": tool.inputSchema,
+                    },
+                }
+                for tool in tool_list_response.tools
+            ]
+        return self._tools
+
+    async def _call_tool(self, tool_call) -> str:
+        """调用工具并返回压缩到 token 上限以内的结果文本"""
+        tool_name = tool_call.function.name
+        tool_args = json.loads(tool_call.function.arguments)
+
+        print(f"🔧 Calling tool: {tool_name} with args: {tool_args}")
+        with span("mcp.call_tool", tool=tool_name) as tool_span:
+            tool_result = await self.session.call_tool(tool_name, tool_args)
+            content = self.context_budget.compact_result(
+                tool_result_text(tool_result.content)
+            )
+            tool_span.set_attribute(
+                "is_error", bool(getattr(tool_result, "isError", False))
+            )
+        print(f"📥 Tool result: {content}")
+        return content
+
+    @staticmethod
+    def _tool_error(tool_call, error: BaseException) -> str:
+        """把工具调用的异常转为工具结果文本, 取消等非 Exception 异常继续抛出"""
+        if not isinstance(error, Exception):
+            raise error
+        print(f"❌ Tool {tool_call.function.name} failed: {error}")
+        return f"Error: {type(error).__name__}: {error}"
 
     async def process_query(
         self, query: str, system_prompt: Optional[str] = None
@@ -49,34 +118,43 @@ class BaseClient:
             {"role": "user", "content": query},
         ]
 
-        tool_list_response = await self.session.list_tools()
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description[:1024],
-                    "parameters": tool.inputSchema,
-                },
-            }
-            for tool in tool_list_response.tools
-        ]
+        tools = await self.get_tools()
 
         try:
-            while True:
-                response = self.client.chat.completions.create(
-                    model=self.model, messages=messages, tools=tools, tool_choice="auto"
-                )
-                message = response.choices[0].message
-                print(f"📨 Assistant message: {message}")
-
-                if hasattr(message, "tool_calls") and message.tool_calls:
-                    for tool_call in message.tool_calls:
-                        tool_name = tool_call.function.name
-                        tool_args = json.loads(tool_call.function.arguments)
-
-                        print(f"🔧 Calling tool: {tool_name} with args: {tool_args}")
-                        tool_result = await self.session.call_tool(tool_name, tool_args)
+            for turn in range(self.max_turns):
+                messages = self.context_budget.trim_messages(messages)
+                # 最后一轮不再允许调用工具, 强制模型给出最终回复
+                last_turn = turn == self.max_turns - 1
+                with span(
+                    "agent.turn", agent=type(self).__name__, turn=turn + 1
+                ) as turn_span:
+                    response = await chat_completion(
+                        self.provider,
+                        model=self.model,
+                        messages=messages,
+                        tools=tools,
+                        tool_choice="none" if last_turn else "auto",
+                    )
+                    message = response.choices[0].message
+                    print(f"📨 Assistant message: {message}")
+
+                    if hasattr(message, "tool_calls") and message.tool_calls:
+                        # 同一轮中的多个工具调用并发执行, 结果按原顺序追加
+                        # 单个工具调用失败时把错误作为该工具的结果返回给模型
+                        tool_calls = message.tool_calls
+                        turn_span.set_attribute(
+                            "tool_calls", [tc.function.name for tc in tool_calls]
+                        )
+                        tool_results = await asyncio.gather(
+                            *(self._call_tool(tool_call) for tool_call in tool_calls),
+                            return_exceptions=True,
+                        )
+                        tool_results = [
+                            self._tool_error(tool_call, result)
+                            if isinstance(result, BaseException)
+                            else result
+                            for tool_call, result in zip(tool_calls, tool_results)
+                        ]
 
                         messages.append(
                             {
@@ -87,28 +165,31 @@ class BaseClient:
                                         "id": tool_call.id,
                                         "type": "function",
                                         "function": {
-                                            "name": tool_name,
+                                            "name": tool_call.function.name,
                                             "arguments": tool_call.function.arguments,
                                         },
                                     }
+                                    for tool_call in tool_calls
                                 ],
                             }
                         )
-                        messages.append(
-                            {
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": str(tool_result.content),
-                            }
-                        )
-
-                        print(f"📥 Tool result: {tool_result.content}")
-
-                    # 回到循环顶部，继续 process 新的 messages（包含 tool result）
-                    continue
-
-                # 如果没有 tool_call，说明模型已经生成最终文本回复
-                return message.content or ""
+                        for tool_call, tool_result in zip(tool_calls, tool_results):
+                            messages.append(
+                                {
+                                    "role": "tool",
+                                    "tool_call_id": tool_call.id,
+                                    "content": tool_result,
+                                }
+                            )
+
+                        # 回到循环顶部，继续 process 新的 messages（包含 tool result）
+                        continue
+
+                    # 如果没有 tool_call，说明模型已经生成最终文本回复
+                    return message.content or ""
+
+            print("⚠️ Reached the tool call turn limit without a final answer")
+            return message.content or ""
 
         except Exception as e:
             print(f"❌ API call error: {e}")
@@ -1,5 +1,6 @@
 from typing import Dict, List, Any, Tuple
 from .BaseAgent import *
+from lightrag.tracing import current_span, traced
 import re
 import os
 
@@ -23,7 +24,8 @@ def parse_response(response: str):
 
 
 class CheckAgent(BaseClient):
-    async def run(self, description: str, sql: str):
+    @traced("check_agent.run")
+    async def run(self, description: str, sql: str, schema: str = None):
         system_prompt = f"""
         您是一个 SQL 语句检查器。您的任务是使用 MCP Server 中的工具执行给定的 SQL 语句，获取查询结果，并将其与原始任务描述进行比较，以判断 SQL 是否正确。您不得修改或重写给定的 SQL 语句，即使您认为它可能有错误。
 
@@ -92,6 +94,12 @@ class CheckAgent(BaseClient):
         Task Description: {description}
         SQL Query: {sql}
         """
+        if schema:
+            # 已知数据库结构时无需再调用 all_table_names / schema_definitions
+            base_query += f"""
+        Database Schema (already known, do not call all_table_names, filter_table_names or schema_definitions unless a table is missing here):
+        {schema}
+        """
 
         response = await self.process_query(base_query, system_prompt=system_prompt)
         result, is_match, check_completed, adjustment = parse_response(response)
@@ -100,6 +108,7 @@ class CheckAgent(BaseClient):
         )
 
         if check_completed:
+            current_span().set_attributes(match=is_match, check_completed=True)
             return result, is_match, check_completed, adjustment
 
         # Now retry with adjustments if available
@@ -124,6 +133,9 @@ class CheckAgent(BaseClient):
                 f"Attempt {attempt}: Result: {result}, Match: {is_match}, Check completed: {check_completed}, Adjustment: {adjustment}"
             )
 
+        current_span().set_attributes(
+            match=is_match, check_completed=check_completed, retries=attempt
+        )
         return result, is_match, check_completed, adjustment
 
 
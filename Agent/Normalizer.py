@@ -1,8 +1,11 @@
 import os
-from openai import OpenAI
+import json
+import re
 from dotenv import load_dotenv
+from .llm_client import chat_completion
+from lightrag.tracing import traced
 
-SYSTEM_PROMPT = {"Rewriter": {}}
+SYSTEM_PROMPT = {"Rewriter": {}, "RewriterKeywords": {}}
 
 SYSTEM_PROMPT["Rewriter"][
     "cn"
@@ -62,22 +65,72 @@ Note:
 Do not add or infer any information not present in the user's input. Your role is strictly to rephrase the input into a standardized, imperative statement.
 """
 
+SYSTEM_PROMPT["RewriterKeywords"]["cn"] = (
+    SYSTEM_PROMPT["Rewriter"]["cn"]
+    + """
+同时, 请从规范化后的陈述句中提取用于知识库检索的关键词:
+    高层关键词 (high_level_keywords): 查询涉及的整体概念或主题, 例如 “用户消费统计”、“订单分析”。
+    低层关键词 (low_level_keywords): 具体的实体、字段、取值或细节, 例如 “市场部门”、“手机号”、“2020年”。
+
+输出格式：
+仅输出一个 JSON 对象, 不要添加任何其他内容:
+{"normalized_query": "<规范化后的陈述句>", "high_level_keywords": ["..."], "low_level_keywords": ["..."]}
+"""
+)
+
+SYSTEM_PROMPT["RewriterKeywords"]["en"] = (
+    SYSTEM_PROMPT["Rewriter"]["en"]
+    + """
+In addition, extract keywords from the normalized statement for knowledge base retrieval:
+    High-level keywords (high_level_keywords): overarching concepts or themes of the query, e.g. "customer spending", "order analysis".
+    Low-level keywords (low_level_keywords): specific entities, fields, values or details, e.g. "marketing department", "phone number", "2020".
+
+Output Format:
+Output a single JSON object only, without any other content:
+{"normalized_query": "<the normalized statement>", "high_level_keywords": ["..."], "low_level_keywords": ["..."]}
+"""
+)
+
+
+# 模型有时会把 JSON 包在 ``` 或 ```json 代码块中
+CODE_FENCE_PATTERN = re.compile(
+    r"```(?:json)?\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE
+)
+
+
+def _parse_json_object(content: str):
+    """解析模型返回的 JSON 对象, 去掉代码块标记; 无法解析时返回 None"""
+    match = CODE_FENCE_PATTERN.search(content)
+    if match:
+        content = match.group(1)
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _keyword_list(value) -> list:
+    if not isinstance(value, list):
+        return []
+    return [str(keyword).strip() for keyword in value if str(keyword).strip()]
+
 
 class Normalizer:
 
     def __init__(
         self,
         model: str = "gpt-4o-mini",
+        provider: str = "default",
     ):
-        api_key = os.getenv("API_KEY")
-        base_url = os.getenv("BASE_URL")
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.provider = provider
 
         self.language = os.getenv("LANGUAGE", "en")
 
         self.model = model
 
-    def normalize(self, query: str) -> str:
+    @traced("normalizer.normalize")
+    async def normalize(self, query: str) -> str:
         """
         将用户输入转化为标准的陈述句
 
@@ -93,7 +146,8 @@ class Normalizer:
             f"Rewrite the following sentence into a standard statement: {query}"
         )
 
-        completion = self.client.chat.completions.create(
+        completion = await chat_completion(
+            self.provider,
             model=self.model,
             messages=[
                 {
@@ -109,3 +163,61 @@ class Normalizer:
 
         normalized_query = completion.choices[0].message.content.strip()
         return normalized_query
+
+    @traced("normalizer.normalize_with_keywords")
+    async def normalize_with_keywords(self, query: str) -> dict:
+        """
+        在一次 LLM 调用中完成规范化和检索关键词提取,
+        关键词可直接传给 QueryParam, 省去 LightRAG 自己的关键词提取调用
+
+        args:
+            query (str): 用户输入的原始语句
+
+        return:
+            dict: normalized_query, high_level_keywords, low_level_keywords;
+                  返回内容无法解析时改用 normalize() 规范化 (再失败则使用原始查询),
+                  关键词为空列表, 由 LightRAG 自行提取
+        """
+
+        system_prompt = SYSTEM_PROMPT["RewriterKeywords"][self.language]
+        user_prompt = (
+            f"Rewrite the following sentence into a standard statement "
+            f"and extract its keywords: {query}"
+        )
+
+        completion = await chat_completion(
+            self.provider,
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt,
+                },
+                {
+                    "role": "user",
+                    "content": user_prompt,
+                },
+            ],
+            response_format={"type": "json_object"},
+        )
+
+        data = _parse_json_object(completion.choices[0].message.content.strip())
+        if data is None or not str(data.get("normalized_query") or "").strip():
+            # 不把无法解析的原始输出当作查询传给检索和任务拆分
+            print("规范化结果无法解析, 改用单独的规范化调用")
+            try:
+                normalized_query = await self.normalize(query) or query
+            except Exception as e:
+                print(f"规范化失败, 使用原始查询: {str(e)}")
+                normalized_query = query
+            return {
+                "normalized_query": normalized_query,
+                "high_level_keywords": [],
+                "low_level_keywords": [],
+            }
+
+        return {
+            "normalized_query": str(data["normalized_query"]).strip(),
+            "high_level_keywords": _keyword_list(data.get("high_level_keywords")),
+            "low_level_keywords": _keyword_list(data.get("low_level_keywords")),
+        }
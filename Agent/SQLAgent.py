@@ -1,6 +1,10 @@
 import os
 import json
+import asyncio
+from dotenv import load_dotenv
 from .BaseAgent import *
+from .llm_client import chat_completion
+from lightrag.tracing import current_span, traced
 
 
 SYSTEM_PROMPT = {"SQLAgent_generate": {}, "SQLAgent_adjust": {}}
@@ -61,6 +65,22 @@ Context Information: {info}
 Output Requirement: Return only the pure SQL statement, without any comments, explanations, or formatting.
 """
 
+USER_PROMPT["SQLAgent_generate_multi"][
+    "en"
+] = """
+These tasks have already been completed: {prev_description}
+Their SQL statements are: {prev_sqls}
+Referring to the completed tasks and SQL statements, please generate an SQL query for the following task:
+Task Description: {description}
+Context Information: {info}
+Output Requirement: Return only the pure SQL statement, without any comments, explanations, or formatting.
+"""
+
+SCHEMA_PROMPT = {
+    "cn": "数据库结构：\n{schema}\n\n检索到的上下文：\n{context}",
+    "en": "Database Schema:\n{schema}\n\nRetrieved Context:\n{context}",
+}
+
 USER_PROMPT["SQLAgent_adjust"][
     "cn"
 ] = """
@@ -82,24 +102,36 @@ Output Requirement: Return only the modified pure SQL statement, without any com
 class SQLAgent:
     def __init__(self):
 
-        self.client = OpenAI(
-            api_key=os.getenv("API_KEY"),
-            base_url=os.getenv("BASE_URL"),
-        )
+        self.provider = "default"
         self.model = "deepseek-v3-250324"
 
         self.language = os.getenv("LANGUAGE", "en")
 
-    def generate_sql(self, descriptions: list, prev_sqls: list, index: int, context) -> str:
+    @traced("sql_agent.generate_sql")
+    async def generate_sql(
+        self,
+        descriptions: list,
+        prev_sqls: list,
+        index: int,
+        context,
+        schema=None,
+        temperature: float = None,
+    ) -> str:
         """
         function:
             Receive a string containing a task description and generate the corresponding SQL;
         args:
             description: query like "Query the mailbox of the user named 'yqxv2'."
+            schema: optional slice of the real database schema relevant to the task
+            temperature: sampling temperature, the provider default when None
         return:
             str: SQL
         """
         system_prompt = SYSTEM_PROMPT["SQLAgent_generate"][self.language]
+        if schema:
+            context = SCHEMA_PROMPT[self.language].format(
+                schema=schema, context=context
+            )
 
         if index == 0:
             user_message = USER_PROMPT["SQLAgent_generate"][self.language].format(
@@ -114,7 +146,8 @@ class SQLAgent:
                 info=context,
             )
 
-        response = self.client.chat.completions.create(
+        response = await chat_completion(
+            self.provider,
             model=self.model,
             messages=[
                 {
@@ -126,6 +159,7 @@ class SQLAgent:
                     "content": user_message,
                 },
             ],
+            **({"temperature": temperature} if temperature is not None else {}),
         )
 
         sql = response.choices[0].message.content.strip()
@@ -136,7 +170,52 @@ class SQLAgent:
         print(sql)
         return sql
 
-    def adjust_sql(self, sql: str, feedback: str) -> str:
+    @traced("sql_agent.generate_candidates")
+    async def generate_candidates(
+        self,
+        descriptions: list,
+        prev_sqls: list,
+        index: int,
+        context,
+        schema=None,
+        k: int = 3,
+    ) -> list:
+        """
+        function:
+            Generate up to k different SQL candidates for the same task in parallel.
+            The first one uses the default temperature, the others are sampled
+            with increasing temperatures; duplicates are removed.
+        return:
+            list: SQL candidates, in generation order
+        """
+        temperatures = [None] + [0.5 + 0.5 * i / max(k - 2, 1) for i in range(k - 1)]
+        results = await asyncio.gather(
+            *(
+                self.generate_sql(
+                    descriptions, prev_sqls, index, context, schema, temperature
+                )
+                for temperature in temperatures
+            ),
+            return_exceptions=True,
+        )
+
+        candidates, seen = [], set()
+        for sql in results:
+            # CancelledError 不是 Exception 的子类, 同样按生成失败处理
+            if isinstance(sql, BaseException):
+                print(f"生成候选 SQL 失败: {str(sql) or type(sql).__name__}")
+                continue
+            key = " ".join(sql.split()).rstrip(";").lower()
+            if key not in seen:
+                seen.add(key)
+                candidates.append(sql)
+        if not candidates:
+            raise results[0]
+        current_span().set_attributes(requested=k, candidates=len(candidates))
+        return candidates
+
+    @traced("sql_agent.adjust_sql")
+    async def adjust_sql(self, sql: str, feedback: str) -> str:
         """
         args:
             sql: "SELECT * FROM users WHERE username = 'yqxv2'"
@@ -151,7 +230,8 @@ class SQLAgent:
             feedback=feedback,
         )
 
-        response = self.client.chat.completions.create(
+        response = await chat_completion(
+            self.provider,
             model=self.model,
             messages=[
                 {
@@ -176,11 +256,21 @@ class SQLAgent:
 
 
 if __name__ == "__main__":
-    sql = SQLAgent()
+    load_dotenv()
+
+    async def main():
+        sql = SQLAgent()
 
-    sql.generate_sql(description="查询用户yqxv2的邮箱", context="数据库中的用户表名为user")
+        await sql.generate_sql(
+            descriptions=["查询用户yqxv2的邮箱"],
+            prev_sqls=[],
+            index=0,
+            context="数据库中的用户表名为user",
+        )
+
+        await sql.adjust_sql(
+            sql="SELECT * FROM users WHERE username = 'yqxv2'",
+            feedback="table users not in database.Maybe its name is user?",
+        )
 
-    sql.adjust_sql(
-        sql="SELECT * FROM users WHERE username = 'yqxv2'",
-        suggestions="table users not in database.Maybe its name is user?",
-    )
+    asyncio.run(main())
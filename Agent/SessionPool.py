@@ -0,0 +1,164 @@
+import asyncio
+from typing import Optional, List, Dict, Type
+from contextlib import asynccontextmanager
+from .BaseAgent import BaseClient
+
+
+class _PooledServer:
+    """一个常驻的 MCP stdio 服务及其所属的客户端"""
+
+    def __init__(self, client: BaseClient):
+        self.client = client
+        self.stop_event = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class MCPSessionPool:
+    """
+    MCP 会话池: 启动时一次性拉起 N 个 stdio 服务, 之后按需租借给并发的检查任务。
+
+    每个服务都在自己的后台 task 中打开和关闭, 因为 stdio_client 的 cancel scope
+    必须在同一个 task 内进入和退出。
+    """
+
+    def __init__(
+        self,
+        command: str,
+        args: List[str],
+        env: Optional[Dict[str, str]] = None,
+        size: int = 2,
+        client_cls: Type[BaseClient] = BaseClient,
+        health_check_timeout: float = 5.0,
+    ):
+        if size < 1:
+            raise ValueError("MCP session pool size must be at least 1")
+
+        self.command = command
+        self.args = args
+        self.env = env
+        self.size = size
+        self.client_cls = client_cls
+        self.health_check_timeout = health_check_timeout
+
+        self._idle: Optional[asyncio.Queue] = None
+        self._servers: List[_PooledServer] = []
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        """并发启动所有 MCP 服务, 重复调用无副作用"""
+        async with self._start_lock:
+            if self._started:
+                return
+
+            self._idle = asyncio.Queue()
+            results = await asyncio.gather(
+                *(self._spawn() for _ in range(self.size)), return_exceptions=True
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                await self._shutdown_servers()
+                raise RuntimeError(
+                    f"Failed to start MCP session pool: {errors[0]}"
+                ) from errors[0]
+
+            for server in results:
+                self._idle.put_nowait(server)
+            self._started = True
+            print(f"🔌 MCP session pool ready with {self.size} session(s)")
+
+    async def _spawn(self) -> _PooledServer:
+        server = _PooledServer(self.client_cls())
+        ready = asyncio.get_running_loop().create_future()
+        server.task = asyncio.create_task(self._hold(server, ready))
+        self._servers.append(server)
+        try:
+            await ready
+        except BaseException:
+            self._servers.remove(server)
+            raise
+        return server
+
+    async def _hold(self, server: _PooledServer, ready: asyncio.Future) -> None:
+        """在独立 task 中保持 MCP 服务存活, 直到收到停止信号"""
+        try:
+            await server.client.connect_to_server(
+                command=self.command, args=self.args, env=self.env
+            )
+            ready.set_result(server)
+            await server.stop_event.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not isinstance(e, asyncio.CancelledError):
+                print(f"⚠️ MCP server exited unexpectedly: {e}")
+        finally:
+            await server.client.cleanup()
+
+    async def _is_healthy(self, server: _PooledServer) -> bool:
+        if server.task is None or server.task.done():
+            return False
+        if server.client.session is None:
+            return False
+        try:
+            await asyncio.wait_for(
+                server.client.session.send_ping(), timeout=self.health_check_timeout
+            )
+            return True
+        except Exception as e:
+            print(f"⚠️ MCP session health check failed: {e}")
+            return False
+
+    async def _retire(self, server: _PooledServer) -> None:
+        server.stop_event.set()
+        if server in self._servers:
+            self._servers.remove(server)
+        if server.task is not None:
+            try:
+                await asyncio.wait_for(server.task, timeout=self.health_check_timeout)
+            except Exception:
+                server.task.cancel()
+
+    @asynccontextmanager
+    async def lease(self):
+        """租借一个健康的客户端, 使用完毕后自动归还; 不健康的会话会被替换"""
+        if not self._started:
+            await self.start()
+
+        # 记住租借时的队列: close() 会丢弃它, 归还时不能再访问 self._idle
+        idle = self._idle
+        server = await idle.get()
+        try:
+            if not await self._is_healthy(server):
+                await self._retire(server)
+                server = await self._spawn()
+        except BaseException:
+            # 替换失败时归还旧槽位的名额, 避免池子永久缩小
+            idle.put_nowait(server)
+            raise
+
+        try:
+            yield server.client
+        finally:
+            # 租借期间池子已关闭时, 服务已经停止, 不再归还
+            if server in self._servers:
+                idle.put_nowait(server)
+
+    async def _shutdown_servers(self) -> None:
+        servers, self._servers = self._servers, []
+        for server in servers:
+            server.stop_event.set()
+        tasks = [server.task for server in servers if server.task is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        """关闭所有 MCP 服务; 仍在租借中的客户端在归还时直接丢弃"""
+        async with self._start_lock:
+            await self._shutdown_servers()
+            self._idle = None
+            self._started = False
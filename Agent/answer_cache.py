@@ -0,0 +1,174 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from lightrag.utils import (
+    compute_mdhash_id,
+    dequantize_embedding,
+    load_json,
+    logger,
+    quantize_embedding,
+    write_json,
+)
+
+
+class AnswerCache:
+    """
+    Text2SQL 语义缓存: 规范化后的问题 -> 已通过检查的最终 SQL。
+    只缓存 SQL, 不缓存查询结果: 命中后由调用方重新执行 SQL, 数据更新后不会返回旧结果。
+
+    先按问题文本精确匹配, 再按问题 embedding 的余弦相似度匹配。embedding 以 8 bit
+    量化保存 (与 LightRAG 的 LLM 缓存相同)。条目有 TTL 并按 LRU 淘汰;
+    数据库结构或上下文语料的版本变化时整个缓存失效。
+    """
+
+    def __init__(
+        self,
+        embedding_func: Callable,
+        cache_path: Optional[str] = None,
+        similarity_threshold: float = 0.95,
+        ttl: float = 86400,
+        max_entries: int = 1024,
+    ):
+        self.embedding_func = embedding_func
+        self.cache_path = cache_path
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 反量化后的 embedding, 只保存在内存中
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._lock = asyncio.Lock()
+        # 写文件在线程中进行; 按快照的序号丢弃过时的写入, 最后留下的总是最新内容
+        self._write_lock = asyncio.Lock()
+        self._snapshot_seq = 0
+        self._written_seq = 0
+
+        cached = load_json(cache_path) if cache_path else None
+        if cached:
+            self.version = cached.get("version")
+            for cache_id, entry in cached.get("entries", {}).items():
+                self._entries[cache_id] = entry
+                self._vectors[cache_id] = self._restore_vector(entry)
+
+    @staticmethod
+    def _restore_vector(entry: Dict[str, Any]) -> np.ndarray:
+        quantized = np.frombuffer(
+            bytes.fromhex(entry["embedding"]), dtype=np.uint8
+        ).reshape(entry["embedding_shape"])
+        return dequantize_embedding(
+            quantized, entry["embedding_min"], entry["embedding_max"]
+        )
+
+    def _snapshot(self) -> Optional[tuple]:
+        """在 self._lock 内调用, 返回 (序号, 待写入的内容); 不持久化时返回 None"""
+        if not self.cache_path:
+            return None
+        self._snapshot_seq += 1
+        return self._snapshot_seq, {
+            "version": self.version,
+            "entries": dict(self._entries),
+        }
+
+    async def _save(self, snapshot: Optional[tuple]) -> None:
+        """在 self._lock 之外调用, 写文件时不阻塞事件循环和其他查询"""
+        if snapshot is None:
+            return
+        seq, data = snapshot
+        async with self._write_lock:
+            if seq < self._written_seq:
+                return
+            await asyncio.to_thread(write_json, data, self.cache_path)
+            self._written_seq = seq
+
+    def _drop(self, cache_id: str) -> None:
+        self._entries.pop(cache_id, None)
+        self._vectors.pop(cache_id, None)
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        for cache_id in [
+            cache_id
+            for cache_id, entry in self._entries.items()
+            if now - entry["created_at"] > self.ttl
+        ]:
+            self._drop(cache_id)
+
+    async def set_version(self, version: str) -> None:
+        """数据库结构或上下文语料变化后清空缓存"""
+        async with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                logger.info("Schema or context changed, clearing Text2SQL answer cache")
+            self._entries.clear()
+            self._vectors.clear()
+            self.version = version
+            snapshot = self._snapshot()
+        await self._save(snapshot)
+
+    async def _embed(self, query: str) -> np.ndarray:
+        return np.asarray((await self.embedding_func([query]))[0], dtype=np.float32)
+
+    async def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """返回命中的缓存条目 (含 sql 和 similarity), 未命中返回 None"""
+        cache_id = compute_mdhash_id(query, prefix="answer-")
+        async with self._lock:
+            self._evict_expired()
+            if not self._entries:
+                return None
+            entry = self._entries.get(cache_id)
+            if entry is not None:
+                self._entries.move_to_end(cache_id)
+                return {**entry, "similarity": 1.0}
+
+        embedding = await self._embed(query)
+        async with self._lock:
+            if not self._vectors:
+                return None
+            cache_ids = list(self._vectors.keys())
+            matrix = np.stack([self._vectors[i] for i in cache_ids])
+            similarities = (
+                matrix
+                @ embedding
+                / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding))
+            )
+            best = int(np.argmax(similarities))
+            best_similarity = float(similarities[best])
+            if best_similarity < self.similarity_threshold:
+                return None
+            best_id = cache_ids[best]
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            logger.info(
+                f"Text2SQL answer cache hit ({best_similarity:.4f}): {entry['query'][:50]}"
+            )
+            return {**entry, "similarity": best_similarity}
+
+    async def put(self, query: str, sql: str) -> None:
+        cache_id = compute_mdhash_id(query, prefix="answer-")
+        embedding = await self._embed(query)
+        quantized, min_val, max_val = quantize_embedding(embedding)
+        entry = {
+            "query": query,
+            "sql": sql,
+            "created_at": time.time(),
+            "embedding": quantized.tobytes().hex(),
+            "embedding_shape": quantized.shape,
+            "embedding_min": float(min_val),
+            "embedding_max": float(max_val),
+        }
+        async with self._lock:
+            self._entries[cache_id] = entry
+            self._entries.move_to_end(cache_id)
+            self._vectors[cache_id] = self._restore_vector(entry)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+            snapshot = self._snapshot()
+        await self._save(snapshot)
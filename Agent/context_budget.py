@@ -0,0 +1,134 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from lightrag.utils import Tokenizer, TiktokenTokenizer
+
+# mcp-alchemy 的 execute_query 输出: "1. row" 后跟若干 "列名: 值" 行
+ROW_HEADER = re.compile(r"^(\d+)\. row$")
+NUMBER = re.compile(r"^[-+]?\d+(\.\d+)?$")
+
+OMITTED_RESULT = "[Earlier tool result omitted to save context]"
+
+
+def tool_result_text(content: Any) -> str:
+    """把 MCP 工具结果转为纯文本, 只保留文本内容"""
+    if isinstance(content, list):
+        texts = [item.text for item in content if getattr(item, "text", None)]
+        if texts:
+            return "\n".join(texts)
+    return str(content)
+
+
+def parse_rows(text: str) -> Optional[List[Dict[str, str]]]:
+    """解析 execute_query 的输出为行列表, 不是这种格式时返回 None"""
+    rows: List[Dict[str, str]] = []
+    current: Optional[Dict[str, str]] = None
+    for line in text.splitlines():
+        if ROW_HEADER.match(line.strip()):
+            current = {}
+            rows.append(current)
+        elif current is not None and ": " in line:
+            key, value = line.split(": ", 1)
+            current[key.strip()] = value.strip()
+    return rows or None
+
+
+def summarize_column(values: List[str]) -> str:
+    present = [v for v in values if v not in ("", "None", "NULL")]
+    parts = [f"{len(set(present))} distinct"]
+    if len(present) < len(values):
+        parts.append(f"{len(values) - len(present)} null")
+    if present and all(NUMBER.match(v) for v in present):
+        numbers = [float(v) for v in present]
+        parts.append(f"min {min(numbers):g}, max {max(numbers):g}")
+    return ", ".join(parts)
+
+
+class ContextBudget:
+    """
+    控制 MCP 工具调用循环的 prompt 大小:
+    单个工具结果超出 max_result_tokens 时压缩为统计信息加前几行,
+    整个对话超出 max_prompt_tokens 时从最早的工具结果开始省略。
+    """
+
+    def __init__(
+        self,
+        max_result_tokens: int = 2000,
+        max_prompt_tokens: int = 12000,
+        sample_rows: int = 10,
+        tokenizer: Optional[Tokenizer] = None,
+    ):
+        self.max_result_tokens = max_result_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.sample_rows = sample_rows
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self) -> Tokenizer:
+        if self._tokenizer is None:
+            self._tokenizer = TiktokenTokenizer()
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.tokenizer.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return (
+            self.tokenizer.decode(tokens[:max_tokens])
+            + f"\n... [truncated, {len(tokens) - max_tokens} more tokens]"
+        )
+
+    def _summarize_rows(self, rows: List[Dict[str, str]]) -> str:
+        columns = list(rows[0].keys())
+        lines = [f"Result set too large, showing a summary of {len(rows)} rows."]
+        lines.append("Column stats:")
+        for column in columns:
+            values = [row.get(column, "") for row in rows]
+            lines.append(f"  {column}: {summarize_column(values)}")
+        lines.append(f"First {min(self.sample_rows, len(rows))} rows:")
+        for i, row in enumerate(rows[: self.sample_rows], 1):
+            lines.append(f"{i}. row")
+            lines.extend(f"{key}: {value}" for key, value in row.items())
+            lines.append("")
+        return "\n".join(lines)
+
+    def compact_result(self, text: str) -> str:
+        """把单个工具结果压缩到 max_result_tokens 以内"""
+        if self.count_tokens(text) <= self.max_result_tokens:
+            return text
+        rows = parse_rows(text)
+        if rows and len(rows) > self.sample_rows:
+            text = self._summarize_rows(rows)
+        return self.truncate(text, self.max_result_tokens)
+
+    def _message_tokens(self, message: Dict[str, Any]) -> int:
+        tokens = self.count_tokens(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            tokens += self.count_tokens(tool_call["function"]["arguments"])
+        return tokens
+
+    def trim_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        对话超出 max_prompt_tokens 时, 从最早的工具结果开始替换为占位文本。
+        保留 system 和 user 消息以及最近一轮的工具结果, 消息结构不变。
+        """
+        total = sum(self._message_tokens(message) for message in messages)
+        if total <= self.max_prompt_tokens:
+            return messages
+
+        last_assistant = max(
+            (i for i, message in enumerate(messages) if message["role"] == "assistant"),
+            default=len(messages),
+        )
+        for i, message in enumerate(messages[:last_assistant]):
+            if total <= self.max_prompt_tokens:
+                break
+            if message["role"] != "tool" or message["content"] == OMITTED_RESULT:
+                continue
+            total -= self._message_tokens(message)
+            message["content"] = OMITTED_RESULT
+            total += self.count_tokens(OMITTED_RESULT)
+        return messages
@@ -0,0 +1,195 @@
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from lightrag.base import DocStatus
+from lightrag.utils import (
+    clean_text,
+    compute_mdhash_id,
+    load_json,
+    logger,
+    write_json,
+)
+from .tabular_ingest import (
+    find_foreign_keys,
+    ingest_table,
+    profile_csv,
+    table_name_for,
+)
+
+
+class ContextManifest:
+    """
+    记录已导入 RAG 的上下文文件: 路径 -> (大小, 修改时间, 内容哈希, doc id)。
+
+    启动时只需 stat 一次文件即可判断是否变化, 未变化的文件不会被读取或哈希,
+    冷启动耗时不再随上下文语料增长。
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self._entries: Dict[str, Dict[str, Any]] = load_json(manifest_path) or {}
+        self._dirty = False
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(self._key(path))
+
+    def is_unchanged(self, path: str) -> bool:
+        """仅通过文件大小和修改时间判断文件是否与上次导入时一致"""
+        entry = self.get(path)
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        return entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def record(
+        self,
+        path: str,
+        content_hash: str,
+        doc_id: str,
+        table: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        stat = os.stat(path)
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content_hash": content_hash,
+            "doc_id": doc_id,
+        }
+        if table is not None:
+            entry["table"] = table
+        self._entries[self._key(path)] = entry
+        self._dirty = True
+
+    def prune(self, paths) -> List[Dict[str, Any]]:
+        """删除不在 paths 中的文件的记录, 返回被删除的记录"""
+        keep = {self._key(path) for path in paths}
+        removed = [
+            {"path": key, **self._entries.pop(key)}
+            for key in list(self._entries)
+            if key not in keep
+        ]
+        if removed:
+            self._dirty = True
+        return removed
+
+    def doc_ids(self) -> Set[str]:
+        return {entry["doc_id"] for entry in self._entries.values()}
+
+    def tables(self) -> Dict[str, Dict[str, Any]]:
+        """已导入的 CSV 表的精简结构, 表名 -> 主键和列"""
+        return {
+            entry["table"]["name"]: entry["table"]
+            for entry in self._entries.values()
+            if "table" in entry
+        }
+
+    def fingerprint(self) -> str:
+        """所有已导入文件的 doc id 的摘要, 上下文语料变化时随之变化"""
+        doc_ids = sorted(entry["doc_id"] for entry in self._entries.values())
+        return compute_mdhash_id("\n".join(doc_ids))
+
+    def save(self) -> None:
+        if self._dirty:
+            write_json(self._entries, self.manifest_path)
+            self._dirty = False
+
+
+async def _is_processed(rag, doc_id: str) -> bool:
+    status = await rag.doc_status.get_by_id(doc_id)
+    return status is not None and status.get("status") == DocStatus.PROCESSED
+
+
+def _is_table_file(path: str) -> bool:
+    return path.lower().endswith(".csv")
+
+
+async def sync_context_files(rag, context_files, manifest_path: str) -> ContextManifest:
+    """
+    把上下文文件增量导入 RAG, 只重新导入新增或内容发生变化的文件。
+    CSV 文件按表结构直接写入知识图谱, 其他文件走 LightRAG 的常规插入流程。
+    内容变化的文件会先删除旧文档再导入; 不再在上下文文件列表中的文件,
+    其文档会从 RAG 中删除。返回更新后的 manifest。
+    """
+    manifest = ContextManifest(manifest_path)
+    pending = []
+
+    removed = manifest.prune(context_files)
+    remaining_doc_ids = manifest.doc_ids()
+    for entry in removed:
+        logger.info(f"Context file removed, deleting document: {entry['path']}")
+        # 内容相同的文件共用一个 doc id, 仍被其他文件使用时保留
+        if entry["doc_id"] not in remaining_doc_ids:
+            await rag.adelete_by_doc_id(entry["doc_id"])
+
+    for context_file in context_files:
+        entry = manifest.get(context_file)
+        if (
+            entry is not None
+            and manifest.is_unchanged(context_file)
+            and await _is_processed(rag, entry["doc_id"])
+        ):
+            logger.info(f"Skipping unchanged context file: {context_file}")
+            continue
+
+        with open(context_file, "r", encoding="utf-8") as f:
+            content = f.read()
+        content_hash = compute_mdhash_id(content)
+        # 与 LightRAG 默认生成的 doc id 保持一致, 兼容已有的存储
+        doc_id = compute_mdhash_id(clean_text(content), prefix="doc-")
+
+        if entry is not None and entry["content_hash"] == content_hash:
+            if await _is_processed(rag, doc_id):
+                # 只有修改时间变化, 内容未变
+                manifest.record(context_file, content_hash, doc_id, entry.get("table"))
+                continue
+        elif entry is not None and entry["doc_id"] != doc_id:
+            logger.info(f"Context file changed, replacing document: {context_file}")
+            await rag.adelete_by_doc_id(entry["doc_id"])
+        elif (
+            entry is None
+            and _is_table_file(context_file)
+            and await _is_processed(rag, doc_id)
+        ):
+            # 之前作为普通文本导入的 CSV, 删除后改为按表结构导入
+            await rag.adelete_by_doc_id(doc_id)
+
+        pending.append((context_file, content, content_hash, doc_id))
+
+    # 先统计所有待导入的表, 以便识别指向本批次其他表的外键
+    profiles = {}
+    tables = manifest.tables()
+    for context_file, content, _, _ in pending:
+        if _is_table_file(context_file):
+            profile = profile_csv(content, table_name_for(context_file))
+            profiles[context_file] = profile
+            tables[profile.name] = profile.summary()
+
+    for context_file, content, content_hash, doc_id in pending:
+        profile = profiles.get(context_file)
+        if profile is not None:
+            await ingest_table(
+                rag,
+                profile,
+                find_foreign_keys(profile, tables),
+                doc_id,
+                context_file,
+            )
+        else:
+            await rag.ainsert(content, ids=doc_id, file_paths=context_file)
+
+        if await _is_processed(rag, doc_id):
+            manifest.record(
+                context_file,
+                content_hash,
+                doc_id,
+                profile.summary() if profile is not None else None,
+            )
+        else:
+            logger.warning(f"Failed to ingest context file: {context_file}")
+
+    manifest.save()
+    return manifest
@@ -0,0 +1,162 @@
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from lightrag.utils import Tokenizer, TiktokenTokenizer
+
+# LightRAG 的 _build_query_context 输出的三个部分
+SECTIONS = {
+    "entities": "Entities",
+    "relationships": "Relationships",
+    "sources": "Sources",
+}
+SECTION_PATTERN = re.compile(r"-----(\w+)-----\s*```json\s*(.*?)\s*```", re.DOTALL)
+# 去掉 JSON 部分后只剩标题的行, 例如 mix 模式中的 "-----Knowledge Graph Context-----"
+EMPTY_HEADER_PATTERN = re.compile(
+    r"^[ \t]*-----[^\n]*-----[ \t]*\n(?=\s*(?:-----|\Z))", re.M
+)
+# 各部分中参与相关性打分的字段; 其余字段 (id, rank, created_at, file_path) 在输出时去掉
+TEXT_FIELDS = {
+    "entities": ["entity", "type", "description"],
+    "relationships": ["source", "target", "keywords", "description"],
+    "sources": ["content"],
+}
+WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+CJK_PATTERN = re.compile(r"[\u4e00-\u9fff]+")
+
+
+def terms(text: str) -> List[str]:
+    """英文按单词切分, 中文按相邻两个字切分"""
+    text = text.lower()
+    result = WORD_PATTERN.findall(text)
+    for run in CJK_PATTERN.findall(text):
+        result.extend(run[i : i + 2] for i in range(max(len(run) - 1, 1)))
+    return result
+
+
+def parse_context(context: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """解析检索上下文, 不是 _build_query_context 的格式时返回 None"""
+    sections = {}
+    for title, body in SECTION_PATTERN.findall(context or ""):
+        name = next((k for k, v in SECTIONS.items() if v == title), None)
+        if name is None:
+            continue
+        try:
+            items = json.loads(body)
+        except json.JSONDecodeError:
+            return None
+        sections[name] = items if isinstance(items, list) else []
+    return sections or None
+
+
+def outside_sections(context: str) -> str:
+    """
+    返回检索上下文中不属于 JSON 部分的文本, 例如 mix 模式中 "-----Vector Context-----"
+    下的原文片段; 只剩标题的行一并去掉
+    """
+    text = SECTION_PATTERN.sub("", context or "")
+    return EMPTY_HEADER_PATTERN.sub("", text + "\n").strip()
+
+
+class ContextSelector:
+    """
+    为每个子任务挑选检索上下文: 按与任务描述的词项重合度 (IDF 加权) 给实体、关系和
+    原文片段打分, 只把得分最高的条目放进 max_tokens 以内, 而不是每次都发送完整上下文。
+    """
+
+    def __init__(self, max_tokens: int = 2000, tokenizer: Optional[Tokenizer] = None):
+        self.max_tokens = max_tokens
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self) -> Tokenizer:
+        if self._tokenizer is None:
+            self._tokenizer = TiktokenTokenizer()
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    @staticmethod
+    def _item_text(section: str, item: Dict[str, Any]) -> str:
+        return " ".join(str(item.get(field, "")) for field in TEXT_FIELDS[section])
+
+    def _compact(self, section: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: item[field] for field in TEXT_FIELDS[section] if field in item}
+
+    def rank(
+        self, sections: Dict[str, List[Dict[str, Any]]], description: str
+    ) -> List[tuple]:
+        """返回 (得分, 部分名, 原顺序, 条目), 按得分从高到低排序, 得分相同时保持检索顺序"""
+        documents = [
+            (section, i, item, Counter(terms(self._item_text(section, item))))
+            for section, items in sections.items()
+            for i, item in enumerate(items)
+        ]
+        if not documents:
+            return []
+
+        document_frequency = Counter()
+        for _, _, _, counts in documents:
+            document_frequency.update(counts.keys())
+        query_terms = set(terms(description))
+
+        scored = []
+        for section, i, item, counts in documents:
+            length = sum(counts.values()) or 1
+            score = sum(
+                math.log(1 + len(documents) / document_frequency[term])
+                * (1 + math.log(counts[term]))
+                for term in query_terms
+                if term in counts
+            ) / math.sqrt(length)
+            scored.append((score, section, i, item))
+        scored.sort(key=lambda x: (-x[0], x[2]))
+        return scored
+
+    def _format(self, selected: Dict[str, List[Dict[str, Any]]]) -> str:
+        parts = []
+        for section, title in SECTIONS.items():
+            items = selected.get(section)
+            if items:
+                body = json.dumps(items, ensure_ascii=False)
+                parts.append(f"-----{title}-----\n\n```json\n{body}\n```\n")
+        return "\n".join(parts)
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.tokenizer.encode(text)
+        return self.tokenizer.decode(tokens[: max(max_tokens, 0)])
+
+    def select(self, context: Optional[str], description: str) -> str:
+        """
+        返回与任务描述最相关、且不超过 max_tokens 的那部分上下文。
+        JSON 部分之外的文本 (mix 模式的原文片段) 不做挑选, 截断到剩余的 token 数后放在最后。
+        """
+        if not context:
+            return context or ""
+        sections = parse_context(context)
+        if sections is None:
+            return self._truncate(context, self.max_tokens)
+
+        ranked = self.rank(sections, description)
+        # 没有任何条目与任务相关时, 按检索顺序填充
+        if any(score > 0 for score, *_ in ranked):
+            ranked = [entry for entry in ranked if entry[0] > 0]
+
+        selected: Dict[str, List[Dict[str, Any]]] = {}
+        used = 0
+        for _, section, _, item in ranked:
+            compact = self._compact(section, item)
+            cost = self.count_tokens(json.dumps(compact, ensure_ascii=False))
+            if used + cost > self.max_tokens:
+                continue
+            selected.setdefault(section, []).append(compact)
+            used += cost
+
+        result = self._format(selected)
+        rest = outside_sections(context)
+        if rest:
+            rest = self._truncate(rest, self.max_tokens - used)
+        return "\n".join(part for part in (result, rest) if part)
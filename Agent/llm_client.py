@@ -0,0 +1,124 @@
+import os
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from openai import AsyncOpenAI
+from .replay import ReplayOpenAIClient, replay_mode
+from lightrag.tracing import current_span, span
+
+
+# 每个服务商对应的环境变量: API key, base url 以及最大并发请求数
+PROVIDERS = {
+    "default": {
+        "api_key": "API_KEY",
+        "base_url": "BASE_URL",
+        "max_async": "AGENT_MAX_ASYNC",
+    },
+    "dashscope": {
+        "api_key": "DASHSCOPE_API_KEY",
+        "base_url": "DASHSCOPE_BASE_URL",
+        "max_async": "DASHSCOPE_MAX_ASYNC",
+    },
+}
+DEFAULT_MAX_ASYNC = 8
+
+_clients: Dict[str, AsyncOpenAI] = {}
+_limiters: Dict[str, asyncio.Semaphore] = {}
+
+# 当前协程上下文中的 token 统计器 (任何带 add_usage 方法的对象, 例如 lightrag 的 TokenTracker)
+_usage_tracker: ContextVar[Optional[Any]] = ContextVar("usage_tracker", default=None)
+
+
+def _provider_config(provider: str) -> Dict[str, str]:
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    return PROVIDERS[provider]
+
+
+def get_async_client(provider: str = "default") -> AsyncOpenAI:
+    """
+    返回该服务商共享的 AsyncOpenAI 客户端。
+    同一进程内的所有 Agent 复用同一个客户端, 从而复用底层 HTTP 连接池。
+    录制或回放模式下返回包装后的客户端, 回放时不会创建真实客户端。
+    """
+    client = _clients.get(provider)
+    if client is None:
+        config = _provider_config(provider)
+        mode = replay_mode()
+        if mode != "replay":
+            client = AsyncOpenAI(
+                api_key=os.getenv(config["api_key"]),
+                base_url=os.getenv(config["base_url"]),
+            )
+        if mode != "off":
+            client = ReplayOpenAIClient(provider, client)
+        _clients[provider] = client
+    return client
+
+
+def register_client(provider: str, client) -> None:
+    """替换某个服务商的共享客户端, 例如基准测试中使用的本地桩客户端"""
+    _provider_config(provider)
+    _clients[provider] = client
+
+
+def get_limiter(provider: str = "default") -> asyncio.Semaphore:
+    """返回该服务商的并发限制器, 上限由对应的 *_MAX_ASYNC 环境变量决定"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        config = _provider_config(provider)
+        max_async = int(os.getenv(config["max_async"], DEFAULT_MAX_ASYNC))
+        limiter = asyncio.Semaphore(max_async)
+        _limiters[provider] = limiter
+    return limiter
+
+
+@contextmanager
+def track_usage(tracker):
+    """在当前上下文 (包括其中创建的子 task) 内把 LLM token 用量记录到 tracker"""
+    token = _usage_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _usage_tracker.reset(token)
+
+
+def current_usage_tracker():
+    return _usage_tracker.get()
+
+
+def record_usage(usage) -> None:
+    """把一次调用返回的 usage 记录到当前上下文的 tracker 和当前的 tracing span 中"""
+    if usage is None:
+        return
+    token_counts = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+    }
+    current_span().set_attributes(**token_counts)
+    tracker = _usage_tracker.get()
+    if tracker is not None:
+        tracker.add_usage(token_counts)
+
+
+async def chat_completion(provider: str = "default", **kwargs):
+    """在并发限制内调用 chat.completions.create, 参数与 OpenAI SDK 一致"""
+    with span("llm.chat", provider=provider, model=kwargs.get("model")):
+        async with get_limiter(provider):
+            response = await get_async_client(provider).chat.completions.create(
+                **kwargs
+            )
+        record_usage(getattr(response, "usage", None))
+    return response
+
+
+async def close_clients(provider: Optional[str] = None) -> None:
+    """关闭共享客户端 (默认全部), 释放连接池"""
+    providers = [provider] if provider else list(_clients.keys())
+    for name in providers:
+        client = _clients.pop(name, None)
+        _limiters.pop(name, None)
+        if client is not None:
+            await client.close()
@@ -1,15 +1,45 @@
+import hashlib
 import json
 import os
-from typing import Dict
+from typing import Dict, List, Optional
 from .CheckAgent import CheckAgent
 from .SQLAgent import SQLAgent
+from .SessionPool import MCPSessionPool
+from .schema_catalog import SchemaCatalog, catalog_from_env
+from .context_selector import ContextSelector
+from .sql_validator import SQLValidator
+from .context_budget import tool_result_text
+from lightrag.tracing import current_span, traced
 import asyncio
 
 
+MCP_SERVER_COMMAND = "uvx"
+MCP_SERVER_ARGS = [
+    "--from",
+    "mcp-alchemy==2025.04.16.110003",
+    "--with",
+    "pymysql",
+    "--refresh-package",
+    "mcp-alchemy",
+    "mcp-alchemy",
+]
+
+
 class TaskManager:
-    def __init__(self):
+    def __init__(
+        self,
+        pool_size: int = None,
+        schema_cache_dir: str = None,
+        num_candidates: int = None,
+    ):
         self.sql_agent = SQLAgent()
-        self.check_agent = CheckAgent()
+        self.pool_size = pool_size
+        self.num_candidates = num_candidates
+        self.check_pool = None
+        self.schema_cache_dir = schema_cache_dir
+        self.schema_catalog = None
+        self.sql_validator = None
+        self.context_selector = None
 
         self.final_sql = ""
         self.final_result = ""
@@ -19,73 +49,332 @@ class TaskManager:
     def _save_tasks(self, tasks, query_idx=None):
         """保存任务到文件"""
         save_path = self.save_path.format(query_idx=query_idx)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
         with open(save_path, "w", encoding="utf-8") as f:
             json.dump(tasks, f, ensure_ascii=False, indent=4)
 
-    async def execute_tasks(self, tasks: dict, context: str, query_idx=None):
-        """执行所有任务并保存结果"""
-        descriptions = [task["description"] for task in tasks.values()]
-        sqls = []
-        for i, (task_id, _) in enumerate(tasks.items()):
-            description = descriptions[i]
-            print(f"执行任务: {task_id} - {description}")
+    def _get_check_pool(self) -> MCPSessionPool:
+        """MCP 服务只在第一次执行任务时启动一次, 之后在任务间复用"""
+        if self.check_pool is None:
+            self.check_pool = MCPSessionPool(
+                command=MCP_SERVER_COMMAND,
+                args=MCP_SERVER_ARGS,
+                env={"DB_URL": os.getenv("DB_URL")},
+                size=self.pool_size or int(os.getenv("MCP_POOL_SIZE", 2)),
+                client_cls=CheckAgent,
+            )
+        return self.check_pool
+
+    def _get_schema_catalog(self) -> SchemaCatalog:
+        """数据库结构只在第一次使用时读取, 之后按刷新间隔检测变化"""
+        if self.schema_catalog is None:
+            self.schema_catalog = catalog_from_env(self.schema_cache_dir)
+        return self.schema_catalog
+
+    async def _relevant_schema(self, description: str, context: str):
+        catalog = self._get_schema_catalog()
+        if catalog is None:
+            return None
+        try:
+            return await catalog.relevant_schema(description, context)
+        except Exception as e:
+            print(f"读取数据库结构失败: {str(e)}")
+            return None
+
+    def _select_context(self, context: str, description: str) -> str:
+        """只保留与任务相关的检索上下文, SQL_CONTEXT_MAX_TOKENS=0 时使用完整上下文"""
+        if self.context_selector is None:
+            max_tokens = int(os.getenv("SQL_CONTEXT_MAX_TOKENS", 2000))
+            if max_tokens <= 0:
+                return context
+            self.context_selector = ContextSelector(max_tokens)
+        try:
+            return self.context_selector.select(context, description)
+        except Exception as e:
+            print(f"筛选上下文失败, 使用完整上下文: {str(e)}")
+            return context
+
+    async def schema_fingerprint(self):
+        """当前数据库结构的指纹, 未配置 DB_URL 或读取失败时返回 None"""
+        catalog = self._get_schema_catalog()
+        if catalog is None:
+            return None
+        try:
+            await catalog.refresh()
+        except Exception as e:
+            print(f"读取数据库结构失败: {str(e)}")
+        return catalog.fingerprint
+
+    async def _prevalidate(self, sql: str):
+        """在本地校验 SQL, 返回错误描述; 无法校验或未发现错误时返回 None"""
+        validator = self._get_sql_validator()
+        if validator is None:
+            return None
+        try:
+            return await validator.validate(sql)
+        except Exception as e:
+            print(f"本地校验出错, 跳过: {str(e)}")
+            return None
+
+    def _get_sql_validator(self) -> Optional[SQLValidator]:
+        catalog = self._get_schema_catalog()
+        if catalog is None:
+            return None
+        if self.sql_validator is None:
+            self.sql_validator = SQLValidator(catalog)
+        return self.sql_validator
+
+    async def _select_candidate(self, candidates: List[str]):
+        """
+        在本地执行所有候选 SQL, 选出执行成功且结果与其他候选一致最多的一个;
+        结果相同时优先选择生成顺序靠前的。返回 (SQL, 各候选的执行情况)。
+        """
+        validator = self._get_sql_validator()
+        max_rows = int(os.getenv("SQL_CANDIDATE_MAX_ROWS", 100))
+        timeout = float(os.getenv("SQL_CANDIDATE_TIMEOUT", 10))
+        outcomes = await asyncio.gather(
+            *(validator.execute(sql, max_rows, timeout) for sql in candidates),
+            return_exceptions=True,
+        )
+
+        report, votes = [], {}
+        for i, (sql, outcome) in enumerate(zip(candidates, outcomes)):
+            # CancelledError 不是 Exception 的子类, 同样按执行失败处理
+            if isinstance(outcome, BaseException):
+                rows, error = None, str(outcome) or type(outcome).__name__
+            else:
+                rows, error = outcome
+            entry = {"sql": sql, "error": error}
+            if error is None:
+                # 不考虑行顺序, 只比较结果集的内容
+                fingerprint = hashlib.md5(
+                    repr(sorted(repr(row) for row in rows)).encode("utf-8")
+                ).hexdigest()
+                entry["rows"] = len(rows)
+                votes.setdefault(fingerprint, []).append(i)
+            report.append(entry)
+
+        if not votes:
+            return candidates[0], report
+        winners = max(votes.values(), key=lambda indices: (len(indices), -indices[0]))
+        return candidates[winners[0]], report
+
+    @staticmethod
+    def _resolve_dependencies(tasks: dict) -> Dict[str, List[str]]:
+        """
+        解析每个任务依赖的前置任务。
+        如果任务计划中没有 depends_on 字段, 则保持原来的行为: 每个任务依赖它之前的所有任务。
+        """
+        task_ids = list(tasks.keys())
+        if not any("depends_on" in task for task in tasks.values()):
+            return {task_id: task_ids[:i] for i, task_id in enumerate(task_ids)}
+
+        dependencies = {}
+        for task_id, task in tasks.items():
+            parents = task.get("depends_on") or []
+            if isinstance(parents, str):
+                parents = [parents]
+            valid = []
+            for parent in parents:
+                if parent not in tasks or parent == task_id:
+                    print(f"忽略任务 {task_id} 的无效依赖: {parent}")
+                elif parent not in valid:
+                    valid.append(parent)
+            dependencies[task_id] = valid
+
+        # 检测循环依赖, 出现循环时退回到顺序执行
+        visiting, visited = set(), set()
 
-            # 第一次生成sql没有额外信息
-            sql = self.sql_agent.generate_sql(
+        def has_cycle(task_id):
+            if task_id in visiting:
+                return True
+            if task_id in visited:
+                return False
+            visiting.add(task_id)
+            cyclic = any(has_cycle(parent) for parent in dependencies[task_id])
+            visiting.discard(task_id)
+            visited.add(task_id)
+            return cyclic
+
+        if any(has_cycle(task_id) for task_id in task_ids):
+            print("任务依赖存在循环, 按顺序执行")
+            return {task_id: task_ids[:i] for i, task_id in enumerate(task_ids)}
+        return dependencies
+
+    @staticmethod
+    def _final_task_id(dependencies: Dict[str, List[str]]) -> str:
+        """
+        最终答案所在的任务: 没有被其他任务依赖的任务 (依赖图的终点)。
+        有多个终点时取计划中最靠后的一个。
+        """
+        parents = {parent for deps in dependencies.values() for parent in deps}
+        sinks = [task_id for task_id in dependencies if task_id not in parents]
+        return (sinks or list(dependencies))[-1]
+
+    @traced("task_manager.execute_task")
+    async def _execute_task(
+        self,
+        tasks: dict,
+        task_id: str,
+        parents: List[str],
+        context: str,
+        query_idx=None,
+        on_event=None,
+    ):
+        """执行单个任务的 生成 -> 检查 -> 调整 循环"""
+
+        def emit(event, **data):
+            if on_event is not None:
+                on_event(event, {"task_id": task_id, **data})
+
+        description = tasks[task_id]["description"]
+        print(f"执行任务: {task_id} - {description}")
+        task_span = current_span()
+        task_span.set_attributes(task_id=task_id, depends_on=parents)
+
+        # 生成或检查失败时把错误记录在任务结果中, 不影响其他任务
+        attempts = 0
+        try:
+            # 把依赖任务的描述和最终SQL作为前置信息, 没有依赖时不附加额外信息
+            descriptions = [tasks[parent]["description"] for parent in parents]
+            descriptions.append(description)
+            schema = await self._relevant_schema(description, context)
+            generate_kwargs = dict(
                 descriptions=descriptions,
-                prev_sqls=sqls,
-                index=i,
-                context=context,
+                prev_sqls=[tasks[parent].get("sql", "") for parent in parents],
+                index=len(parents),
+                context=self._select_context(context, description),
+                schema=schema,
             )
+            num_candidates = self.num_candidates or int(os.getenv("SQL_CANDIDATES", 1))
+            if num_candidates > 1 and self._get_sql_validator() is not None:
+                # 并行生成多个候选并在本地执行, 只把胜出的候选交给 LLM 检查
+                candidates = await self.sql_agent.generate_candidates(
+                    **generate_kwargs, k=num_candidates
+                )
+                sql, report = await self._select_candidate(candidates)
+                print(f"从 {len(candidates)} 个候选 SQL 中选出: {sql}")
+                emit("candidates", candidates=report, selected=sql)
+            else:
+                sql = await self.sql_agent.generate_sql(**generate_kwargs)
             tasks[task_id]["sql"] = sql
-            sqls.append(sql)
             print(f"对于任务 {description} 生成的SQL: {sql}")
+            emit("sql_generated", sql=sql)
 
-            try:
-                await self.check_agent.connect_to_server(
-                    command="uvx",
-                    args=[
-                        "--from",
-                        "mcp-alchemy==2025.04.16.110003",
-                        "--with",
-                        "pymysql",
-                        "--refresh-package",
-                        "mcp-alchemy",
-                        "mcp-alchemy",
-                    ],
-                    env={"DB_URL": os.getenv("DB_URL")},
-                )
+            max_attempts = 3
+            current_sql = sql
+            for attempt in range(max_attempts):
+                attempts = attempt + 1
+                # 本地能发现的错误直接交给 adjust_sql, 不占用 LLM 检查
+                validation_error = await self._prevalidate(current_sql)
+                if validation_error:
+                    print(f"本地校验失败: {validation_error}")
+                    is_match, adjustment = False, validation_error
+                    emit(
+                        "validation_failed",
+                        attempt=attempt + 1,
+                        sql=current_sql,
+                        error=validation_error,
+                    )
+                else:
+                    async with self._get_check_pool().lease() as check_agent:
+                        check = await check_agent.run(description, current_sql, schema)
+                    result, is_match, check_completed, adjustment = check
+                    emit(
+                        "check",
+                        attempt=attempt + 1,
+                        sql=current_sql,
+                        match=is_match,
+                        result=result,
+                        adjustment=adjustment,
+                    )
 
-                max_attempts = 3
-                current_sql = sql
-                for attempt in range(max_attempts):
-                    result, is_match, check_completed, adjustment = (
-                        await self.check_agent.run(description, current_sql)
+                if is_match:
+                    tasks[task_id]["sql"] = current_sql
+                    tasks[task_id]["result"] = result
+                    tasks[task_id]["verified"] = True
+                    print(f"Current SQL: {current_sql}")
+                    break
+                else:
+                    current_sql = await self.sql_agent.adjust_sql(
+                        current_sql, adjustment
                     )
+                    tasks[task_id]["sql"] = current_sql
+                    print(f"第{attempt + 1}次调整后的SQL: {current_sql}")
+                    emit("sql_adjusted", attempt=attempt + 1, sql=current_sql)
+        except Exception as e:
+            print(f"执行任务 {task_id} 时出错: {str(e)}")
+            tasks[task_id]["result"] = f"错误: {str(e)}"
 
-                    if is_match:
-                        tasks[task_id]["sql"] = current_sql
-                        tasks[task_id]["result"] = result
-                        print(f"Current SQL: {current_sql}")
-                        break
-                    else:
-                        current_sql = self.sql_agent.adjust_sql(current_sql, adjustment)
-                        tasks[task_id]["sql"] = current_sql
-                        print(f"第{attempt + 1}次调整后的SQL: {current_sql}")
-            except Exception as e:
-                print(f"执行任务 {task_id} 时出错: {str(e)}")
-                tasks[task_id]["result"] = f"错误: {str(e)}"
+        task_span.set_attributes(
+            verified=tasks[task_id].get("verified", False), attempts=attempts
+        )
+        self._save_tasks(tasks, query_idx)
+        emit(
+            "task_done",
+            sql=tasks[task_id].get("sql"),
+            result=tasks[task_id].get("result"),
+            verified=tasks[task_id].get("verified", False),
+        )
 
-            self._save_tasks(tasks, query_idx)
+    async def execute_tasks(
+        self, tasks: dict, context: str, query_idx=None, on_event=None
+    ):
+        """
+        按依赖关系并发执行所有任务并保存结果, 互不依赖的任务同时执行。
+        on_event(事件名, 数据) 会在生成、检查、调整 SQL 时被调用。
+        """
+        dependencies = self._resolve_dependencies(tasks)
+        runners: Dict[str, asyncio.Task] = {}
+
+        async def run(task_id):
+            parents = dependencies[task_id]
+            if parents:
+                await asyncio.gather(*(runners[parent] for parent in parents))
+            await self._execute_task(
+                tasks, task_id, parents, context, query_idx, on_event
+            )
 
-        await self.check_agent.cleanup()
+        for task_id in tasks:
+            runners[task_id] = asyncio.create_task(run(task_id))
+        try:
+            await asyncio.gather(*runners.values())
+        except BaseException:
+            # 一个任务失败或整体被取消时, 不让其他任务在后台继续调用 LLM 和 MCP
+            for runner in runners.values():
+                runner.cancel()
+            await asyncio.gather(*runners.values(), return_exceptions=True)
+            raise
 
         print("所有任务执行完毕")
 
-        self.final_sql = tasks[list(tasks.keys())[-1]]["sql"]
-        self.final_result = tasks[list(tasks.keys())[-1]]["result"]
+        final_task = tasks[self._final_task_id(dependencies)]
+        self.final_sql = final_task.get("sql")
+        self.final_result = final_task.get("result")
         return (self.final_sql, self.final_result)
 
+    async def execute_sql(self, sql: str) -> str:
+        """不经过 LLM 检查, 直接用 MCP 的 execute_query 执行 SQL 并返回结果文本"""
+        async with self._get_check_pool().lease() as client:
+            tool_result = await client.session.call_tool(
+                "execute_query", {"query": sql}
+            )
+        content = tool_result_text(tool_result.content)
+        if getattr(tool_result, "isError", False):
+            raise RuntimeError(content)
+        return content
+
+    async def cleanup(self):
+        """关闭 MCP 会话池和数据库连接"""
+        if self.check_pool is not None:
+            await self.check_pool.close()
+            self.check_pool = None
+        if self.schema_catalog is not None:
+            self.schema_catalog.close()
+            self.schema_catalog = None
+            self.sql_validator = None
+        self.context_selector = None
+
 
 if __name__ == "__main__":
     manager = TaskManager()
@@ -0,0 +1,296 @@
+import os
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .Normalizer import Normalizer
+from .split_query import PlanCache, plan_query
+from .manage import TaskManager
+from .context_manifest import sync_context_files
+from .answer_cache import AnswerCache
+from .llm_client import close_clients, current_usage_tracker, track_usage
+from .replay import replayable_embedding_func, replayable_llm_func
+
+from lightrag.lightrag import LightRAG, QueryParam
+from lightrag.llm.openai import gpt_4o_mini_complete, openai_embed
+from lightrag.kg.shared_storage import initialize_pipeline_status
+from lightrag.tracing import current_span, export_chrome_trace, span
+from lightrag.utils import TokenTracker, compute_mdhash_id
+
+STORAGE_DIR = "./rag_storage"
+
+CONTEXT_FILES = [
+    "./data/ecommerce_doc.txt",
+    "./data/users.csv",
+    "./data/products.csv",
+    "./data/orders.csv",
+]
+
+# 事件回调: on_event(事件名, 数据)
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+async def tracked_llm_complete(
+    prompt, system_prompt=None, history_messages=None, **kwargs
+):
+    # 把 LightRAG 内部的 LLM 调用计入当前阶段的 token 统计
+    tracker = current_usage_tracker()
+    if tracker is not None:
+        kwargs["token_tracker"] = tracker
+    return await gpt_4o_mini_complete(
+        prompt,
+        system_prompt=system_prompt,
+        history_messages=history_messages,
+        **kwargs,
+    )
+
+
+class Text2SQL:
+    """
+    完整的 Text2SQL 流程。传入已有的 LightRAG 实例时 (例如 API 服务中) 复用它,
+    不再创建和关闭自己的存储。
+    """
+
+    def __init__(self, rag: Optional[LightRAG] = None, working_dir: str = None):
+        self.rag = rag
+        self._owns_rag = rag is None
+        self.working_dir = working_dir or (
+            rag.working_dir if rag is not None else STORAGE_DIR
+        )
+        self.normalizer = None
+        self.task_manager = TaskManager(schema_cache_dir=self.working_dir)
+        self.answer_cache = None
+        self.plan_cache = None
+        self.context_fingerprint = None
+
+    async def initialize(self, context_files: Optional[List[str]] = CONTEXT_FILES):
+        """
+        初始化 RAG 并增量导入上下文文件。context_files 为 None 时不导入,
+        此时无法判断上下文语料是否变化, 不启用答案缓存。
+        """
+        os.makedirs(self.working_dir, exist_ok=True)
+        if self.rag is None:
+            # Initialize RAG instance
+            self.rag = LightRAG(
+                working_dir=self.working_dir,
+                llm_model_func=replayable_llm_func(tracked_llm_complete),
+                embedding_func=replayable_embedding_func(openai_embed),
+            )
+            await self.rag.initialize_storages()
+            await initialize_pipeline_status()
+
+        if context_files is not None:
+            # 只重新导入新增或发生变化的文件
+            manifest = await sync_context_files(
+                self.rag,
+                context_files,
+                os.path.join(self.working_dir, "context_manifest.json"),
+            )
+            self.context_fingerprint = manifest.fingerprint()
+
+            # 问题 -> 最终 SQL 的语义缓存
+            if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true":
+                self.answer_cache = AnswerCache(
+                    self.rag.embedding_func,
+                    cache_path=os.path.join(self.working_dir, "answer_cache.json"),
+                    similarity_threshold=float(
+                        os.getenv("ANSWER_CACHE_THRESHOLD", 0.95)
+                    ),
+                    ttl=float(os.getenv("ANSWER_CACHE_TTL", 86400)),
+                    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1024)),
+                )
+
+        # 规范化查询 -> 任务计划 的缓存, 上下文语料变化后旧的计划不再使用
+        self.plan_cache = PlanCache(
+            os.path.join(self.working_dir, "plan_cache.json"),
+            version=self.context_fingerprint,
+        )
+
+        # Initialize rewriter
+        self.normalizer = Normalizer()
+
+    async def cleanup(self):
+        if self.rag and self._owns_rag:
+            await self.rag.finalize_storages()
+            self.rag = None
+        await self.task_manager.cleanup()
+        await close_clients()
+
+    async def normalize_query(self, query: str) -> dict:
+        # Normalize the query and extract its retrieval keywords in one call
+        return await self.normalizer.normalize_with_keywords(query)
+
+    async def retrive_context(
+        self,
+        query: str,
+        retrieval_mode: str = "hybrid",
+        hl_keywords: Optional[List[str]] = None,
+        ll_keywords: Optional[List[str]] = None,
+    ):
+        print("Retrieving context...")
+        # Retrieval mode:
+        # - "local": Focuses on context-dependent information.
+        # - "global": Utilizes global knowledge.
+        # - "hybrid": Combines local and global retrieval methods.
+        # - "naive": Performs a basic search without advanced techniques.
+        # - "mix": Integrates knowledge graph and vector retrieval.
+
+        # 已有关键词时 LightRAG 不再调用 LLM 提取关键词
+        query_param = QueryParam(
+            mode=retrieval_mode,
+            only_need_context=True,
+            hl_keywords=hl_keywords or [],
+            ll_keywords=ll_keywords or [],
+        )
+
+        token_tracker = TokenTracker()
+
+        with token_tracker:
+            # Context only
+            context = await self.rag.aquery(
+                query=query,
+                param=query_param,
+                system_prompt=None,
+            )
+
+        print("Token count:", token_tracker.get_usage())
+        return context
+
+    async def lookup_answer_cache(self, normalized_query: str):
+        # 数据库结构或上下文语料变化后缓存失效
+        schema_fingerprint = await self.task_manager.schema_fingerprint()
+        await self.answer_cache.set_version(
+            compute_mdhash_id(f"{self.context_fingerprint}:{schema_fingerprint}")
+        )
+        cached = await self.answer_cache.get(normalized_query)
+        if cached is not None:
+            # 缓存中只有 SQL, 重新执行以获得最新数据; 执行失败时按未命中处理
+            try:
+                cached["result"] = await self.task_manager.execute_sql(cached["sql"])
+            except Exception as e:
+                print(f"重新执行缓存的 SQL 失败, 忽略缓存: {str(e)}")
+                cached = None
+        current_span().set_attribute("cache_hit", cached is not None)
+        return cached
+
+    async def run_query(
+        self,
+        query: str,
+        query_idx=None,
+        retrieval_mode: str = "hybrid",
+        on_event: Optional[EventCallback] = None,
+    ) -> dict:
+        """
+        对单个问题执行完整流程: normalize -> cache -> retrieve -> split -> execute,
+        并记录每个阶段的耗时和 token 用量。
+        传入 on_event 时, 每个阶段的中间结果会在产生时立即通过回调发出。
+        启用 tracing 且设置了 TRACE_DIR 时, 每个问题的 trace 写入该目录。
+        """
+        with span("text2sql.query", query_idx=query_idx, mode=retrieval_mode) as root:
+            output = await self._run_query(query, query_idx, retrieval_mode, on_event)
+            root.set_attribute("cached", output["cached"])
+
+        output["trace_id"] = root.trace_id
+        trace_dir = os.getenv("TRACE_DIR")
+        if root.trace_id is not None and trace_dir:
+            export_chrome_trace(
+                os.path.join(trace_dir, f"trace_{root.trace_id}.json"), root.trace_id
+            )
+        return output
+
+    async def _run_query(
+        self,
+        query: str,
+        query_idx=None,
+        retrieval_mode: str = "hybrid",
+        on_event: Optional[EventCallback] = None,
+    ) -> dict:
+        stages = {}
+
+        def emit(event, data):
+            if on_event is not None:
+                on_event(event, data)
+
+        async def run_stage(name, coro):
+            tracker = TokenTracker()
+            start = time.perf_counter()
+            try:
+                with track_usage(tracker), span(f"stage.{name}"):
+                    return await coro
+            finally:
+                stages[name] = {
+                    "latency": time.perf_counter() - start,
+                    "usage": tracker.get_usage(),
+                }
+                emit("stage", {"name": name, **stages[name]})
+
+        normalized = await run_stage("normalize", self.normalize_query(query))
+        normalized_query = normalized["normalized_query"]
+        print("Normalized query:", normalized_query)
+        emit(
+            "normalized",
+            {
+                "query": normalized_query,
+                "high_level_keywords": normalized["high_level_keywords"],
+                "low_level_keywords": normalized["low_level_keywords"],
+            },
+        )
+
+        if self.answer_cache is not None:
+            cached = await run_stage(
+                "cache", self.lookup_answer_cache(normalized_query)
+            )
+            if cached is not None:
+                print(f"Answer cache hit (similarity {cached['similarity']:.4f})")
+                emit("cache_hit", {"similarity": cached["similarity"]})
+                return {
+                    "normalized_query": normalized_query,
+                    "tasks": None,
+                    "sql": cached["sql"],
+                    "result": cached["result"],
+                    "stages": stages,
+                    "cached": True,
+                }
+
+        context = await run_stage(
+            "retrieve",
+            self.retrive_context(
+                normalized_query,
+                retrieval_mode,
+                normalized["high_level_keywords"],
+                normalized["low_level_keywords"],
+            ),
+        )
+        print("Retrieved context:", context)
+        emit("context", {"context": context})
+
+        # Router
+        tasks = await run_stage(
+            "split", plan_query(normalized_query, context, self.plan_cache)
+        )
+        tasks = re.sub(r"```json\s*(.*?)\s*```", r"\1", tasks, flags=re.DOTALL)
+
+        # print("Raw tasks:", tasks)
+
+        tasks = json.loads(tasks)
+        emit("plan", {"tasks": tasks})
+        sql, result = await run_stage(
+            "execute",
+            self.task_manager.execute_tasks(tasks, context, query_idx, on_event),
+        )
+
+        # 只缓存所有子任务都通过检查的答案
+        if self.answer_cache is not None and all(
+            task.get("verified") for task in tasks.values()
+        ):
+            await self.answer_cache.put(normalized_query, sql)
+
+        return {
+            "normalized_query": normalized_query,
+            "tasks": tasks,
+            "sql": sql,
+            "result": result,
+            "stages": stages,
+            "cached": False,
+        }
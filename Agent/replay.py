@@ -0,0 +1,321 @@
+"""
+LLM 和 MCP 调用的录制与回放。
+
+AGENT_REPLAY_MODE:
+    off     直接调用真实服务 (默认)
+    record  调用真实服务, 并把 请求 -> 响应 以及耗时追加写入 AGENT_REPLAY_PATH
+    replay  不访问网络, 也不启动 MCP 服务, 按请求从录制文件中返回响应
+回放时的模拟延迟: 设置了 AGENT_REPLAY_LATENCY 时每次调用固定等待该秒数,
+否则等待录制时的耗时乘以 AGENT_REPLAY_LATENCY_SCALE (默认 1, 为 0 时不等待)。
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from mcp import types
+
+from lightrag.utils import EmbeddingFunc
+
+MODES = ("off", "record", "replay")
+DEFAULT_CASSETTE_PATH = "./replays/cassette.jsonl"
+
+
+class ReplayMissError(KeyError):
+    """回放模式下找不到与请求对应的录制"""
+
+
+def replay_mode() -> str:
+    mode = os.getenv("AGENT_REPLAY_MODE", "off").lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown AGENT_REPLAY_MODE: {mode}")
+    return mode
+
+
+def _request_key(kind: str, request: Any) -> str:
+    payload = json.dumps(
+        [kind, request], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    录制文件, 每行一条 {key, kind, request, response, latency}。
+    同一请求录制了多次时按顺序依次返回, 用完后重复返回最后一次的响应。
+    embedding 录制另外按单条文本建立索引, 供批次组成不同的请求回放。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._embeddings: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        self._entries[entry["key"]].append(entry)
+        if entry["kind"] == "embedding":
+            for text, vector in zip(entry["request"]["texts"], entry["response"]):
+                self._embeddings[text] = {"vector": vector, "latency": entry["latency"]}
+
+    def record(self, kind: str, request: Any, response: Any, latency: float) -> None:
+        entry = {
+            "key": _request_key(kind, request),
+            "kind": kind,
+            "request": request,
+            "response": response,
+            "latency": latency,
+        }
+        self._add(entry)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def lookup(self, kind: str, request: Any) -> Dict[str, Any]:
+        key = _request_key(kind, request)
+        entries = self._entries.get(key)
+        if not entries:
+            raise ReplayMissError(f"No recorded {kind} response for this request")
+        index = min(self._cursor[key], len(entries) - 1)
+        self._cursor[key] += 1
+        return entries[index]
+
+    def lookup_embeddings(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        逐条查找文本的 embedding。embedding 请求会在并发调用之间合并成批,
+        批次的组成与录制时不一定相同。
+        """
+        missing = [text for text in texts if text not in self._embeddings]
+        if missing:
+            raise ReplayMissError(f"No recorded embedding for {len(missing)} texts")
+        found = [self._embeddings[text] for text in texts]
+        return {
+            "response": [f["vector"] for f in found],
+            "latency": max(f["latency"] for f in found),
+        }
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def get_cassette() -> Cassette:
+    path = os.getenv("AGENT_REPLAY_PATH", DEFAULT_CASSETTE_PATH)
+    cassette = _cassettes.get(path)
+    if cassette is None:
+        cassette = Cassette(path)
+        _cassettes[path] = cassette
+    return cassette
+
+
+async def simulate_latency(entry: Dict[str, Any]) -> None:
+    fixed = os.getenv("AGENT_REPLAY_LATENCY")
+    if fixed is not None:
+        delay = float(fixed)
+    else:
+        delay = entry["latency"] * float(os.getenv("AGENT_REPLAY_LATENCY_SCALE", 1.0))
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def _replay_stream(chunks: List[Dict[str, Any]]):
+    for chunk in chunks:
+        yield ChatCompletionChunk.model_validate(chunk)
+
+
+async def _record_stream(stream, cassette: Cassette, request: Any, start: float):
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk.model_dump(mode="json"))
+        yield chunk
+    cassette.record("chat", request, chunks, time.perf_counter() - start)
+
+
+class _ReplayCompletions:
+    def __init__(self, provider: str, client):
+        self.provider = provider
+        self.client = client
+
+    async def create(self, **kwargs):
+        cassette = get_cassette()
+        request = {"provider": self.provider, **kwargs}
+        stream = kwargs.get("stream", False)
+
+        if replay_mode() == "replay":
+            entry = cassette.lookup("chat", request)
+            await simulate_latency(entry)
+            if stream:
+                return _replay_stream(entry["response"])
+            return ChatCompletion.model_validate(entry["response"])
+
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(**kwargs)
+        if stream:
+            return _record_stream(response, cassette, request, start)
+        cassette.record(
+            "chat",
+            request,
+            response.model_dump(mode="json"),
+            time.perf_counter() - start,
+        )
+        return response
+
+
+class _ReplayChat:
+    def __init__(self, completions: _ReplayCompletions):
+        self.completions = completions
+
+
+class ReplayOpenAIClient:
+    """
+    AsyncOpenAI 的替身, 只实现 chat.completions.create。
+    录制模式下包装真实客户端, 回放模式下 client 为 None, 不会发出任何请求。
+    """
+
+    def __init__(self, provider: str, client=None):
+        self.client = client
+        self.chat = _ReplayChat(_ReplayCompletions(provider, client))
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+
+
+class ReplaySession:
+    """
+    MCP ClientSession 的替身: 录制模式下包装真实会话并记录 list_tools 和 call_tool,
+    回放模式下 session 为 None, 所有结果都从录制文件中读取。
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def initialize(self):
+        if self.session is not None:
+            return await self.session.initialize()
+
+    async def send_ping(self):
+        if self.session is not None:
+            return await self.session.send_ping()
+
+    async def _call(self, kind: str, request: Any, call: Callable, result_type):
+        cassette = get_cassette()
+        if self.session is None:
+            entry = cassette.lookup(kind, request)
+            await simulate_latency(entry)
+            return result_type.model_validate(entry["response"])
+
+        start = time.perf_counter()
+        result = await call()
+        cassette.record(
+            kind,
+            request,
+            result.model_dump(mode="json"),
+            time.perf_counter() - start,
+        )
+        return result
+
+    async def list_tools(self, *args, **kwargs):
+        return await self._call(
+            "mcp_list_tools",
+            {},
+            lambda: self.session.list_tools(*args, **kwargs),
+            types.ListToolsResult,
+        )
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, **kwargs):
+        return await self._call(
+            "mcp_call_tool",
+            {"name": name, "arguments": arguments},
+            lambda: self.session.call_tool(name, arguments, **kwargs),
+            types.CallToolResult,
+        )
+
+
+def replayable_llm_func(func: Callable) -> Callable:
+    """
+    录制 / 回放 LightRAG 的 llm_model_func。
+    只用提示词和 keyword_extraction 作为请求的键, 忽略 hashing_kv 等运行时对象。
+    """
+
+    async def wrapper(prompt, system_prompt=None, history_messages=None, **kwargs):
+        mode = replay_mode()
+        if mode == "off":
+            return await func(
+                prompt,
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+                **kwargs,
+            )
+
+        cassette = get_cassette()
+        request = {
+            "prompt": prompt,
+            "system_prompt": system_prompt,
+            "history_messages": history_messages or [],
+            "keyword_extraction": kwargs.get("keyword_extraction", False),
+        }
+        if mode == "replay":
+            entry = cassette.lookup("lightrag_llm", request)
+            await simulate_latency(entry)
+            return entry["response"]
+
+        start = time.perf_counter()
+        response = await func(
+            prompt,
+            system_prompt=system_prompt,
+            history_messages=history_messages,
+            **kwargs,
+        )
+        cassette.record("lightrag_llm", request, response, time.perf_counter() - start)
+        return response
+
+    return wrapper
+
+
+def replayable_embedding_func(embedding_func: EmbeddingFunc) -> EmbeddingFunc:
+    """录制 / 回放 EmbeddingFunc, 保留其 embedding_dim 和 max_token_size"""
+
+    async def func(texts: List[str], **kwargs) -> np.ndarray:
+        mode = replay_mode()
+        if mode == "off":
+            return await embedding_func(texts, **kwargs)
+
+        cassette = get_cassette()
+        request = {"texts": list(texts)}
+        if mode == "replay":
+            try:
+                entry = cassette.lookup("embedding", request)
+            except ReplayMissError:
+                entry = cassette.lookup_embeddings(request["texts"])
+            await simulate_latency(entry)
+            return np.array(entry["response"], dtype=np.float32)
+
+        start = time.perf_counter()
+        embeddings = await embedding_func(texts, **kwargs)
+        cassette.record(
+            "embedding",
+            request,
+            np.asarray(embeddings).tolist(),
+            time.perf_counter() - start,
+        )
+        return embeddings
+
+    return EmbeddingFunc(
+        embedding_dim=embedding_func.embedding_dim,
+        max_token_size=embedding_func.max_token_size,
+        func=func,
+    )
@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import pipmaster as pm
+
+from lightrag.utils import load_json, logger, write_json
+
+if not pm.is_installed("sqlalchemy"):
+    pm.install("sqlalchemy")
+
+from sqlalchemy import create_engine, func, inspect, select, table  # type: ignore
+
+WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def _singular(name: str) -> str:
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("sses") or name.endswith("xes"):
+        return name[:-2]
+    if name.endswith("s"):
+        return name[:-1]
+    return name
+
+
+class SchemaCatalog:
+    """
+    数据库结构缓存: 通过 SQLAlchemy 一次性读取表、列、类型、主外键和行数。
+
+    结构指纹没有变化时沿用缓存的行数, 不再执行 COUNT(*); 超过 refresh_interval
+    后重新读取结构以检测变化, 变化时 version 加一。
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        cache_path: Optional[str] = None,
+        refresh_interval: float = 300.0,
+    ):
+        if not db_url:
+            raise ValueError("DB_URL is required for the schema catalog")
+        if "pymysql" in db_url and not pm.is_installed("pymysql"):
+            pm.install("pymysql")
+
+        self.db_url = db_url
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.fingerprint: Optional[str] = None
+        self.version = 0
+        self._loaded_at: Optional[float] = None
+        self._engine = None
+        self._lock = asyncio.Lock()
+
+        cached = load_json(cache_path) if cache_path else None
+        if cached and cached.get("db_url") == db_url:
+            self.tables = cached.get("tables", {})
+            self.fingerprint = cached.get("fingerprint")
+
+    def get_engine(self):
+        if self._engine is None:
+            self._engine = create_engine(self.db_url, pool_pre_ping=True)
+        return self._engine
+
+    def _introspect_structure(self) -> Dict[str, Dict[str, Any]]:
+        inspector = inspect(self.get_engine())
+        tables = {}
+        for table_name in inspector.get_table_names():
+            columns = [
+                {
+                    "name": column["name"],
+                    "type": str(column["type"]),
+                    "nullable": bool(column.get("nullable", True)),
+                }
+                for column in inspector.get_columns(table_name)
+            ]
+            primary_key = inspector.get_pk_constraint(table_name).get(
+                "constrained_columns", []
+            )
+            foreign_keys = [
+                {
+                    "columns": fk["constrained_columns"],
+                    "ref_table": fk["referred_table"],
+                    "ref_columns": fk["referred_columns"],
+                }
+                for fk in inspector.get_foreign_keys(table_name)
+            ]
+            tables[table_name] = {
+                "columns": columns,
+                "primary_key": primary_key,
+                "foreign_keys": foreign_keys,
+            }
+        return tables
+
+    def _count_rows(self, table_names: List[str]) -> Dict[str, Optional[int]]:
+        counts = {}
+        with self.get_engine().connect() as conn:
+            for table_name in table_names:
+                try:
+                    counts[table_name] = conn.execute(
+                        select(func.count()).select_from(table(table_name))
+                    ).scalar()
+                except Exception as e:
+                    logger.warning(f"Failed to count rows of {table_name}: {e}")
+                    counts[table_name] = None
+        return counts
+
+    @staticmethod
+    def _fingerprint(tables: Dict[str, Dict[str, Any]]) -> str:
+        payload = json.dumps(tables, sort_keys=True, ensure_ascii=False)
+        return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+    def _refresh_sync(self) -> bool:
+        structure = self._introspect_structure()
+        fingerprint = self._fingerprint(structure)
+        if fingerprint == self.fingerprint and self.tables:
+            return False
+
+        counts = self._count_rows(list(structure.keys()))
+        for table_name, info in structure.items():
+            info["row_count"] = counts.get(table_name)
+        self.tables = structure
+        self.fingerprint = fingerprint
+        if self.cache_path:
+            write_json(
+                {
+                    "db_url": self.db_url,
+                    "fingerprint": fingerprint,
+                    "tables": structure,
+                },
+                self.cache_path,
+            )
+        return True
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        在超过刷新间隔 (或 force) 时重新读取数据库结构, 返回结构是否发生变化
+        """
+        async with self._lock:
+            # 从未读取过时总是读取, 不能依赖 monotonic 时钟的起点
+            if (
+                not force
+                and self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self.refresh_interval
+            ):
+                return False
+            changed = await asyncio.to_thread(self._refresh_sync)
+            self._loaded_at = time.monotonic()
+            if changed:
+                self.version += 1
+                logger.info(
+                    f"Schema catalog loaded: {len(self.tables)} tables (version {self.version})"
+                )
+            return changed
+
+    def table_names(self) -> List[str]:
+        return list(self.tables.keys())
+
+    def column_names(self, table_name: str) -> List[str]:
+        info = self.tables.get(table_name)
+        if info is None:
+            return []
+        return [column["name"] for column in info["columns"]]
+
+    def _score(self, table_name: str, words: set) -> int:
+        lowered = table_name.lower()
+        score = 0
+        if lowered in words or _singular(lowered) in words:
+            score += 3
+        for column in self.column_names(table_name):
+            if column.lower() in words:
+                score += 1
+        return score
+
+    def select_tables(
+        self, description: str, context: str = "", max_tables: int = 5
+    ) -> List[str]:
+        """
+        按任务描述 (权重高) 和检索上下文中出现的表名、列名挑选相关表,
+        并补充与其有外键关联的表
+        """
+        if len(self.tables) <= max_tables:
+            return self.table_names()
+
+        description_words = set(WORD_PATTERN.findall(description.lower()))
+        description_words |= {_singular(word) for word in description_words}
+        context_words = set(WORD_PATTERN.findall(context.lower()))
+        context_words |= {_singular(word) for word in context_words}
+
+        scores = {
+            name: 3 * self._score(name, description_words)
+            + self._score(name, context_words)
+            for name in self.tables
+        }
+        selected = [
+            name
+            for name, score in sorted(scores.items(), key=lambda x: -x[1])
+            if score > 0
+        ][:max_tables]
+
+        for name in list(selected):
+            for fk in self.tables[name]["foreign_keys"]:
+                if len(selected) >= max_tables:
+                    break
+                if fk["ref_table"] in self.tables and fk["ref_table"] not in selected:
+                    selected.append(fk["ref_table"])
+
+        return selected or self.table_names()[:max_tables]
+
+    def describe(self, table_names: Optional[List[str]] = None) -> str:
+        """把表结构格式化为便于 LLM 阅读的文本"""
+        lines = []
+        for table_name in table_names or self.table_names():
+            info = self.tables.get(table_name)
+            if info is None:
+                continue
+            row_count = info.get("row_count")
+            rows = f" ({row_count} rows)" if row_count is not None else ""
+            lines.append(f"Table {table_name}{rows}")
+            for column in info["columns"]:
+                flags = ""
+                if column["name"] in info["primary_key"]:
+                    flags += " PRIMARY KEY"
+                if not column["nullable"]:
+                    flags += " NOT NULL"
+                lines.append(f"  {column['name']} {column['type']}{flags}")
+            for fk in info["foreign_keys"]:
+                lines.append(
+                    f"  FOREIGN KEY ({', '.join(fk['columns'])}) REFERENCES "
+                    f"{fk['ref_table']}({', '.join(fk['ref_columns'])})"
+                )
+        return "\n".join(lines)
+
+    async def relevant_schema(
+        self, description: str, context: str = "", max_tables: int = 5
+    ) -> str:
+        """返回与任务相关的那一部分数据库结构"""
+        await self.refresh()
+        return self.describe(self.select_tables(description, context, max_tables))
+
+    def close(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+
+def catalog_from_env(cache_dir: Optional[str] = None) -> Optional[SchemaCatalog]:
+    """根据 DB_URL 创建数据库结构缓存, 未配置时返回 None"""
+    db_url = os.getenv("DB_URL")
+    if not db_url:
+        return None
+    cache_path = os.path.join(cache_dir, "schema_catalog.json") if cache_dir else None
+    return SchemaCatalog(
+        db_url,
+        cache_path=cache_path,
+        refresh_interval=float(os.getenv("SCHEMA_REFRESH_INTERVAL", 300)),
+    )
@@ -1,20 +1,114 @@
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
-
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from typing import Optional
+from lightrag.tracing import current_span, traced
+from lightrag.utils import compute_mdhash_id, load_json, write_json
+from .llm_client import get_async_client, get_limiter, record_usage
+
+# 出现这些表达时, 查询可能需要多个子任务或嵌套查询, 交给推理模型拆分
+MULTI_STEP_PATTERN = re.compile(
+    r"\b(and|also|then|as well as|respectively|compare|compared|"
+    r"than|who|whose|which|that|where .* (most|least|highest|lowest)|"
+    r"above average|below average|at least one|none of|not in|except|"
+    r"ratio|percentage|proportion|rank|top \d+ .* (of|in) each)\b"
+    r"|[,;，；]|以及|并且|而且|同时|然后|再|分别|各自|比较|对比|"
+    r"高于|低于|超过平均|占比|比例|排名|其中|之后|最.*的.*的",
+    re.IGNORECASE,
+)
+# 简单查询的最大长度: 按空格分词的单词数, 以及不含空格时 (中文) 的字符数
+SIMPLE_MAX_WORDS = 16
+SIMPLE_MAX_CHARS = 30
+
+
+def is_simple_query(query: str) -> bool:
+    """
+    用本地规则判断查询能否用单条 SQL 完成: 足够短, 且不含并列、比较、
+    嵌套等多步骤的表达。不确定时返回 False, 交给推理模型判断。
+    """
+    query = query.strip().rstrip(".。")
+    words = query.split()
+    if len(words) > 1:
+        too_long = len(words) > SIMPLE_MAX_WORDS
+    else:
+        too_long = len(query) > SIMPLE_MAX_CHARS
+    return not too_long and MULTI_STEP_PATTERN.search(query) is None
+
+
+def single_task_plan(query: str) -> dict:
+    return {"task1": {"description": query, "depends_on": [], "sql": "", "result": ""}}
+
+
+def parse_plan(answer: str) -> Optional[dict]:
+    """解析推理模型返回的任务计划, 格式不正确时返回 None"""
+    answer = re.sub(r"```json\s*(.*?)\s*```", r"\1", answer, flags=re.DOTALL)
+    try:
+        plan = json.loads(answer)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(plan, dict) or not plan:
+        return None
+    if not all(
+        isinstance(task, dict) and task.get("description") for task in plan.values()
+    ):
+        return None
+    return plan
+
+
+class PlanCache:
+    """
+    规范化查询 -> 任务计划 的缓存, 相同的查询不再调用推理模型。
+    version 为上下文语料的指纹, 作为键的一部分: 上下文文件变化后旧的计划不再命中,
+    按 LRU 逐渐淘汰。
+    """
 
-def split_query(query, entities=None):
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        max_entries: int = 1024,
+        version: Optional[str] = None,
+    ):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.version = version
+        self._plans: "OrderedDict[str, dict]" = OrderedDict(
+            (load_json(cache_path) if cache_path else None) or {}
+        )
+        self._write_lock = asyncio.Lock()
+
+    def _key(self, query: str) -> str:
+        normalized = " ".join(query.lower().split())
+        return compute_mdhash_id(f"{self.version}:{normalized}", prefix="plan-")
+
+    def get(self, query: str) -> Optional[dict]:
+        key = self._key(query)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+        return plan
+
+    async def put(self, query: str, plan: dict) -> None:
+        key = self._key(query)
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+        if self.cache_path:
+            # 在线程中写文件, 不阻塞事件循环; 按顺序写入, 最后一次写入的总是最新内容
+            async with self._write_lock:
+                await asyncio.to_thread(write_json, dict(self._plans), self.cache_path)
+
+
+@traced("split_query")
+async def split_query(query, entities=None, provider="dashscope"):
     """
     基于陈述性质的查询语句提取相关信息, 由大模型判断SQL的复杂程度
     """
     load_dotenv()
 
-    client = OpenAI(
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        base_url=os.getenv("DASHSCOPE_BASE_URL"),
-        # api_key=os.getenv("API_KEY"),
-        # base_url=os.getenv("BASE_URL"),
-    )
+    client = get_async_client(provider)
 
     reasoning_content = ""  # 记录完整思考
     answer_content = ""  # 记录完整回复
@@ -22,8 +116,8 @@ def split_query(query, entities=None):
 
     system_prompt = f"""
     You are tasked with analyzing a given declarative query and determining whether it should be broken down into multiple subquery tasks when converting it into SQL. 
-    Based on the input query and the retrieved information, you need to decide how many tasks are required and describe each task. 
-    Follow the JSON format below for your response, but leave all fields except the task count and task descriptions empty.
+    Based on the input query and the retrieved information, you need to decide how many tasks are required, describe each task and state which earlier tasks it depends on. 
+    Follow the JSON format below for your response, but leave all fields except the task count, task descriptions and dependencies empty.
 
     Input:
     Query: A declarative statement or question provided as input.
@@ -31,8 +125,8 @@ def split_query(query, entities=None):
 
     Output Format:
     {{
-        "task1": {{ "description": "", "sql": "", "result": "" }},
-        "task2": {{ "description": "", "sql": "", "result": "" }}
+        "task1": {{ "description": "", "depends_on": [], "sql": "", "result": "" }},
+        "task2": {{ "description": "", "depends_on": [], "sql": "", "result": "" }}
     }}
 
     Instructions:
@@ -40,6 +134,7 @@ def split_query(query, entities=None):
     Analyze the complexity of the query and determine if it requires decomposition into multiple subqueries.
     If the query can be handled in a single SQL statement, return only one task with its description.
     If the query requires multiple subqueries, create additional tasks as needed, providing a brief description for each task.
+    In "depends_on", list the ids of the earlier tasks whose SQL or results are needed to write this task's SQL. Use an empty list for tasks that can be solved independently, so that they can be executed in parallel.
     Leave the sql and result fields empty.
 
     Example Input:
@@ -48,8 +143,18 @@ def split_query(query, entities=None):
 
     Example Output:
     {{
-        "task1": {{ "description": "Calculate the total sales for products in the 'Electronics' category with a price above $100.", "sql": "", "result": ""}},
-        "task2": {{ "description": "Identify the top 5 customers who purchased the most from the 'Electronics' category.", "sql": "", "result": "" }}
+        "task1": {{ "description": "Calculate the total sales for products in the 'Electronics' category with a price above $100.", "depends_on": [], "sql": "", "result": ""}},
+        "task2": {{ "description": "Identify the top 5 customers who purchased the most from the 'Electronics' category.", "depends_on": [], "sql": "", "result": "" }}
+    }}
+
+    Example Input:
+    Query: "Find the email of the user who placed the most expensive order."
+    Retrieved Information: {entities}
+
+    Example Output:
+    {{
+        "task1": {{ "description": "Find the user id of the order with the highest total amount.", "depends_on": [], "sql": "", "result": ""}},
+        "task2": {{ "description": "Find the email of the user found in task1.", "depends_on": ["task1"], "sql": "", "result": "" }}
     }}
     """
 
@@ -61,40 +166,78 @@ def split_query(query, entities=None):
     #     ],
     # )
 
-    completion = client.chat.completions.create(
-        model="qwq-plus-latest",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query},
-        ],
-        stream=True,
-    )
+    # 流式响应需要在整个读取过程中占用并发名额
+    async with get_limiter(provider):
+        completion = await client.chat.completions.create(
+            model="qwq-plus-latest",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": query},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
 
-    # answer_content = completion.choices[0].message.content
-
-    for chunk in completion:
-        if not chunk.choices:
-            print("\nUsage:")
-            print(chunk.usage)
-        else:
-            delta = chunk.choices[0].delta
-            if hasattr(delta, "reasoning_content") and delta.reasoning_content != None:
-                # print(delta.reasoning_content, end='', flush=True)
-                reasoning_content += delta.reasoning_content
-            else:
-                if delta.content != "" and is_answering is False:
-                    is_answering = True
+        # answer_content = completion.choices[0].message.content
 
-                # print(delta.content, end='', flush=True)
-                answer_content += delta.content
+        async for chunk in completion:
+            if not chunk.choices:
+                print("\nUsage:")
+                print(chunk.usage)
+                record_usage(chunk.usage)
+            else:
+                delta = chunk.choices[0].delta
+                if (
+                    hasattr(delta, "reasoning_content")
+                    and delta.reasoning_content != None
+                ):
+                    # print(delta.reasoning_content, end='', flush=True)
+                    reasoning_content += delta.reasoning_content
+                else:
+                    if delta.content != "" and is_answering is False:
+                        is_answering = True
+
+                    # print(delta.content, end='', flush=True)
+                    answer_content += delta.content
 
     return answer_content
 
 
+@traced("plan_query")
+async def plan_query(
+    query, entities=None, cache: Optional[PlanCache] = None, provider="dashscope"
+) -> str:
+    """
+    返回查询的任务计划 (JSON 字符串)。依次尝试计划缓存和本地规则,
+    只有可能需要多个子任务的查询才会调用推理模型。
+    """
+    if cache is not None:
+        plan = cache.get(query)
+        current_span().set_attribute("cache_hit", plan is not None)
+        if plan is not None:
+            print("使用缓存的任务计划")
+            return json.dumps(plan, ensure_ascii=False)
+
+    if is_simple_query(query):
+        print("简单查询, 跳过任务拆分")
+        current_span().set_attribute("fast_path", True)
+        return json.dumps(single_task_plan(query), ensure_ascii=False)
+
+    answer = await split_query(query, entities, provider)
+    plan = parse_plan(answer)
+    if plan is None:
+        return answer
+    if cache is not None:
+        await cache.put(query, plan)
+    return json.dumps(plan, ensure_ascii=False)
+
+
 if __name__ == "__main__":
     print(
-        split_query(
-            "查询上海过去一周中午12点的平均气温",
-            "上海过去一周的气温表，记录每一天中午12点的温度",
+        asyncio.run(
+            split_query(
+                "查询上海过去一周中午12点的平均气温",
+                "上海过去一周的气温表，记录每一天中午12点的温度",
+            )
         )
     )
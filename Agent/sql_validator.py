@@ -0,0 +1,209 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import pipmaster as pm
+
+from .schema_catalog import SchemaCatalog
+
+if not pm.is_installed("sqlglot"):
+    pm.install("sqlglot")
+
+import sqlglot  # type: ignore
+from sqlglot import exp  # type: ignore
+from sqlalchemy import text  # type: ignore
+
+# SQLAlchemy 方言名 -> sqlglot 方言名
+DIALECTS = {
+    "mysql": "mysql",
+    "mariadb": "mysql",
+    "sqlite": "sqlite",
+    "postgresql": "postgres",
+    "mssql": "tsql",
+    "oracle": "oracle",
+}
+
+
+class SQLValidator:
+    """
+    在调用 LLM 检查器之前对 SQL 做本地校验:
+    语法解析, 表名和列名是否存在于缓存的数据库结构中, 以及数据库的 EXPLAIN。
+    校验只能发现确定的错误, 通过校验不代表 SQL 的语义正确。
+    """
+
+    def __init__(self, catalog: SchemaCatalog):
+        self.catalog = catalog
+
+    @property
+    def dialect(self) -> Optional[str]:
+        return DIALECTS.get(self.catalog.get_engine().dialect.name)
+
+    def _table_columns(self) -> Dict[str, Set[str]]:
+        return {
+            name.lower(): {column.lower() for column in self.catalog.column_names(name)}
+            for name in self.catalog.table_names()
+        }
+
+    def check_identifiers(self, expression: exp.Expression) -> Optional[str]:
+        """检查引用的表和列是否存在, 返回错误描述或 None"""
+        tables = self._table_columns()
+        cte_names = {cte.alias_or_name.lower() for cte in expression.find_all(exp.CTE)}
+
+        # 别名 -> 真实表名; 子查询和 CTE 的别名映射为 None, 不检查其列
+        aliases: Dict[str, Optional[str]] = {}
+        for table in expression.find_all(exp.Table):
+            name = table.name.lower()
+            if not name:
+                continue
+            if name in cte_names:
+                aliases[table.alias_or_name.lower()] = None
+                continue
+            if name not in tables:
+                return (
+                    f"Table '{table.name}' does not exist in the database. "
+                    f"Available tables: {', '.join(self.catalog.table_names())}."
+                )
+            aliases[table.alias_or_name.lower()] = name
+            aliases.setdefault(name, name)
+        for subquery in expression.find_all(exp.Subquery):
+            if subquery.alias:
+                aliases[subquery.alias.lower()] = None
+
+        select_aliases = {
+            alias.alias.lower() for alias in expression.find_all(exp.Alias)
+        }
+        has_derived = bool(cte_names) or any(
+            value is None for value in aliases.values()
+        )
+        real_tables = {value for value in aliases.values() if value is not None}
+
+        for column in expression.find_all(exp.Column):
+            name = column.name.lower()
+            if not name or isinstance(column.this, exp.Star):
+                continue
+            qualifier = column.table.lower()
+            if qualifier:
+                if qualifier not in aliases:
+                    return f"Column '{column.sql()}' references unknown table or alias '{column.table}'."
+                table_name = aliases[qualifier]
+                if table_name is not None and name not in tables[table_name]:
+                    return (
+                        f"Column '{column.name}' does not exist in table '{table_name}'. "
+                        f"Available columns: {', '.join(self.catalog.column_names(self._original_name(table_name)))}."
+                    )
+            elif not has_derived and name not in select_aliases:
+                if real_tables and not any(name in tables[t] for t in real_tables):
+                    return (
+                        f"Column '{column.name}' does not exist in any of the referenced tables: "
+                        f"{', '.join(sorted(real_tables))}."
+                    )
+        return None
+
+    def _original_name(self, lowered: str) -> str:
+        for name in self.catalog.table_names():
+            if name.lower() == lowered:
+                return name
+        return lowered
+
+    @staticmethod
+    def _database_error(e: Exception) -> str:
+        # 只保留驱动返回的第一行错误信息
+        message = str(getattr(e, "orig", None) or e).splitlines()[0]
+        return f"The database rejected the SQL: {message}"
+
+    def _explain_sync(self, sql: str) -> Optional[str]:
+        engine = self.catalog.get_engine()
+        prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"{prefix} {sql}")
+        except Exception as e:
+            return self._database_error(e)
+        return None
+
+    async def _check(self, sql: str) -> Tuple[Optional[exp.Expression], Optional[str]]:
+        """解析 SQL 并检查表名和列名, 返回 (语句, 错误描述)"""
+        await self.catalog.refresh()
+
+        try:
+            statements = [
+                s for s in sqlglot.parse(sql, read=self.dialect) if s is not None
+            ]
+        except sqlglot.errors.ParseError as e:
+            return None, f"SQL syntax error: {str(e).splitlines()[0]}"
+        except sqlglot.errors.TokenError:
+            # sqlglot 无法切分的 SQL 未必有错 (例如方言特有的字符串写法), 交给检查器判断
+            return None, None
+        if len(statements) != 1:
+            return None, "Expected exactly one SQL statement."
+
+        expression = statements[0]
+        return expression, self.check_identifiers(expression)
+
+    async def validate(self, sql: str) -> Optional[str]:
+        """
+        返回 SQL 中能在本地确定的错误描述, 可直接作为 adjust_sql 的反馈; 没有发现错误时返回 None
+        """
+        sql = sql.strip().rstrip(";")
+        expression, error = await self._check(sql)
+        if error:
+            return error
+
+        # 只对查询语句执行 EXPLAIN, 避免对写操作产生任何影响
+        if isinstance(expression, exp.Query):
+            return await asyncio.to_thread(self._explain_sync, sql)
+        return None
+
+    def _execute_sync(self, sql: str, max_rows: int, timeout: float) -> List[tuple]:
+        engine = self.catalog.get_engine()
+        dialect = engine.dialect.name
+        timeout_ms = int(timeout * 1000)
+        with engine.connect() as conn:
+            # 让数据库在超时后主动终止查询, 而不只是放弃等待
+            if dialect == "sqlite":
+                deadline = time.monotonic() + timeout
+                conn.connection.driver_connection.set_progress_handler(
+                    lambda: time.monotonic() > deadline, 10000
+                )
+            elif dialect in ("mysql", "mariadb"):
+                conn.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {timeout_ms}"))
+            elif dialect == "postgresql":
+                conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            try:
+                # 原样交给驱动执行, 字符串中的 ":word" 和 "::类型转换" 不能被当作绑定参数
+                result = conn.exec_driver_sql(sql)
+                return [tuple(row) for row in result.fetchmany(max_rows)]
+            finally:
+                # 回滚, 不留下任何修改; 并恢复连接池中连接的设置
+                conn.rollback()
+                if dialect == "sqlite":
+                    conn.connection.driver_connection.set_progress_handler(None, 0)
+                elif dialect in ("mysql", "mariadb"):
+                    conn.execute(text("SET SESSION MAX_EXECUTION_TIME = 0"))
+
+    async def execute(
+        self, sql: str, max_rows: int = 100, timeout: float = 10.0
+    ) -> Tuple[Optional[List[tuple]], Optional[str]]:
+        """
+        校验并在本地执行查询语句, 最多取 max_rows 行。
+        返回 (结果行, None), 或校验失败、执行出错、超时时返回 (None, 错误描述)。
+        """
+        sql = sql.strip().rstrip(";")
+        expression, error = await self._check(sql)
+        if error:
+            return None, error
+        if expression is None:
+            return None, "The SQL could not be parsed for local execution."
+        if not isinstance(expression, exp.Query):
+            return None, "Only SELECT queries can be executed locally."
+
+        try:
+            rows = await asyncio.wait_for(
+                asyncio.to_thread(self._execute_sync, sql, max_rows, timeout),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            return None, f"The query did not finish within {timeout:g} seconds."
+        except Exception as e:
+            return None, self._database_error(e)
+        return rows, None
@@ -0,0 +1,356 @@
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from lightrag.base import DocStatus
+from lightrag.utils import logger
+
+# 超过该数量后不再记录去重值, 只保留近似统计
+DISTINCT_LIMIT = 10000
+DATETIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y",
+]
+
+
+def _parse_datetime(value: str) -> Optional[datetime]:
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    non_null: int = 0
+    nulls: int = 0
+    is_integer: bool = True
+    is_real: bool = True
+    is_datetime: bool = True
+    min_value: Any = None
+    max_value: Any = None
+    max_length: int = 0
+    distinct: set = field(default_factory=set)
+    distinct_overflow: bool = False
+    samples: List[str] = field(default_factory=list)
+
+    @property
+    def data_type(self) -> str:
+        if self.non_null == 0:
+            return "TEXT"
+        if self.is_integer:
+            return "INTEGER"
+        if self.is_real:
+            return "REAL"
+        if self.is_datetime:
+            return "DATETIME"
+        return "TEXT"
+
+    @property
+    def distinct_count(self) -> str:
+        count = len(self.distinct)
+        return f">{count}" if self.distinct_overflow else str(count)
+
+    @property
+    def is_unique(self) -> bool:
+        return (
+            not self.distinct_overflow
+            and self.nulls == 0
+            and len(self.distinct) == self.non_null
+        )
+
+    def add(self, value: str, sample_size: int) -> None:
+        value = value.strip()
+        if value == "":
+            self.nulls += 1
+            return
+
+        self.non_null += 1
+        self.max_length = max(self.max_length, len(value))
+
+        if not self.distinct_overflow:
+            if value not in self.distinct and len(self.samples) < sample_size:
+                self.samples.append(value)
+            self.distinct.add(value)
+            if len(self.distinct) > DISTINCT_LIMIT:
+                self.distinct_overflow = True
+                self.distinct = set()
+
+        number = None
+        if self.is_integer:
+            try:
+                number = int(value)
+            except ValueError:
+                self.is_integer = False
+        if number is None and self.is_real:
+            try:
+                number = float(value)
+            except ValueError:
+                self.is_real = False
+        if number is not None:
+            self._update_range(number)
+            return
+
+        if self.is_datetime:
+            parsed = _parse_datetime(value)
+            if parsed is None:
+                self.is_datetime = False
+            else:
+                self._update_range(parsed)
+
+    def _update_range(self, value) -> None:
+        try:
+            if self.min_value is None or value < self.min_value:
+                self.min_value = value
+            if self.max_value is None or value > self.max_value:
+                self.max_value = value
+        except TypeError:
+            # 列中混合了数字和日期, 不再统计范围
+            self.min_value = self.max_value = None
+
+    def describe(self, table_name: str) -> str:
+        parts = [
+            f"Column {self.name} of table {table_name}, type {self.data_type}",
+            f"{self.non_null} non-null values, {self.nulls} nulls, {self.distinct_count} distinct values",
+        ]
+        if self.data_type != "TEXT" and self.min_value is not None:
+            parts.append(f"range {self.min_value} to {self.max_value}")
+        if self.data_type == "TEXT":
+            parts.append(f"max length {self.max_length}")
+        if self.samples:
+            parts.append("sample values: " + ", ".join(self.samples))
+        return "; ".join(parts) + "."
+
+
+@dataclass
+class TableProfile:
+    name: str
+    columns: List[ColumnProfile]
+    row_count: int = 0
+    sample_rows: List[List[str]] = field(default_factory=list)
+
+    @property
+    def primary_key(self) -> Optional[str]:
+        candidates = ["id", f"{_singular(self.name)}_id", f"{self.name}_id"]
+        for column in self.columns:
+            if column.name.lower() in candidates and column.is_unique:
+                return column.name
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """写入 manifest 的精简信息, 供其他表增量导入时识别外键"""
+        return {
+            "name": self.name,
+            "primary_key": self.primary_key,
+            "columns": [column.name for column in self.columns],
+        }
+
+
+def _singular(name: str) -> str:
+    name = name.lower()
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("sses") or name.endswith("xes"):
+        return name[:-2]
+    if name.endswith("s"):
+        return name[:-1]
+    return name
+
+
+def profile_csv(
+    content: str,
+    table_name: str,
+    sample_size: int = 5,
+) -> TableProfile:
+    """逐行扫描 CSV 内容, 统计表头、每列的类型、空值、去重值、取值范围和样例值"""
+    reader = csv.reader(io.StringIO(content))
+    header = next(reader, None)
+    if not header:
+        raise ValueError(f"CSV file for table {table_name} has no header")
+
+    profile = TableProfile(
+        name=table_name,
+        columns=[ColumnProfile(name=column.strip()) for column in header],
+    )
+    for row in reader:
+        if not row:
+            continue
+        profile.row_count += 1
+        if len(profile.sample_rows) < sample_size:
+            profile.sample_rows.append(row)
+        for column, value in zip(profile.columns, row):
+            column.add(value, sample_size)
+    return profile
+
+
+def find_foreign_keys(
+    profile: TableProfile, tables: Dict[str, Dict[str, Any]]
+) -> List[Dict[str, str]]:
+    """
+    根据列名识别外键: 形如 <name>_id 的列指向名为 <name> (或其复数形式) 的表的主键
+    """
+    table_by_singular = {_singular(name): name for name in tables}
+    own_key = profile.primary_key
+    foreign_keys = []
+
+    for column in profile.columns:
+        lowered = column.name.lower()
+        if column.name == own_key or not lowered.endswith("_id"):
+            continue
+        target_table = table_by_singular.get(_singular(lowered[:-3]))
+        if target_table is None or target_table == profile.name:
+            continue
+        target_key = tables[target_table].get("primary_key")
+        if target_key is None:
+            continue
+        foreign_keys.append(
+            {
+                "column": column.name,
+                "ref_table": target_table,
+                "ref_column": target_key,
+            }
+        )
+    return foreign_keys
+
+
+def build_custom_kg(
+    profile: TableProfile, foreign_keys: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """把表结构转换成 ainsert_custom_kg 可用的表/列/外键实体和关系"""
+    table = profile.name
+    source_id = f"table:{table}"
+    primary_key = profile.primary_key
+
+    schema_lines = [
+        f"Table {table} ({profile.row_count} rows)",
+        "Columns:",
+    ]
+    for column in profile.columns:
+        flags = " PRIMARY KEY" if column.name == primary_key else ""
+        schema_lines.append(f"- {column.name} {column.data_type}{flags}")
+    for fk in foreign_keys:
+        schema_lines.append(
+            f"Foreign key: {table}.{fk['column']} references {fk['ref_table']}.{fk['ref_column']}"
+        )
+    if profile.sample_rows:
+        sample = io.StringIO()
+        writer = csv.writer(sample, lineterminator="\n")
+        writer.writerow([column.name for column in profile.columns])
+        writer.writerows(profile.sample_rows)
+        schema_lines.append("Sample rows:")
+        schema_lines.append(sample.getvalue().rstrip("\n"))
+
+    column_names = ", ".join(column.name for column in profile.columns)
+    table_description = f"Database table {table} with {profile.row_count} rows and columns: {column_names}."
+    if primary_key:
+        table_description += f" Primary key: {primary_key}."
+
+    entities = [
+        {
+            "entity_name": table,
+            "entity_type": "table",
+            "description": table_description,
+            "source_id": source_id,
+        }
+    ]
+    relationships = []
+    for column in profile.columns:
+        column_entity = f"{table}.{column.name}"
+        entities.append(
+            {
+                "entity_name": column_entity,
+                "entity_type": "column",
+                "description": column.describe(table),
+                "source_id": source_id,
+            }
+        )
+        relationships.append(
+            {
+                "src_id": table,
+                "tgt_id": column_entity,
+                "description": f"Table {table} has column {column.name} ({column.data_type}).",
+                "keywords": "table column, schema",
+                "weight": 1.0,
+                "source_id": source_id,
+            }
+        )
+
+    for fk in foreign_keys:
+        src = f"{table}.{fk['column']}"
+        tgt = f"{fk['ref_table']}.{fk['ref_column']}"
+        relationships.append(
+            {
+                "src_id": src,
+                "tgt_id": tgt,
+                "description": f"{src} is a foreign key referencing {tgt}; join {table} with {fk['ref_table']} on this column.",
+                "keywords": "foreign key, join",
+                "weight": 2.0,
+                "source_id": source_id,
+            }
+        )
+
+    return {
+        "chunks": [
+            {
+                "content": "\n".join(schema_lines),
+                "source_id": source_id,
+                "chunk_order_index": 0,
+            }
+        ],
+        "entities": entities,
+        "relationships": relationships,
+    }
+
+
+def table_name_for(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+async def ingest_table(
+    rag,
+    profile: TableProfile,
+    foreign_keys: List[Dict[str, str]],
+    doc_id: str,
+    file_path: str,
+) -> None:
+    """
+    不经过分块和 LLM 实体抽取, 直接把表结构写入图和向量存储,
+    并登记文档状态, 使其可以像普通文档一样被删除和去重
+    """
+    custom_kg = build_custom_kg(profile, foreign_keys)
+    await rag.ainsert_custom_kg(custom_kg, full_doc_id=doc_id, file_path=file_path)
+
+    summary = custom_kg["chunks"][0]["content"]
+    now = datetime.now().isoformat()
+    await rag.doc_status.upsert(
+        {
+            doc_id: {
+                "status": DocStatus.PROCESSED,
+                "content": summary,
+                "content_summary": summary[:250],
+                "content_length": len(summary),
+                "chunks_count": 1,
+                "created_at": now,
+                "updated_at": now,
+                "file_path": file_path,
+            }
+        }
+    )
+    await rag.doc_status.index_done_callback()
+    logger.info(
+        f"Ingested table {profile.name}: {len(profile.columns)} columns, "
+        f"{len(foreign_keys)} foreign keys"
+    )
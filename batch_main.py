@@ -0,0 +1,213 @@
+import os
+import asyncio
+import argparse
+import json
+import math
+import time
+import traceback
+
+from dotenv import load_dotenv
+
+from Agent.pipeline import Text2SQL
+
+from lightrag.utils import setup_logger
+
+setup_logger("lightrag", level="INFO")
+
+STAGES = ["normalize", "cache", "retrieve", "split", "execute"]
+
+
+def percentile(values, p):
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(math.ceil(p / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+
+def load_checkpoint(output_path):
+    """读取已完成的结果, 返回 {query_idx: record}; 文件末尾被截断的行会被忽略"""
+    records = {}
+    if not os.path.exists(output_path):
+        return records
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["query_idx"]] = record
+    return records
+
+
+def iter_queries(queries_path):
+    """逐行读取 queries.jsonl, 不把整个文件读入内存"""
+    with open(queries_path, "r", encoding="utf-8") as f:
+        for query_idx, line in enumerate(f):
+            line = line.strip()
+            if line:
+                yield query_idx, json.loads(line)
+
+
+def summarize(records, wall_time, processed):
+    """统计吞吐量, 端到端及各阶段的 p50/p95 延迟和 token 用量"""
+    finished = [r for r in records if r.get("error") is None]
+    latencies = [r["latency"] for r in finished]
+
+    summary = {
+        "queries": len(records),
+        "succeeded": len(finished),
+        "failed": len(records) - len(finished),
+        "processed_this_run": processed,
+        "wall_time": wall_time,
+        "throughput_qps": processed / wall_time if wall_time > 0 else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "cache_hits": sum(1 for r in finished if r.get("cached")),
+        "stages": {},
+    }
+
+    for stage in STAGES:
+        stage_records = [
+            r["stages"][stage] for r in records if stage in r.get("stages", {})
+        ]
+        stage_latencies = [s["latency"] for s in stage_records]
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "call_count": 0,
+        }
+        for s in stage_records:
+            for key in usage:
+                usage[key] += s["usage"].get(key, 0)
+        summary["stages"][stage] = {
+            "count": len(stage_records),
+            "latency_p50": percentile(stage_latencies, 50),
+            "latency_p95": percentile(stage_latencies, 95),
+            "usage": usage,
+        }
+    return summary
+
+
+async def run_batch(
+    queries_path,
+    output_path,
+    workers=4,
+    retrieval_mode="hybrid",
+    retry_failed=False,
+    limit=None,
+):
+    load_dotenv()
+
+    done = load_checkpoint(output_path)
+    skip = {
+        idx
+        for idx, record in done.items()
+        if record.get("error") is None or not retry_failed
+    }
+    print(f"已完成 {len(skip)} 条, 从断点继续")
+
+    text2sql = Text2SQL()
+    await text2sql.initialize()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    queue = asyncio.Queue(maxsize=workers * 2)
+    processed = 0
+
+    async def producer():
+        submitted = 0
+        for query_idx, query in iter_queries(queries_path):
+            if limit is not None and submitted >= limit:
+                break
+            if query_idx in skip:
+                continue
+            await queue.put((query_idx, query))
+            submitted += 1
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def worker(out):
+        nonlocal processed
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            query_idx, query = item
+            print(f"查询问题 [{query_idx}]: {query['problem']}")
+
+            record = {"query_idx": query_idx, "problem": query["problem"]}
+            start = time.perf_counter()
+            try:
+                output = await text2sql.run_query(
+                    query["problem"], query_idx, retrieval_mode
+                )
+                record.update(
+                    {
+                        "normalized_query": output["normalized_query"],
+                        "sql": output["sql"],
+                        "result": output["result"],
+                        "stages": output["stages"],
+                        "cached": output["cached"],
+                        "error": None,
+                    }
+                )
+            except Exception as e:
+                traceback.print_exc()
+                record.update({"stages": {}, "error": str(e)})
+            record["latency"] = time.perf_counter() - start
+
+            # 每条结果立即落盘, 进程崩溃后可从断点恢复
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            done[query_idx] = record
+            processed += 1
+
+    start = time.perf_counter()
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            await asyncio.gather(producer(), *(worker(out) for _ in range(workers)))
+    finally:
+        await text2sql.cleanup()
+    wall_time = time.perf_counter() - start
+
+    summary = summarize(list(done.values()), wall_time, processed)
+    summary_path = os.path.splitext(output_path)[0] + "_summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+    print(json.dumps(summary, ensure_ascii=False, indent=4))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Text2SQL batch runner")
+    parser.add_argument("--queries", default="./data/queries.jsonl")
+    parser.add_argument("--output", default="./outputs/batch_results.jsonl")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--mode",
+        default="hybrid",
+        choices=["local", "global", "hybrid", "naive", "mix"],
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Re-run queries whose checkpointed result is an error",
+    )
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    asyncio.run(
+        run_batch(
+            args.queries,
+            args.output,
+            workers=args.workers,
+            retrieval_mode=args.mode,
+            retry_failed=args.retry_failed,
+            limit=args.limit,
+        )
+    )
@@ -0,0 +1,378 @@
+"""
+基准测试使用的本地桩: OpenAI 兼容的 LLM 客户端、基于 SQLite 的 MCP 会话、
+LightRAG 的 LLM / embedding 函数以及离线可用的 tokenizer。
+所有桩都按配置的延迟等待后返回确定的结果, 不访问网络。
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from Agent.CheckAgent import CheckAgent
+from lightrag.utils import EmbeddingFunc, Tokenizer, TiktokenTokenizer
+
+
+class ByteTokenizer:
+    """按 UTF-8 字节切分, 在无法下载 tiktoken 词表时使用, token 数约为真实值的 4 倍"""
+
+    def encode(self, content: str) -> List[int]:
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens: List[int]) -> str:
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+def offline_tokenizer() -> Tokenizer:
+    try:
+        tokenizer = TiktokenTokenizer()
+        tokenizer.encode("probe")
+        return tokenizer
+    except Exception:
+        return Tokenizer("bytes", ByteTokenizer())
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _completion(content: str, prompt: str, tool_calls=None) -> ChatCompletion:
+    message: Dict[str, Any] = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return ChatCompletion.model_validate(
+        {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                    "message": message,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": _estimate_tokens(prompt),
+                "completion_tokens": _estimate_tokens(content or ""),
+                "total_tokens": _estimate_tokens(prompt)
+                + _estimate_tokens(content or ""),
+            },
+        }
+    )
+
+
+async def _stream(content: str, prompt: str):
+    base = {"id": "stub", "object": "chat.completion.chunk", "created": 0}
+    yield ChatCompletionChunk.model_validate(
+        {
+            **base,
+            "model": "stub",
+            "choices": [
+                {"index": 0, "delta": {"reasoning_content": "Analyzing the query."}}
+            ],
+        }
+    )
+    yield ChatCompletionChunk.model_validate(
+        {
+            **base,
+            "model": "stub",
+            "choices": [{"index": 0, "delta": {"content": content}}],
+        }
+    )
+    yield ChatCompletionChunk.model_validate(
+        {
+            **base,
+            "model": "stub",
+            "choices": [],
+            "usage": {
+                "prompt_tokens": _estimate_tokens(prompt),
+                "completion_tokens": _estimate_tokens(content),
+                "total_tokens": _estimate_tokens(prompt) + _estimate_tokens(content),
+            },
+        }
+    )
+
+
+class Corpus:
+    """
+    基准问题集, 每行一个问题:
+    {"question": ..., "sql": ..., "first_sql": 可选, 第一次生成的错误 SQL}
+    或多任务问题 {"question": ..., "tasks": [{"description", "sql", "depends_on"}]}
+    """
+
+    def __init__(self, questions: List[Dict[str, Any]]):
+        self.questions = questions
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._fixes: Dict[str, str] = {}
+        for question in questions:
+            for task in self.tasks_of(question):
+                self._tasks[task["description"]] = task
+                if task.get("first_sql"):
+                    self._fixes[task["first_sql"]] = task["sql"]
+
+    @classmethod
+    def load(cls, path: str) -> "Corpus":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    @staticmethod
+    def tasks_of(question: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if "tasks" in question:
+            return question["tasks"]
+        return [
+            {
+                "description": question["question"],
+                "sql": question["sql"],
+                "first_sql": question.get("first_sql"),
+            }
+        ]
+
+    def plan(self, query: str) -> Dict[str, Any]:
+        question = next((q for q in self.questions if q["question"] == query), None)
+        tasks = self.tasks_of(question) if question else [{"description": query}]
+        return {
+            f"task{i}": {
+                "description": task["description"],
+                "depends_on": task.get("depends_on", []),
+                "sql": "",
+                "result": "",
+            }
+            for i, task in enumerate(tasks, 1)
+        }
+
+    def task(self, description: str) -> Optional[Dict[str, Any]]:
+        return self._tasks.get(description.strip())
+
+    def fix(self, sql: str) -> str:
+        return self._fixes.get(sql.strip(), sql)
+
+
+class StubLLMClient:
+    """
+    OpenAI 兼容的桩客户端, 按系统提示词识别调用方 (Normalizer, split_query,
+    SQLAgent, CheckAgent) 并根据问题集返回确定的回复
+    """
+
+    def __init__(self, corpus: Corpus, latency: float = 0.0):
+        self.corpus = corpus
+        self.latency = latency
+        self.chat = self
+        self.completions = self
+        self.calls = 0
+        self._generated = defaultdict(int)
+
+    def reset(self) -> None:
+        """每个问题开始前调用, 让第一次生成重新返回 first_sql"""
+        self._generated.clear()
+
+    async def close(self) -> None:
+        pass
+
+    async def create(self, messages: List[Dict[str, Any]], **kwargs):
+        self.calls += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+        user = next(m["content"] for m in messages if m["role"] == "user")
+        prompt = json.dumps(messages, ensure_ascii=False, default=str)
+
+        if kwargs.get("stream"):
+            plan = self.corpus.plan(user.strip())
+            return _stream(json.dumps(plan, ensure_ascii=False), prompt)
+
+        if kwargs.get("tools"):
+            return self._check(messages, user, prompt)
+
+        if "normalization assistant" in system or "规范化助手" in system:
+            query = user.split(": ", 1)[1].strip()
+            words = re.findall(r"[A-Za-z_]+", query)
+            content = json.dumps(
+                {
+                    "normalized_query": query,
+                    "high_level_keywords": words[:2],
+                    "low_level_keywords": words[2:8],
+                }
+            )
+            return _completion(content, prompt)
+
+        if "SQL adjustment expert" in system or "SQL 调整专家" in system:
+            sql = re.search(r"Original SQL：?:?\s*(.*)", user).group(1).strip()
+            return _completion(self.corpus.fix(sql), prompt)
+
+        if "SQL generation expert" in system or "SQL 生成专家" in system:
+            description = re.search(r"Task Description:\s*(.*)", user).group(1)
+            task = self.corpus.task(description) or {"sql": "SELECT 1"}
+            self._generated[description] += 1
+            if task.get("first_sql") and self._generated[description] == 1:
+                return _completion(task["first_sql"], prompt)
+            return _completion(task["sql"], prompt)
+
+        return _completion("", prompt)
+
+    def _check(self, messages, user, prompt):
+        tool_messages = [m for m in messages if m["role"] == "tool"]
+        if not tool_messages:
+            sql = re.search(r"SQL Query:\s*(.*)", user).group(1).strip()
+            tool_call = {
+                "id": f"call_{self.calls}",
+                "type": "function",
+                "function": {
+                    "name": "execute_query",
+                    "arguments": json.dumps({"query": sql}),
+                },
+            }
+            return _completion(None, prompt, [tool_call])
+
+        result = tool_messages[-1]["content"]
+        if result.startswith("Error"):
+            content = (
+                f"Result: {result}\nMatch: False\nCheck completed: True\n"
+                "Adjustment: The SQL failed to execute, check the table and column names."
+            )
+        else:
+            content = (
+                f"Result: {result[:200]}\nMatch: True\nCheck completed: True\n"
+                "Adjustment: None"
+            )
+        return _completion(content, prompt)
+
+
+class SQLiteMCPServer:
+    """模拟 mcp-alchemy 的四个工具, 在本地 SQLite 数据库上执行"""
+
+    def __init__(self, db_path: str, latency: float = 0.0, max_rows: int = 500):
+        self.db_path = db_path
+        self.latency = latency
+        self.max_rows = max_rows
+        self.calls = 0
+
+    def session(self) -> "SQLiteMCPSession":
+        return SQLiteMCPSession(self)
+
+    def _tables(self, conn) -> List[str]:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def run_tool(self, name: str, arguments: Dict[str, Any]) -> str:
+        with sqlite3.connect(self.db_path) as conn:
+            if name == "all_table_names":
+                return ", ".join(self._tables(conn))
+            if name == "filter_table_names":
+                keyword = arguments.get("q", "")
+                return ", ".join(t for t in self._tables(conn) if keyword in t)
+            if name == "schema_definitions":
+                lines = []
+                for table in arguments.get("table_names", []):
+                    lines.append(f"{table}:")
+                    for column in conn.execute(f"PRAGMA table_info({table})"):
+                        lines.append(f"    {column[1]}: {column[2]}")
+                return "\n".join(lines)
+            if name == "execute_query":
+                cursor = conn.execute(arguments["query"])
+                columns = [c[0] for c in cursor.description or []]
+                rows = cursor.fetchmany(self.max_rows)
+                lines = []
+                for i, row in enumerate(rows, 1):
+                    lines.append(f"{i}. row")
+                    lines.extend(f"{c}: {v}" for c, v in zip(columns, row))
+                    lines.append("")
+                lines.append(f"Result: {len(rows)} rows")
+                return "\n".join(lines)
+        raise ValueError(f"Unknown tool: {name}")
+
+
+class SQLiteMCPSession:
+    def __init__(self, server: SQLiteMCPServer):
+        self.server = server
+
+    async def initialize(self):
+        pass
+
+    async def send_ping(self):
+        pass
+
+    async def list_tools(self):
+        names = [
+            "all_table_names",
+            "filter_table_names",
+            "schema_definitions",
+            "execute_query",
+        ]
+        # 只提供 BaseClient 用到的字段, 不依赖 mcp 类型在不同版本中的字段名
+        return SimpleNamespace(
+            tools=[
+                SimpleNamespace(
+                    name=name, description=name, inputSchema={"type": "object"}
+                )
+                for name in names
+            ]
+        )
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, **kwargs):
+        self.server.calls += 1
+        if self.server.latency > 0:
+            await asyncio.sleep(self.server.latency)
+        try:
+            text = await asyncio.to_thread(self.server.run_tool, name, arguments or {})
+            is_error = False
+        except Exception as e:
+            text, is_error = f"Error: {e}", True
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], isError=is_error)
+
+
+def stub_check_agent_cls(server: SQLiteMCPServer, tokenizer: Tokenizer):
+    """返回连接到 SQLite 桩服务而不是 uvx 启动的 mcp-alchemy 的 CheckAgent"""
+
+    class StubCheckAgent(CheckAgent):
+        async def connect_to_server(self, command, args, env=None) -> None:
+            self.session = server.session()
+            self.context_budget._tokenizer = tokenizer
+            self._tools = None
+            await self.get_tools()
+
+    return StubCheckAgent
+
+
+def stub_lightrag_llm(latency: float = 0.0):
+    """LightRAG 的 llm_model_func 桩: 关键词提取返回空关键词, 其他调用返回空字符串"""
+
+    async def llm_func(prompt, system_prompt=None, history_messages=None, **kwargs):
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if kwargs.get("keyword_extraction"):
+            return json.dumps({"high_level_keywords": [], "low_level_keywords": []})
+        return ""
+
+    return llm_func
+
+
+def stub_embedding(dim: int = 64, latency: float = 0.0) -> EmbeddingFunc:
+    """把词哈希到固定维度的确定性 embedding, 相同的词得到相近的向量"""
+
+    async def embed(texts: List[str], **kwargs) -> np.ndarray:
+        if latency > 0:
+            await asyncio.sleep(latency)
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                vectors[i, digest[0] % dim] += 1.0
+            norm = np.linalg.norm(vectors[i])
+            if norm > 0:
+                vectors[i] /= norm
+        return vectors
+
+    return EmbeddingFunc(embedding_dim=dim, max_token_size=8192, func=embed)
@@ -0,0 +1,359 @@
+import os
+import asyncio
+import argparse
+import csv
+import json
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+import traceback
+
+from Agent.pipeline import Text2SQL
+from Agent.manage import MCP_SERVER_ARGS, MCP_SERVER_COMMAND
+from Agent.SessionPool import MCPSessionPool
+from Agent.context_selector import ContextSelector
+from Agent.split_query import PlanCache
+from Agent.llm_client import register_client
+from batch_main import STAGES, percentile
+from benchmark.stubs import (
+    Corpus,
+    SQLiteMCPServer,
+    StubLLMClient,
+    offline_tokenizer,
+    stub_check_agent_cls,
+    stub_embedding,
+    stub_lightrag_llm,
+)
+
+from lightrag.lightrag import LightRAG
+from lightrag.kg.shared_storage import initialize_pipeline_status
+from lightrag.tracing import configure_tracing, export_chrome_trace
+from lightrag.utils import setup_logger
+
+setup_logger("lightrag", level="WARNING")
+
+MODES = ["local", "global", "hybrid", "naive", "mix"]
+CITIES = ["Shanghai", "Beijing", "Shenzhen", "Hangzhou", "Chengdu"]
+CATEGORIES = ["Books", "Electronics", "Clothing", "Home", "Toys"]
+PRODUCTS = ["Laptop", "Phone", "Novel", "Jacket", "Lamp", "Puzzle", "Monitor"]
+USERNAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi"]
+
+
+def build_database(data_dir, seed=0, num_users=50, num_products=20, num_orders=300):
+    """生成固定种子的 SQLite 电商数据库, 并把每张表导出为 CSV 作为 RAG 上下文"""
+    rng = random.Random(seed)
+    users = [
+        (
+            i,
+            USERNAMES[i - 1] if i <= len(USERNAMES) else f"user{i}",
+            f"user{i}@example.com",
+            rng.choice(CITIES),
+            f"{rng.choice([2022, 2023, 2024])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        )
+        for i in range(1, num_users + 1)
+    ]
+    products = [
+        (
+            i,
+            PRODUCTS[i - 1] if i <= len(PRODUCTS) else f"product{i}",
+            rng.choice(CATEGORIES),
+            round(rng.uniform(5, 2000), 2),
+        )
+        for i in range(1, num_products + 1)
+    ]
+    orders = []
+    for i in range(1, num_orders + 1):
+        product = rng.choice(products)
+        quantity = rng.randint(1, 5)
+        orders.append(
+            (
+                i,
+                rng.randint(1, num_users - 5),
+                product[0],
+                quantity,
+                round(product[3] * quantity, 2),
+                f"{rng.choice([2023, 2024])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            )
+        )
+
+    tables = {
+        "users": (
+            "user_id INTEGER PRIMARY KEY, username TEXT, email TEXT, city TEXT, created_at TEXT",
+            ["user_id", "username", "email", "city", "created_at"],
+            users,
+        ),
+        "products": (
+            "product_id INTEGER PRIMARY KEY, name TEXT, category TEXT, price REAL",
+            ["product_id", "name", "category", "price"],
+            products,
+        ),
+        "orders": (
+            "order_id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, "
+            "quantity INTEGER, total_amount REAL, order_date TEXT",
+            [
+                "order_id",
+                "user_id",
+                "product_id",
+                "quantity",
+                "total_amount",
+                "order_date",
+            ],
+            orders,
+        ),
+    }
+
+    db_path = os.path.join(data_dir, "benchmark.db")
+    context_files = []
+    with sqlite3.connect(db_path) as conn:
+        for name, (columns, header, rows) in tables.items():
+            conn.execute(f"CREATE TABLE {name} ({columns})")
+            placeholders = ", ".join("?" for _ in header)
+            conn.executemany(f"INSERT INTO {name} VALUES ({placeholders})", rows)
+
+            csv_path = os.path.join(data_dir, f"{name}.csv")
+            with open(csv_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+            context_files.append(csv_path)
+    return db_path, context_files
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def summarize_mode(records):
+    """统计某个检索模式下端到端和各阶段的 p50/p95 延迟、LLM 调用、token、MCP 调用和重试次数"""
+    finished = [r for r in records if r["error"] is None]
+    latencies = [r["latency"] for r in finished]
+    summary = {
+        "queries": len(records),
+        "succeeded": len(finished),
+        "verified": sum(1 for r in finished if r["verified"]),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "llm_calls": sum(r["llm_calls"] for r in records),
+        "mcp_calls": sum(r["mcp_calls"] for r in records),
+        "retries": sum(r["retries"] for r in records),
+        "validation_failures": sum(r["validation_failures"] for r in records),
+        "stages": {},
+    }
+    for stage in STAGES:
+        stage_records = [r["stages"][stage] for r in records if stage in r["stages"]]
+        if not stage_records:
+            continue
+        stage_latencies = [s["latency"] for s in stage_records]
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "call_count": 0,
+        }
+        for s in stage_records:
+            for key in usage:
+                usage[key] += s["usage"].get(key, 0)
+        summary["stages"][stage] = {
+            "count": len(stage_records),
+            "latency_p50": percentile(stage_latencies, 50),
+            "latency_p95": percentile(stage_latencies, 95),
+            "usage": usage,
+        }
+    return summary
+
+
+async def run_benchmark(
+    questions_path,
+    output_path,
+    modes=MODES,
+    llm_latency=0.05,
+    mcp_latency=0.01,
+    embed_latency=0.01,
+    warm_caches=False,
+    pool_size=2,
+    seed=0,
+    trace_path=None,
+):
+    corpus = Corpus.load(questions_path)
+    if trace_path:
+        configure_tracing(enabled=True)
+    tokenizer = offline_tokenizer()
+    work_dir = tempfile.mkdtemp(prefix="text2sql_bench_")
+    db_path, context_files = build_database(work_dir, seed)
+
+    # 所有外部依赖都换成本地桩: 数据库为 SQLite, LLM 和 MCP 服务按配置的延迟返回
+    os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ["AGENT_REPLAY_MODE"] = "off"
+    os.environ["LANGUAGE"] = "en"
+
+    llm_client = StubLLMClient(corpus, latency=llm_latency)
+    register_client("default", llm_client)
+    register_client("dashscope", llm_client)
+    mcp_server = SQLiteMCPServer(db_path, latency=mcp_latency)
+
+    rag_dir = os.path.join(work_dir, "rag_storage")
+    os.makedirs(rag_dir, exist_ok=True)
+    rag = LightRAG(
+        working_dir=rag_dir,
+        llm_model_func=stub_lightrag_llm(llm_latency),
+        embedding_func=stub_embedding(latency=embed_latency),
+        tokenizer=tokenizer,
+    )
+    await rag.initialize_storages()
+    await initialize_pipeline_status()
+
+    text2sql = Text2SQL(rag)
+    await text2sql.initialize(context_files)
+    task_manager = text2sql.task_manager
+    task_manager.save_path = os.path.join(work_dir, "outputs", "tasks_{query_idx}.json")
+    task_manager.check_pool = MCPSessionPool(
+        command=MCP_SERVER_COMMAND,
+        args=MCP_SERVER_ARGS,
+        size=pool_size,
+        client_cls=stub_check_agent_cls(mcp_server, tokenizer),
+    )
+    max_tokens = int(os.getenv("SQL_CONTEXT_MAX_TOKENS", 2000))
+    if max_tokens > 0:
+        task_manager.context_selector = ContextSelector(max_tokens, tokenizer)
+    text2sql.plan_cache = PlanCache()
+
+    results = {}
+    try:
+        for mode in modes:
+            records = []
+            for query_idx, question in enumerate(corpus.questions):
+                if not warm_caches:
+                    text2sql.plan_cache = PlanCache()
+                llm_client.reset()
+                llm_calls, mcp_calls = llm_client.calls, mcp_server.calls
+                events = []
+                record = {"mode": mode, "query_idx": query_idx, **question}
+
+                start = time.perf_counter()
+                try:
+                    output = await text2sql.run_query(
+                        question["question"],
+                        query_idx,
+                        mode,
+                        on_event=lambda event, data: events.append(event),
+                    )
+                    tasks = output["tasks"] or {}
+                    record.update(
+                        {
+                            "final_sql": output["sql"],
+                            "stages": output["stages"],
+                            "verified": bool(tasks)
+                            and all(t.get("verified") for t in tasks.values()),
+                            "error": None,
+                        }
+                    )
+                except Exception as e:
+                    traceback.print_exc()
+                    record.update({"stages": {}, "verified": False, "error": str(e)})
+                record.update(
+                    {
+                        "latency": time.perf_counter() - start,
+                        "llm_calls": llm_client.calls - llm_calls,
+                        "mcp_calls": mcp_server.calls - mcp_calls,
+                        "retries": events.count("sql_adjusted"),
+                        "validation_failures": events.count("validation_failed"),
+                        "checks": events.count("check"),
+                    }
+                )
+                records.append(record)
+            results[mode] = {"summary": summarize_mode(records), "records": records}
+    finally:
+        await text2sql.cleanup()
+        await rag.finalize_storages()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "questions": questions_path,
+            "modes": list(modes),
+            "llm_latency": llm_latency,
+            "mcp_latency": mcp_latency,
+            "embed_latency": embed_latency,
+            "warm_caches": warm_caches,
+            "pool_size": pool_size,
+            "seed": seed,
+            "trace": trace_path,
+            "tokenizer": tokenizer.model_name,
+        },
+        "modes": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4, default=str)
+    if trace_path:
+        spans = export_chrome_trace(trace_path)
+        print(f"Wrote {spans} spans to {trace_path}")
+
+    print(
+        json.dumps(
+            {mode: result["summary"] for mode, result in results.items()},
+            ensure_ascii=False,
+            indent=4,
+        )
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end Text2SQL benchmark with stub LLM and MCP services"
+    )
+    parser.add_argument("--questions", default="./benchmark/questions.jsonl")
+    parser.add_argument("--output", default="./outputs/benchmark.json")
+    parser.add_argument(
+        "--modes", nargs="+", default=MODES, choices=MODES, help="LightRAG query modes"
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.05, help="Seconds per stub LLM call"
+    )
+    parser.add_argument(
+        "--mcp-latency", type=float, default=0.01, help="Seconds per stub MCP tool call"
+    )
+    parser.add_argument(
+        "--embed-latency",
+        type=float,
+        default=0.01,
+        help="Seconds per stub embedding call",
+    )
+    parser.add_argument(
+        "--warm-caches",
+        action="store_true",
+        help="Keep the plan cache between questions and modes",
+    )
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Write the tracing spans of the whole run to this Chrome trace file",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(
+        run_benchmark(
+            args.questions,
+            args.output,
+            modes=args.modes,
+            llm_latency=args.llm_latency,
+            mcp_latency=args.mcp_latency,
+            embed_latency=args.embed_latency,
+            warm_caches=args.warm_caches,
+            pool_size=args.pool_size,
+            seed=args.seed,
+            trace_path=args.trace,
+        )
+    )
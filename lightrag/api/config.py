@@ -299,6 +299,9 @@ def parse_args() -> argparse.Namespace:
     )
     args.enable_llm_cache = get_env_value("ENABLE_LLM_CACHE", True, bool)
 
+    # Mount the Text2SQL routes (requires the Agent package and DB_URL)
+    args.enable_text2sql = get_env_value("ENABLE_TEXT2SQL", False, bool)
+
     # Inject LLM temperature configuration
     args.temperature = get_env_value("TEMPERATURE", 0.5, float)
 
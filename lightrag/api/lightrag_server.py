@@ -144,6 +144,8 @@ def create_app(args):
 
         finally:
             # Clean up database connections
+            if text2sql is not None:
+                await text2sql.cleanup()
             await rag.finalize_storages()
 
     # Initialize FastAPI
@@ -353,6 +355,15 @@ def create_app(args):
     app.include_router(create_query_routes(rag, api_key, args.top_k))
     app.include_router(create_graph_routes(rag, api_key))
 
+    # Add Text2SQL routes
+    text2sql = None
+    if args.enable_text2sql:
+        from Agent.pipeline import Text2SQL
+        from lightrag.api.routers.text2sql_routes import create_text2sql_routes
+
+        text2sql = Text2SQL(rag)
+        app.include_router(create_text2sql_routes(text2sql, api_key))
+
     # Add Ollama API routes
     ollama_api = OllamaAPI(rag, top_k=args.top_k, api_key=api_key)
     app.include_router(ollama_api.router, prefix="/api")
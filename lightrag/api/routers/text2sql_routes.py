@@ -0,0 +1,166 @@
+"""
+This module contains the Text2SQL routes for the LightRAG API.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+
+from ..utils_api import get_combined_auth_dependency
+
+from ascii_colors import trace_exception
+
+router = APIRouter(tags=["text2sql"])
+
+
+class Text2SQLRequest(BaseModel):
+    query: str = Field(
+        min_length=1,
+        description="The natural language question to answer with SQL",
+    )
+
+    mode: Literal["local", "global", "hybrid", "naive", "mix"] = Field(
+        default="hybrid",
+        description="Retrieval mode used to collect context for SQL generation",
+    )
+
+    @field_validator("query", mode="after")
+    @classmethod
+    def query_strip_after(cls, query: str) -> str:
+        return query.strip()
+
+
+class Text2SQLResponse(BaseModel):
+    normalized_query: str = Field(description="The normalized question")
+    sql: Optional[str] = Field(description="The final SQL statement")
+    result: Any = Field(description="The result returned by the final SQL")
+    tasks: Optional[Dict[str, Any]] = Field(
+        default=None, description="The executed task plan"
+    )
+    stages: Dict[str, Any] = Field(description="Latency and token usage per stage")
+    cached: bool = Field(description="Whether the answer came from the answer cache")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def create_text2sql_routes(text2sql, api_key: Optional[str] = None):
+    """
+    Create routes running the full Text2SQL pipeline on top of the server's LightRAG instance.
+
+    Args:
+        text2sql: An uninitialized `Agent.pipeline.Text2SQL` sharing the server's LightRAG instance.
+            It is initialized on the first request, after the server storages are ready.
+        api_key (Optional[str]): API key for authentication.
+    """
+    combined_auth = get_combined_auth_dependency(api_key)
+    init_lock = asyncio.Lock()
+    initialized = False
+
+    async def ensure_initialized():
+        nonlocal initialized
+        async with init_lock:
+            if not initialized:
+                # Documents are managed by the server, no context files to sync here
+                await text2sql.initialize(context_files=None)
+                initialized = True
+
+    @router.post(
+        "/text2sql",
+        response_model=Text2SQLResponse,
+        dependencies=[Depends(combined_auth)],
+    )
+    async def text2sql_query(request: Text2SQLRequest):
+        """
+        Answer a question with SQL: normalize, retrieve context, plan subtasks,
+        then generate, check and adjust SQL for each of them.
+
+        Returns:
+            Text2SQLResponse: The final SQL, its result and per-stage statistics.
+        """
+        try:
+            await ensure_initialized()
+            output = await text2sql.run_query(
+                request.query, retrieval_mode=request.mode
+            )
+            return Text2SQLResponse(**output)
+        except Exception as e:
+            trace_exception(e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @router.post("/text2sql/stream", dependencies=[Depends(combined_auth)])
+    async def text2sql_query_stream(request: Text2SQLRequest):
+        """
+        Run the Text2SQL pipeline and stream its progress as server-sent events.
+
+        Events are sent as soon as they are produced: `normalized`, `cache_hit`, `context`,
+        `plan`, `sql_generated`, `validation_failed`, `check`, `sql_adjusted`, `task_done`
+        and `stage` (latency and token usage of a finished stage). The stream ends with
+        a `final` event holding the final SQL and result, or an `error` event.
+
+        Returns:
+            StreamingResponse: A `text/event-stream` response.
+        """
+        try:
+            await ensure_initialized()
+        except Exception as e:
+            trace_exception(e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def on_event(event: str, data: Dict[str, Any]):
+            queue.put_nowait((event, data))
+
+        async def run():
+            try:
+                output = await text2sql.run_query(
+                    request.query, retrieval_mode=request.mode, on_event=on_event
+                )
+                on_event(
+                    "final",
+                    {
+                        "sql": output["sql"],
+                        "result": output["result"],
+                        "stages": output["stages"],
+                        "cached": output["cached"],
+                    },
+                )
+            except Exception as e:
+                logging.error(f"Text2SQL streaming error: {str(e)}")
+                on_event("error", {"error": str(e)})
+            finally:
+                queue.put_nowait(None)
+
+        async def stream_generator():
+            task = asyncio.create_task(run())
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    yield format_sse(*item)
+            finally:
+                # Stop the pipeline if the client disconnects
+                if not task.done():
+                    task.cancel()
+
+        return StreamingResponse(
+            stream_generator(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",  # Ensure proper handling of streaming response when proxied by Nginx
+            },
+        )
+
+    return router
@@ -371,6 +371,42 @@ class AGEStorage(BaseGraphStorage):
 
         return single_result["node_exists"]
 
+    async def has_nodes_batch(self, node_ids: list[str]) -> set[str]:
+        """
+        Check the existence of multiple nodes in one query. Nodes are labeled by
+        their ID, so the query chains one OPTIONAL MATCH per node.
+
+        Args:
+            node_ids: List of node IDs to check
+
+        Returns:
+            The set of node IDs that exist in the graph
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        if not node_ids:
+            return set()
+
+        matches = []
+        checks = []
+        params = {}
+        for i, node_id in enumerate(node_ids):
+            matches.append(f"OPTIONAL MATCH (n{i}:`{{label_{i}}}`)")
+            checks.append(f"count(n{i}) > 0 AS node_exists_{i}")
+            params[f"label_{i}"] = AGEStorage._encode_graph_label(node_id.strip('"'))
+        query = "\n".join(matches) + "\nRETURN " + ", ".join(checks)
+
+        result = (await self._query(query, **params))[0]
+        logger.debug(
+            "{%s}:query:{%s}:result:{%s}",
+            inspect.currentframe().f_code.co_name,
+            query.format(**params),
+            result,
+        )
+
+        return {
+            node_id for i, node_id in enumerate(node_ids) if result[f"node_exists_{i}"]
+        }
+
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
         entity_name_label_source = source_node_id.strip('"')
         entity_name_label_target = target_node_id.strip('"')
@@ -587,6 +623,99 @@ class AGEStorage(BaseGraphStorage):
             logger.error("Error during edge upsert: {%s}", e)
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((AGEQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Upsert multiple nodes in one query. Nodes are labeled by their ID, which
+        UNWIND can not bind, so the query chains one MERGE per node.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        if not nodes:
+            return
+
+        clauses = []
+        params = {}
+        for i, (node_id, node_data) in enumerate(nodes):
+            clauses.append(
+                f"MERGE (n{i}:`{{label_{i}}}`)\nSET n{i} += {{properties_{i}}}"
+            )
+            params[f"label_{i}"] = AGEStorage._encode_graph_label(node_id.strip('"'))
+            params[f"properties_{i}"] = AGEStorage._format_properties(node_data)
+        query = "\n".join(clauses)
+
+        try:
+            await self._query(query, **params)
+            logger.debug("Upserted %d nodes", len(nodes))
+        except Exception as e:
+            logger.error("Error during batch upsert: {%s}", e)
+            raise
+
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert multiple edges in one query, chaining one MERGE per edge after
+        matching all their nodes.
+
+        If some node does not exist the query matches nothing, and the edges are
+        upserted one by one instead, which skips the edges of missing nodes like
+        upsert_edge does.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        if not edges:
+            return
+
+        matches = []
+        clauses = []
+        params = {}
+        for i, (source_node_id, target_node_id, edge_data) in enumerate(edges):
+            matches.append(f"(s{i}:`{{src_label_{i}}}`), (t{i}:`{{tgt_label_{i}}}`)")
+            clauses.append(
+                f"MERGE (s{i})-[r{i}:DIRECTED]->(t{i})\nSET r{i} += {{properties_{i}}}"
+            )
+            params[f"src_label_{i}"] = AGEStorage._encode_graph_label(
+                source_node_id.strip('"')
+            )
+            params[f"tgt_label_{i}"] = AGEStorage._encode_graph_label(
+                target_node_id.strip('"')
+            )
+            params[f"properties_{i}"] = AGEStorage._format_properties(edge_data)
+        query = (
+            "MATCH "
+            + ", ".join(matches)
+            + "\n"
+            + "\n".join(clauses)
+            + "\nRETURN count(*) AS upserted"
+        )
+
+        try:
+            upserted = await self._upsert_edges_query(query, params)
+            logger.debug("Upserted %d edges", len(edges))
+        except Exception as e:
+            logger.error("Error during batch edge upsert: {%s}", e)
+            raise
+
+        if not upserted:
+            for source_node_id, target_node_id, edge_data in edges:
+                await self.upsert_edge(source_node_id, target_node_id, edge_data)
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((AGEQueryException,)),
+    )
+    async def _upsert_edges_query(self, query: str, params: dict[str, str]) -> int:
+        """Run the query of upsert_edges_batch, returning the number of matches"""
+        return int((await self._query(query, **params))[0]["upserted"])
+
     @asynccontextmanager
     async def _get_pool_connection(self, timeout: Optional[float] = None):
         """Workaround for a psycopg_pool bug"""
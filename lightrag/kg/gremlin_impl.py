@@ -168,6 +168,43 @@ class GremlinStorage(BaseGraphStorage):
 
         return result[0]["has_node"]
 
+    async def has_nodes_batch(self, node_ids: list[str]) -> set[str]:
+        """
+        Check the existence of multiple nodes in one traversal.
+
+        Args:
+            node_ids: List of node names to check
+
+        Returns:
+            The set of node names that exist in the graph
+        """
+        if not node_ids:
+            return set()
+
+        stored_names = {
+            node_id.strip('"').replace(r"\'", "'"): node_id for node_id in node_ids
+        }
+        entity_names = ", ".join(
+            GremlinStorage._fix_name(node_id) for node_id in node_ids
+        )
+        query = f"""g
+                 .V().has('graph', {self.graph_name})
+                 .has('entity_name', within({entity_names}))
+                 .values('entity_name')
+                 .dedup()
+                 .fold()
+                 """
+        result = await self._query(query)
+        existing = result[0] if result else []
+        logger.debug(
+            "{%s}:query:{%s}:result:{%s}",
+            inspect.currentframe().f_code.co_name,
+            query,
+            existing,
+        )
+
+        return {stored_names[name] for name in existing if name in stored_names}
+
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
         entity_name_source = GremlinStorage._fix_name(source_node_id)
         entity_name_target = GremlinStorage._fix_name(target_node_id)
@@ -384,6 +421,98 @@ class GremlinStorage(BaseGraphStorage):
             logger.error("Error during edge upsert: {%s}", e)
             raise
 
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((GremlinServerError,)),
+    )
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Upsert multiple nodes in one traversal, chaining one upsert per node as
+        a side effect of a single traverser.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        if not nodes:
+            return
+
+        upserts = []
+        for node_id, node_data in nodes:
+            name = GremlinStorage._fix_name(node_id)
+            properties = GremlinStorage._convert_properties(node_data)
+            upserts.append(
+                f"""
+                 .sideEffect(
+                     __.V().has('graph', {self.graph_name})
+                     .has('entity_name', {name})
+                     .fold()
+                     .coalesce(
+                         __.unfold(),
+                         __.addV('ENTITY')
+                             .property('graph', {self.graph_name})
+                             .property('entity_name', {name})
+                     )
+                     {properties}
+                 )"""
+            )
+        query = "g.inject(0)" + "".join(upserts)
+
+        try:
+            await self._query(query)
+            logger.debug("Upserted %d nodes", len(nodes))
+        except Exception as e:
+            logger.error("Error during batch upsert: {%s}", e)
+            raise
+
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((GremlinServerError,)),
+    )
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert multiple edges in one traversal, chaining one upsert per edge as
+        a side effect of a single traverser. An edge whose nodes do not exist is
+        skipped, like in upsert_edge.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        if not edges:
+            return
+
+        upserts = []
+        for source_node_id, target_node_id, edge_data in edges:
+            source_node_name = GremlinStorage._fix_name(source_node_id)
+            target_node_name = GremlinStorage._fix_name(target_node_id)
+            edge_properties = GremlinStorage._convert_properties(edge_data)
+            upserts.append(
+                f"""
+                 .sideEffect(
+                     __.V().has('graph', {self.graph_name})
+                     .has('entity_name', {source_node_name}).as('source')
+                     .V().has('graph', {self.graph_name})
+                     .has('entity_name', {target_node_name}).as('target')
+                     .coalesce(
+                          __.select('source').outE('DIRECTED').where(__.inV().as('target')),
+                          __.select('source').addE('DIRECTED').to(__.select('target'))
+                      )
+                      .property('graph', {self.graph_name})
+                     {edge_properties}
+                 )"""
+            )
+        query = "g.inject(0)" + "".join(upserts)
+
+        try:
+            await self._query(query)
+            logger.debug("Upserted %d edges", len(edges))
+        except Exception as e:
+            logger.error("Error during batch edge upsert: {%s}", e)
+            raise
+
     async def delete_node(self, node_id: str) -> None:
         """Delete a node with the specified entity_name
 
@@ -30,7 +30,7 @@ from motor.motor_asyncio import (  # type: ignore
     AsyncIOMotorDatabase,
     AsyncIOMotorCollection,
 )
-from pymongo.operations import SearchIndexModel  # type: ignore
+from pymongo.operations import SearchIndexModel, UpdateOne  # type: ignore
 from pymongo.errors import PyMongoError  # type: ignore
 
 config = configparser.ConfigParser()
@@ -410,6 +410,13 @@ class MongoGraphStorage(BaseGraphStorage):
         doc = await self.collection.find_one({"_id": node_id}, {"_id": 1})
         return doc is not None
 
+    async def has_nodes_batch(self, node_ids: list[str]) -> set[str]:
+        """
+        Return the subset of node_ids present in the collection, in one query.
+        """
+        cursor = self.collection.find({"_id": {"$in": list(node_ids)}}, {"_id": 1})
+        return {doc["_id"] async for doc in cursor}
+
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
         """
         Check if there's a direct single-hop edge from source_node_id to target_node_id.
@@ -646,6 +653,51 @@ class MongoGraphStorage(BaseGraphStorage):
             {"_id": source_node_id}, {"$push": {"edges": new_edge}}
         )
 
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Insert or update several node documents with a single bulk write.
+        """
+        if not nodes:
+            return
+        operations = [
+            UpdateOne(
+                {"_id": node_id},
+                {"$set": {**node_data}, "$setOnInsert": {"edges": []}},
+                upsert=True,
+            )
+            for node_id, node_data in nodes
+        ]
+        await self.collection.bulk_write(operations, ordered=True)
+
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert several edges with a single ordered bulk write, applying the same
+        ensure-source / pull / push sequence as upsert_edge for each edge.
+        """
+        if not edges:
+            return
+        operations = []
+        for source_node_id, target_node_id, edge_data in edges:
+            new_edge = {"target": target_node_id}
+            new_edge.update(edge_data)
+            operations.extend(
+                [
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$setOnInsert": {"edges": []}},
+                        upsert=True,
+                    ),
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$pull": {"edges": {"target": target_node_id}}},
+                    ),
+                    UpdateOne({"_id": source_node_id}, {"$push": {"edges": new_edge}}),
+                ]
+            )
+        await self.collection.bulk_write(operations, ordered=True)
+
     #
     # -------------------------------------------------------------------------
     # DELETION
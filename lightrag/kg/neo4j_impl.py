@@ -230,6 +230,31 @@ class Neo4JStorage(BaseGraphStorage):
                 await result.consume()  # Ensure results are consumed even on error
                 raise
 
+    async def has_nodes_batch(self, node_ids: list[str]) -> set[str]:
+        """
+        Check the existence of multiple nodes in one query using UNWIND.
+
+        Args:
+            node_ids: List of node entity IDs to check
+
+        Returns:
+            set[str]: The IDs of the nodes that exist
+        """
+        async with self._driver.session(
+            database=self._DATABASE, default_access_mode="READ"
+        ) as session:
+            query = """
+            UNWIND $node_ids AS id
+            MATCH (n:base {entity_id: id})
+            RETURN DISTINCT n.entity_id AS entity_id
+            """
+            result = await session.run(query, node_ids=node_ids)
+            existing = set()
+            async for record in result:
+                existing.add(record["entity_id"])
+            await result.consume()  # Make sure to consume the result fully
+            return existing
+
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
         """
         Check if an edge exists between two nodes
@@ -776,6 +801,61 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during upsert: {str(e)}")
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Upsert multiple nodes in a single write transaction.
+
+        Nodes are grouped by entity_type, since the type is set as a label and
+        labels cannot be parameterized, and each group is written with UNWIND.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        nodes_by_type: dict[str, list[dict]] = {}
+        for node_id, node_data in nodes:
+            if "entity_id" not in node_data:
+                raise ValueError(
+                    "Neo4j: node properties must contain an 'entity_id' field"
+                )
+            nodes_by_type.setdefault(node_data["entity_type"], []).append(
+                {"entity_id": node_id, "properties": node_data}
+            )
+
+        try:
+            async with self._driver.session(database=self._DATABASE) as session:
+
+                async def execute_upsert(tx: AsyncManagedTransaction):
+                    for entity_type, batch in nodes_by_type.items():
+                        query = (
+                            """
+                        UNWIND $nodes AS node
+                        MERGE (n:base {entity_id: node.entity_id})
+                        SET n += node.properties
+                        SET n:`%s`
+                        """
+                            % entity_type
+                        )
+                        result = await tx.run(query, nodes=batch)
+                        await result.consume()  # Ensure result is fully consumed
+                    logger.debug(f"Upserted {len(nodes)} nodes")
+
+                await session.execute_write(execute_upsert)
+        except Exception as e:
+            logger.error(f"Error during batch upsert: {str(e)}")
+            raise
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -838,6 +918,52 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during edge upsert: {str(e)}")
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert multiple edges in a single write transaction using UNWIND.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        batch = [
+            {"source": src, "target": tgt, "properties": edge_data}
+            for src, tgt, edge_data in edges
+        ]
+        try:
+            async with self._driver.session(database=self._DATABASE) as session:
+
+                async def execute_upsert(tx: AsyncManagedTransaction):
+                    query = """
+                    UNWIND $edges AS edge
+                    MATCH (source:base {entity_id: edge.source})
+                    WITH source, edge
+                    MATCH (target:base {entity_id: edge.target})
+                    MERGE (source)-[r:DIRECTED]-(target)
+                    SET r += edge.properties
+                    """
+                    result = await tx.run(query, edges=batch)
+                    await result.consume()  # Ensure result is consumed
+                    logger.debug(f"Upserted {len(batch)} edges")
+
+                await session.execute_write(execute_upsert)
+        except Exception as e:
+            logger.error(f"Error during batch edge upsert: {str(e)}")
+            raise
+
     async def get_knowledge_graph(
         self,
         node_label: str,
@@ -1283,6 +1283,32 @@ class PGGraphStorage(BaseGraphStorage):
 
         return single_result["node_exists"]
 
+    async def has_nodes_batch(self, node_ids: list[str]) -> set[str]:
+        """
+        Check the existence of multiple nodes in one query using UNWIND.
+
+        Args:
+            node_ids: List of node entity IDs to check.
+
+        Returns:
+            The set of node IDs that exist in the graph.
+        """
+        if not node_ids:
+            return set()
+
+        formatted_ids = ", ".join(
+            ['"' + self._normalize_node_id(node_id) + '"' for node_id in node_ids]
+        )
+
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND [%s] AS node_id
+                     MATCH (n:base {entity_id: node_id})
+                     RETURN DISTINCT n.entity_id AS entity_id
+                   $$) AS (entity_id text)""" % (self.graph_name, formatted_ids)
+
+        results = await self._query(query)
+        return {result["entity_id"] for result in results if result["entity_id"]}
+
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
         src_label = self._normalize_node_id(source_node_id)
         tgt_label = self._normalize_node_id(target_node_id)
@@ -1482,6 +1508,92 @@ class PGGraphStorage(BaseGraphStorage):
             )
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Upsert multiple nodes in a single cypher query using UNWIND.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        if not nodes:
+            return
+
+        for node_id, node_data in nodes:
+            if "entity_id" not in node_data:
+                raise ValueError(
+                    "PostgreSQL: node properties must contain an 'entity_id' field"
+                )
+
+        node_list = ", ".join(
+            '{entity_id: "%s", properties: %s}'
+            % (self._normalize_node_id(node_id), self._format_properties(node_data))
+            for node_id, node_data in nodes
+        )
+
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND [%s] AS node
+                     MERGE (n:base {entity_id: node.entity_id})
+                     SET n += node.properties
+                     RETURN n
+                   $$) AS (n agtype)""" % (self.graph_name, node_list)
+
+        try:
+            await self._query(query, readonly=False, upsert=True)
+
+        except Exception:
+            logger.error(f"POSTGRES, upsert_nodes_batch error on {len(nodes)} nodes")
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert multiple edges in a single cypher query using UNWIND.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        if not edges:
+            return
+
+        edge_list = ", ".join(
+            '{source: "%s", target: "%s", properties: %s}'
+            % (
+                self._normalize_node_id(src),
+                self._normalize_node_id(tgt),
+                self._format_properties(edge_data),
+            )
+            for src, tgt, edge_data in edges
+        )
+
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND [%s] AS edge
+                     MATCH (source:base {entity_id: edge.source})
+                     WITH source, edge
+                     MATCH (target:base {entity_id: edge.target})
+                     MERGE (source)-[r:DIRECTED]-(target)
+                     SET r += edge.properties
+                     SET r += edge.properties
+                     RETURN r
+                   $$) AS (r agtype)""" % (self.graph_name, edge_list)
+
+        try:
+            await self._query(query, readonly=False, upsert=True)
+
+        except Exception:
+            logger.error(f"POSTGRES, upsert_edges_batch error on {len(edges)} edges")
+            raise
+
     async def delete_node(self, node_id: str) -> None:
         """
         Delete a node from the graph.
@@ -1,9 +1,10 @@
 import os
 import sys
+import zlib
 import asyncio
 from multiprocessing.synchronize import Lock as ProcessLock
 from multiprocessing import Manager
-from typing import Any, Dict, Optional, Union, TypeVar, Generic
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, TypeVar, Generic
 
 
 # Define a direct print function for critical logs that must be visible in all processes
@@ -44,6 +45,12 @@ _data_init_lock: Optional[LockType] = None
 # async locks for coroutine synchronization in multiprocess mode
 _async_locks: Optional[Dict[str, asyncio.Lock]] = None
 
+# Striped per-key locks for graph nodes and edges: a key is guarded by the lock
+# at crc32(key) % GRAPH_KEY_LOCK_STRIPES, which is the same in every process
+GRAPH_KEY_LOCK_STRIPES = max(1, int(os.getenv("GRAPH_KEY_LOCK_STRIPES", 64)))
+_graph_key_locks: Optional[Dict[str, List[LockType]]] = None  # "node"/"edge"
+_async_graph_key_locks: Optional[Dict[str, List[asyncio.Lock]]] = None
+
 
 class UnifiedLock(Generic[T]):
     """Provide a unified lock interface type for asyncio.Lock and multiprocessing.Lock"""
@@ -276,6 +283,90 @@ def get_data_init_lock(enable_logging: bool = False) -> UnifiedLock:
     )
 
 
+class KeyedUnifiedLock:
+    """Holds the stripe locks of several graph keys at once.
+
+    Stripes are acquired in ascending order and each one only once, so that two
+    holders of overlapping key sets cannot deadlock. Callers that need both kinds
+    must take edge locks before node locks, never the other way around.
+    """
+
+    def __init__(self, locks: List[UnifiedLock]):
+        self._locks = locks
+        self._acquired: List[UnifiedLock] = []
+
+    async def __aenter__(self) -> "KeyedUnifiedLock":
+        try:
+            for lock in self._locks:
+                await lock.__aenter__()
+                self._acquired.append(lock)
+        except BaseException:
+            await self._release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._release()
+
+    async def _release(self):
+        while self._acquired:
+            await self._acquired.pop().__aexit__(None, None, None)
+
+
+def _stripe_index(key: str) -> int:
+    return zlib.crc32(key.encode("utf-8", "surrogatepass")) % GRAPH_KEY_LOCK_STRIPES
+
+
+def _edge_key(edge: Tuple[str, str]) -> str:
+    return "\x00".join(sorted(edge))
+
+
+def graph_node_lock_stripe(entity_name: str) -> int:
+    """index of the lock guarding a graph node; keys with equal indexes share a lock"""
+    return _stripe_index(entity_name)
+
+
+def graph_edge_lock_stripe(edge: Tuple[str, str]) -> int:
+    """index of the lock guarding an (undirected) graph edge"""
+    return _stripe_index(_edge_key(edge))
+
+
+def _get_graph_key_lock(
+    kind: str, keys: Iterable[str], enable_logging: bool
+) -> KeyedUnifiedLock:
+    stripes = sorted({_stripe_index(key) for key in keys})
+    return KeyedUnifiedLock(
+        [
+            UnifiedLock(
+                lock=_graph_key_locks[kind][i],
+                is_async=not _is_multiprocess,
+                name=f"graph_{kind}_lock_{i}",
+                enable_logging=enable_logging,
+                async_lock=_async_graph_key_locks[kind][i]
+                if _is_multiprocess
+                else None,
+            )
+            for i in stripes
+        ]
+    )
+
+
+def get_graph_node_lock(
+    entity_names: Iterable[str], enable_logging: bool = False
+) -> KeyedUnifiedLock:
+    """return the locks guarding the given graph nodes, for per-entity merges"""
+    return _get_graph_key_lock("node", entity_names, enable_logging)
+
+
+def get_graph_edge_lock(
+    edges: Iterable[Tuple[str, str]], enable_logging: bool = False
+) -> KeyedUnifiedLock:
+    """return the locks guarding the given (undirected) graph edges"""
+    return _get_graph_key_lock(
+        "edge", (_edge_key(edge) for edge in edges), enable_logging
+    )
+
+
 def initialize_share_data(workers: int = 1):
     """
     Initialize shared storage data for single or multi-process mode.
@@ -307,7 +398,9 @@ def initialize_share_data(workers: int = 1):
         _init_flags, \
         _initialized, \
         _update_flags, \
-        _async_locks
+        _async_locks, \
+        _graph_key_locks, \
+        _async_graph_key_locks
 
     # Check if already initialized
     if _initialized:
@@ -338,6 +431,14 @@ def initialize_share_data(workers: int = 1):
             "graph_db_lock": asyncio.Lock(),
             "data_init_lock": asyncio.Lock(),
         }
+        _graph_key_locks = {
+            kind: [_manager.Lock() for _ in range(GRAPH_KEY_LOCK_STRIPES)]
+            for kind in ("node", "edge")
+        }
+        _async_graph_key_locks = {
+            kind: [asyncio.Lock() for _ in range(GRAPH_KEY_LOCK_STRIPES)]
+            for kind in ("node", "edge")
+        }
 
         direct_log(
             f"Process {os.getpid()} Shared-Data created for Multiple Process (workers={workers})"
@@ -353,6 +454,11 @@ def initialize_share_data(workers: int = 1):
         _init_flags = {}
         _update_flags = {}
         _async_locks = None  # No need for async locks in single process mode
+        _graph_key_locks = {
+            kind: [asyncio.Lock() for _ in range(GRAPH_KEY_LOCK_STRIPES)]
+            for kind in ("node", "edge")
+        }
+        _async_graph_key_locks = None
         direct_log(f"Process {os.getpid()} Shared-Data created for Single Process")
 
     # Mark as initialized
@@ -540,7 +646,9 @@ def finalize_share_data():
         _init_flags, \
         _initialized, \
         _update_flags, \
-        _async_locks
+        _async_locks, \
+        _graph_key_locks, \
+        _async_graph_key_locks
 
     # Check if already initialized
     if not _initialized:
@@ -606,5 +714,7 @@ def finalize_share_data():
     _data_init_lock = None
     _update_flags = None
     _async_locks = None
+    _graph_key_locks = None
+    _async_graph_key_locks = None
 
     direct_log(f"Process {os.getpid()} storage data finalization complete")
@@ -5,6 +5,7 @@ import asyncio
 import configparser
 import os
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from functools import partial
@@ -45,6 +46,8 @@ from .base import (
 from .namespace import NameSpace, make_namespace
 from .operate import (
     chunking_by_token_size,
+    init_chunking_worker,
+    iter_chunks_by_token_size,
     extract_entities,
     kg_query,
     mix_kg_vector_query,
@@ -57,16 +60,19 @@ from .utils import (
     TiktokenTokenizer,
     EmbeddingFunc,
     always_get_an_event_loop,
+    attach_description_tokens,
     compute_mdhash_id,
     convert_response_to_json,
     lazy_external_import,
     limit_async_func_call,
+    batch_async_embedding_calls,
     get_content_summary,
     clean_text,
     check_storage_env_vars,
     logger,
 )
 from .types import KnowledgeGraph
+from .tracing import traced
 from dotenv import load_dotenv
 
 # use the .env that is inside the current folder
@@ -135,6 +141,16 @@ class LightRAG:
     )
     """Number of overlapping tokens between consecutive text chunks to preserve context."""
 
+    chunking_parallel_threshold: int = field(
+        default=int(os.getenv("CHUNKING_PARALLEL_THRESHOLD", 1_000_000))
+    )
+    """Documents longer than this many characters are chunked off the event loop, tokenizing on a process pool; 0 disables this."""
+
+    chunking_max_workers: int = field(
+        default=int(os.getenv("CHUNKING_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+    )
+    """Number of worker processes used to tokenize large documents."""
+
     tokenizer: Optional[Tokenizer] = field(default=None)
     """
     A function that returns a Tokenizer instance.
@@ -189,6 +205,11 @@ class LightRAG:
     )
     """Maximum number of concurrent embedding function calls."""
 
+    embedding_batch_wait: float = field(
+        default=float(os.getenv("EMBEDDING_BATCH_WAIT", 0.005))
+    )
+    """Seconds a partial embedding batch waits for texts from concurrent callers before it is sent."""
+
     embedding_cache_config: dict[str, Any] = field(
         default_factory=lambda: {
             "enabled": False,
@@ -340,6 +361,10 @@ class LightRAG:
         self.embedding_func = limit_async_func_call(self.embedding_func_max_async)(  # type: ignore
             self.embedding_func
         )
+        # Shared by all vector storages, so their texts are embedded in full batches
+        self.embedding_func = batch_async_embedding_calls(  # type: ignore
+            self.embedding_batch_num, self.embedding_batch_wait
+        )(self.embedding_func)
 
         # Initialize all storages
         self.key_string_value_json_storage_cls: type[BaseKVStorage] = (
@@ -426,13 +451,17 @@ class LightRAG:
         hashing_kv = self.llm_response_cache
 
         self.llm_model_func = limit_async_func_call(self.llm_model_max_async)(
-            partial(
-                self.llm_model_func,  # type: ignore
-                hashing_kv=hashing_kv,
-                **self.llm_model_kwargs,
+            traced("llm.complete", model=self.llm_model_name)(
+                partial(
+                    self.llm_model_func,  # type: ignore
+                    hashing_kv=hashing_kv,
+                    **self.llm_model_kwargs,
+                )
             )
         )
 
+        self._chunking_executor: ProcessPoolExecutor | None = None
+
         self._storages_status = StoragesStatus.CREATED
 
         if self.auto_manage_storages_states:
@@ -504,6 +533,10 @@ class LightRAG:
 
             await asyncio.gather(*tasks)
 
+            if self._chunking_executor is not None:
+                self._chunking_executor.shutdown(wait=False, cancel_futures=True)
+                self._chunking_executor = None
+
             self._storages_status = StoragesStatus.FINALIZED
             logger.debug("Finalized Storages")
 
@@ -915,21 +948,13 @@ class LightRAG:
                             pipeline_status["history_messages"].append(log_message)
 
                         # Generate chunks from document
-                        chunks: dict[str, Any] = {
-                            compute_mdhash_id(dp["content"], prefix="chunk-"): {
-                                **dp,
-                                "full_doc_id": doc_id,
-                                "file_path": file_path,  # Add file path to each chunk
-                            }
-                            for dp in self.chunking_func(
-                                self.tokenizer,
-                                status_doc.content,
-                                split_by_character,
-                                split_by_character_only,
-                                self.chunk_overlap_token_size,
-                                self.chunk_token_size,
-                            )
-                        }
+                        chunks: dict[str, Any] = await self._chunk_document(
+                            status_doc.content,
+                            split_by_character,
+                            split_by_character_only,
+                            doc_id,
+                            file_path,
+                        )
 
                         # Process document (text chunks and full docs) in parallel
                         # Create tasks with references for potential cancellation
@@ -1092,6 +1117,73 @@ class LightRAG:
                 pipeline_status["latest_message"] = log_message
                 pipeline_status["history_messages"].append(log_message)
 
+    def _get_chunking_executor(self) -> ProcessPoolExecutor:
+        """Process pool that tokenizes large documents, started on first use"""
+        if self._chunking_executor is None:
+            self._chunking_executor = ProcessPoolExecutor(
+                max_workers=self.chunking_max_workers,
+                initializer=init_chunking_worker,
+                initargs=(self.tokenizer,),
+            )
+        return self._chunking_executor
+
+    async def _chunk_document(
+        self,
+        content: str,
+        split_by_character: str | None,
+        split_by_character_only: bool,
+        doc_id: str,
+        file_path: str,
+    ) -> dict[str, Any]:
+        """Split a document into chunks keyed by chunk id.
+
+        With the default chunking function, documents above
+        `chunking_parallel_threshold` characters are chunked in a worker
+        thread that streams the text through the tokenizer process pool, so
+        the event loop is not blocked.
+        """
+
+        def build(chunk_dicts) -> dict[str, Any]:
+            return {
+                compute_mdhash_id(dp["content"], prefix="chunk-"): {
+                    **dp,
+                    "full_doc_id": doc_id,
+                    "file_path": file_path,  # Add file path to each chunk
+                }
+                for dp in chunk_dicts
+            }
+
+        if (
+            self.chunking_func is chunking_by_token_size
+            and 0 < self.chunking_parallel_threshold < len(content)
+        ):
+            executor = (
+                self._get_chunking_executor() if self.chunking_max_workers > 1 else None
+            )
+            return await asyncio.to_thread(
+                build,
+                iter_chunks_by_token_size(
+                    self.tokenizer,
+                    content,
+                    split_by_character,
+                    split_by_character_only,
+                    self.chunk_overlap_token_size,
+                    self.chunk_token_size,
+                    executor,
+                ),
+            )
+
+        return build(
+            self.chunking_func(
+                self.tokenizer,
+                content,
+                split_by_character,
+                split_by_character_only,
+                self.chunk_overlap_token_size,
+                self.chunk_token_size,
+            )
+        )
+
     async def _process_entity_relation_graph(
         self, chunk: dict[str, Any], pipeline_status=None, pipeline_status_lock=None
     ) -> None:
@@ -1209,16 +1301,23 @@ class LightRAG:
                     "description": description,
                     "source_id": source_id,
                 }
-                # Insert node data into the knowledge graph
-                await self.chunk_entity_relation_graph.upsert_node(
-                    entity_name, node_data=node_data
-                )
-                node_data["entity_name"] = entity_name
+                attach_description_tokens(node_data, self.tokenizer)
                 all_entities_data.append(node_data)
+
+            # Insert node data into the knowledge graph
+            if all_entities_data:
+                await self.chunk_entity_relation_graph.upsert_nodes_batch(
+                    [(dp["entity_id"], dp) for dp in all_entities_data]
+                )
+                all_entities_data = [
+                    {**dp, "entity_name": dp["entity_id"]} for dp in all_entities_data
+                ]
                 update_storage = True
 
             # Insert relationships into knowledge graph
             all_relationships_data: list[dict[str, str]] = []
+            all_edges: list[tuple[str, str, dict[str, str]]] = []
+            endpoints: dict[str, dict[str, str]] = {}
             for relationship_data in custom_kg.get("relationships", []):
                 src_id = relationship_data["src_id"]
                 tgt_id = relationship_data["tgt_id"]
@@ -1234,31 +1333,33 @@ class LightRAG:
                         f"Relationship from '{src_id}' to '{tgt_id}' has an UNKNOWN source_id. Please check the source mapping."
                     )
 
-                # Check if nodes exist in the knowledge graph
+                # Nodes to create if they do not exist in the knowledge graph
                 for need_insert_id in [src_id, tgt_id]:
-                    if not (
-                        await self.chunk_entity_relation_graph.has_node(need_insert_id)
-                    ):
-                        await self.chunk_entity_relation_graph.upsert_node(
-                            need_insert_id,
-                            node_data={
+                    if need_insert_id not in endpoints:
+                        endpoints[need_insert_id] = attach_description_tokens(
+                            {
                                 "entity_id": need_insert_id,
                                 "source_id": source_id,
                                 "description": "UNKNOWN",
                                 "entity_type": "UNKNOWN",
                             },
+                            self.tokenizer,
                         )
 
-                # Insert edge into the knowledge graph
-                await self.chunk_entity_relation_graph.upsert_edge(
-                    src_id,
-                    tgt_id,
-                    edge_data={
-                        "weight": weight,
-                        "description": description,
-                        "keywords": keywords,
-                        "source_id": source_id,
-                    },
+                all_edges.append(
+                    (
+                        src_id,
+                        tgt_id,
+                        attach_description_tokens(
+                            {
+                                "weight": weight,
+                                "description": description,
+                                "keywords": keywords,
+                                "source_id": source_id,
+                            },
+                            self.tokenizer,
+                        ),
+                    )
                 )
                 edge_data: dict[str, str] = {
                     "src_id": src_id,
@@ -1269,6 +1370,20 @@ class LightRAG:
                     "weight": weight,
                 }
                 all_relationships_data.append(edge_data)
+
+            # Insert edges into the knowledge graph
+            if all_edges:
+                existing = await self.chunk_entity_relation_graph.has_nodes_batch(
+                    list(endpoints)
+                )
+                missing = [
+                    (node_id, node_data)
+                    for node_id, node_data in endpoints.items()
+                    if node_id not in existing
+                ]
+                if missing:
+                    await self.chunk_entity_relation_graph.upsert_nodes_batch(missing)
+                await self.chunk_entity_relation_graph.upsert_edges_batch(all_edges)
                 update_storage = True
 
             # Insert entities into vector storage with consistent format
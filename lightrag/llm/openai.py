@@ -32,6 +32,7 @@ from lightrag.utils import (
     logger,
 )
 from lightrag.types import GPTKeywordExtractionFormat
+from lightrag.tracing import current_span
 from lightrag.api import __api_version__
 
 import numpy as np
@@ -247,13 +248,15 @@ async def openai_complete_if_cache(
         if r"\u" in content:
             content = safe_unicode_decode(content.encode("utf-8"))
 
-        if token_tracker and hasattr(response, "usage"):
+        if hasattr(response, "usage"):
             token_counts = {
                 "prompt_tokens": getattr(response.usage, "prompt_tokens", 0),
                 "completion_tokens": getattr(response.usage, "completion_tokens", 0),
                 "total_tokens": getattr(response.usage, "total_tokens", 0),
             }
-            token_tracker.add_usage(token_counts)
+            current_span().set_attributes(**token_counts)
+            if token_tracker:
+                token_tracker.add_usage(token_counts)
 
         logger.debug(f"Response content len: {len(content)}")
         verbose_debug(f"Response: {response}")
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import traceback
 import json
 import re
 import os
-from typing import Any, AsyncIterator
-from collections import Counter, defaultdict
+from typing import Any, AsyncIterator, Iterable, Iterator
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Executor
 
 from .utils import (
     logger,
+    attach_description_tokens,
     clean_str,
     compute_mdhash_id,
     Tokenizer,
@@ -34,7 +37,14 @@ from .base import (
     TextChunkSchema,
     QueryParam,
 )
+from .kg.shared_storage import (
+    get_graph_edge_lock,
+    get_graph_node_lock,
+    graph_edge_lock_stripe,
+    graph_node_lock_stripe,
+)
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
+from .tracing import current_span, trace_call, traced, tracing_enabled
 import time
 from dotenv import load_dotenv
 
@@ -44,59 +54,238 @@ from dotenv import load_dotenv
 load_dotenv(dotenv_path=".env", override=False)
 
 
-def chunking_by_token_size(
+# Pieces of this many characters are tokenized together when chunking on a process pool
+CHUNKING_SEGMENT_SIZE = 64 * 1024
+# Give up cutting a document into segments after this many rejected cut points
+CHUNKING_MAX_REJECTED_CUTS = 8
+# A line break followed by a non-whitespace character; BPE tokenizers with
+# tiktoken-style pre-tokenization never merge tokens across this position
+_SEGMENT_CUT_PATTERN = re.compile(r"[\r\n](?=\S)")
+
+_chunking_worker_tokenizer: Tokenizer | None = None
+
+
+def init_chunking_worker(tokenizer: Tokenizer) -> None:
+    """Process pool initializer: keep one tokenizer per worker process."""
+    global _chunking_worker_tokenizer
+    _chunking_worker_tokenizer = tokenizer
+
+
+def _encode_in_worker(pieces: list[str]) -> list[list[int]]:
+    return [_chunking_worker_tokenizer.encode(piece) for piece in pieces]
+
+
+def _iter_split(content: str, separator: str) -> Iterator[str]:
+    """Lazily yield the same pieces as ``content.split(separator)``."""
+    start = 0
+    while True:
+        end = content.find(separator, start)
+        if end == -1:
+            yield content[start:]
+            return
+        yield content[start:end]
+        start = end + len(separator)
+
+
+def _iter_segments(
+    tokenizer: Tokenizer, content: str, segment_size: int = CHUNKING_SEGMENT_SIZE
+) -> Iterator[str]:
+    """Cut content into consecutive segments whose encodings concatenate to the
+    encoding of the whole content.
+
+    Segments end after a line break that is followed by a non-whitespace
+    character, and a cut is only used after checking that the tokenizer
+    encodes the text around it the same way with and without the cut.
+    Tokenizers that fail the check (e.g. ones that add a BOS token) end up
+    with the whole content as a single segment.
+    """
+    start, rejected = 0, 0
+    while start < len(content):
+        cut = None
+        search_from = start + segment_size
+        while cut is None and rejected < CHUNKING_MAX_REJECTED_CUTS:
+            match = _SEGMENT_CUT_PATTERN.search(content, search_from)
+            if match is None:
+                break
+            position = match.end()
+            left = content[max(position - 256, start) : position]
+            right = content[position : position + 256]
+            if tokenizer.encode(left + right) == tokenizer.encode(
+                left
+            ) + tokenizer.encode(right):
+                cut = position
+            else:
+                rejected += 1
+                search_from = position + 1
+        if cut is None:
+            yield content[start:]
+            return
+        yield content[start:cut]
+        start = cut
+
+
+def _iter_encoded(
+    tokenizer: Tokenizer,
+    pieces: Iterable[str],
+    executor: Executor | None = None,
+    prefetch: int = 4,
+) -> Iterator[tuple[str, list[int]]]:
+    """Yield ``(piece, tokens)`` in order. With an executor set up by
+    ``init_chunking_worker``, pieces are encoded in batches of about
+    CHUNKING_SEGMENT_SIZE characters, with a bounded number in flight."""
+    if executor is None:
+        for piece in pieces:
+            yield piece, tokenizer.encode(piece)
+        return
+
+    pending: deque = deque()
+    max_pending = prefetch * getattr(executor, "_max_workers", 1)
+
+    def drain(limit: int):
+        while len(pending) > limit:
+            batch, future = pending.popleft()
+            yield from zip(batch, future.result())
+
+    batch, batch_size = [], 0
+    for piece in pieces:
+        batch.append(piece)
+        batch_size += len(piece)
+        if batch_size >= CHUNKING_SEGMENT_SIZE:
+            pending.append((batch, executor.submit(_encode_in_worker, batch)))
+            batch, batch_size = [], 0
+            yield from drain(max_pending)
+    if batch:
+        pending.append((batch, executor.submit(_encode_in_worker, batch)))
+    yield from drain(0)
+
+
+def _iter_token_windows(
+    token_segments: Iterable[list[int]], overlap_token_size: int, max_token_size: int
+) -> Iterator[tuple[int, list[int]]]:
+    """Yield ``(token_count, tokens)`` for the windows
+    ``tokens[start : start + max_token_size]`` with ``start`` stepping by
+    ``max_token_size - overlap_token_size``, without holding every token."""
+    step = max_token_size - overlap_token_size
+    if step <= 0:
+        raise ValueError(
+            f"overlap_token_size ({overlap_token_size}) must be smaller than "
+            f"max_token_size ({max_token_size})"
+        )
+
+    buffer: list[int] = []
+    base = 0  # absolute index of buffer[0]
+    start = 0  # absolute index of the next window
+    for segment in token_segments:
+        if start > base + len(buffer):
+            # The step is larger than a window: drop the tokens between windows
+            skipped = min(start - base - len(buffer), len(segment))
+            base += len(buffer) + skipped
+            buffer = list(segment[skipped:])
+        else:
+            buffer.extend(segment)
+        while start + max_token_size <= base + len(buffer):
+            yield max_token_size, buffer[start - base : start - base + max_token_size]
+            start += step
+        consumed = min(start - base, len(buffer))
+        if consumed > 0:
+            del buffer[:consumed]
+            base += consumed
+
+    total = base + len(buffer)
+    while start < total:
+        yield (
+            min(max_token_size, total - start),
+            buffer[start - base : start - base + max_token_size],
+        )
+        start += step
+
+
+def _stripped_chunk(
+    tokenizer: Tokenizer, token_count: int, content: str
+) -> tuple[int, str]:
+    """Strip a chunk and return its token count, re-encoding only when
+    stripping changed the text, so that ``tokens`` matches the stored content."""
+    stripped = content.strip()
+    if stripped != content:
+        token_count = len(tokenizer.encode(stripped))
+    return token_count, stripped
+
+
+def iter_chunks_by_token_size(
     tokenizer: Tokenizer,
     content: str,
     split_by_character: str | None = None,
     split_by_character_only: bool = False,
     overlap_token_size: int = 128,
     max_token_size: int = 1024,
-) -> list[dict[str, Any]]:
-    tokens = tokenizer.encode(content)
-    results: list[dict[str, Any]] = []
+    executor: Executor | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Streaming version of :func:`chunking_by_token_size`.
+
+    Yields the same chunks in the same order, but tokenizes the content piece
+    by piece instead of encoding the whole document up front. ``tokens`` is
+    the token count of the stripped chunk content. When an
+    executor initialized with ``init_chunking_worker`` is given, the pieces
+    are tokenized on it in parallel.
+    """
+    index = 0
     if split_by_character:
-        raw_chunks = content.split(split_by_character)
-        new_chunks = []
-        if split_by_character_only:
-            for chunk in raw_chunks:
-                _tokens = tokenizer.encode(chunk)
-                new_chunks.append((len(_tokens), chunk))
-        else:
-            for chunk in raw_chunks:
-                _tokens = tokenizer.encode(chunk)
-                if len(_tokens) > max_token_size:
-                    for start in range(
-                        0, len(_tokens), max_token_size - overlap_token_size
-                    ):
-                        chunk_content = tokenizer.decode(
-                            _tokens[start : start + max_token_size]
-                        )
-                        new_chunks.append(
-                            (min(max_token_size, len(_tokens) - start), chunk_content)
-                        )
-                else:
-                    new_chunks.append((len(_tokens), chunk))
-        for index, (_len, chunk) in enumerate(new_chunks):
-            results.append(
-                {
+        pieces = _iter_split(content, split_by_character)
+        for chunk, _tokens in _iter_encoded(tokenizer, pieces, executor):
+            if split_by_character_only or len(_tokens) <= max_token_size:
+                windows = [(len(_tokens), chunk)]
+            else:
+                windows = [
+                    (_len, tokenizer.decode(window))
+                    for _len, window in _iter_token_windows(
+                        [_tokens], overlap_token_size, max_token_size
+                    )
+                ]
+            for _len, chunk_content in windows:
+                _len, chunk_content = _stripped_chunk(tokenizer, _len, chunk_content)
+                yield {
                     "tokens": _len,
-                    "content": chunk.strip(),
+                    "content": chunk_content,
                     "chunk_order_index": index,
                 }
-            )
+                index += 1
     else:
-        for index, start in enumerate(
-            range(0, len(tokens), max_token_size - overlap_token_size)
+        segments = _iter_segments(tokenizer, content)
+        token_segments = (
+            tokens for _, tokens in _iter_encoded(tokenizer, segments, executor)
+        )
+        for _len, window in _iter_token_windows(
+            token_segments, overlap_token_size, max_token_size
         ):
-            chunk_content = tokenizer.decode(tokens[start : start + max_token_size])
-            results.append(
-                {
-                    "tokens": min(max_token_size, len(tokens) - start),
-                    "content": chunk_content.strip(),
-                    "chunk_order_index": index,
-                }
+            _len, chunk_content = _stripped_chunk(
+                tokenizer, _len, tokenizer.decode(window)
             )
-    return results
+            yield {
+                "tokens": _len,
+                "content": chunk_content,
+                "chunk_order_index": index,
+            }
+            index += 1
+
+
+def chunking_by_token_size(
+    tokenizer: Tokenizer,
+    content: str,
+    split_by_character: str | None = None,
+    split_by_character_only: bool = False,
+    overlap_token_size: int = 128,
+    max_token_size: int = 1024,
+) -> list[dict[str, Any]]:
+    return list(
+        iter_chunks_by_token_size(
+            tokenizer,
+            content,
+            split_by_character,
+            split_by_character_only,
+            overlap_token_size,
+            max_token_size,
+        )
+    )
 
 
 async def _handle_entity_relation_summary(
@@ -229,22 +418,22 @@ async def _handle_single_relationship_extraction(
     )
 
 
-async def _merge_nodes_then_upsert(
+async def _merge_nodes(
     entity_name: str,
     nodes_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_node: dict | None,
     global_config: dict,
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
-):
-    """Get existing nodes from knowledge graph use name,if exists, merge data, else create, then upsert."""
+) -> dict:
+    """Merge the extracted data of an entity into its existing node (if any) and
+    return the node data to upsert."""
     already_entity_types = []
     already_source_ids = []
     already_description = []
     already_file_paths = []
 
-    already_node = await knowledge_graph_inst.get_node(entity_name)
     if already_node is not None:
         already_entity_types.append(already_node["entity_type"])
         already_source_ids.extend(
@@ -308,64 +497,59 @@ async def _merge_nodes_then_upsert(
         source_id=source_id,
         file_path=file_path,
     )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
-    )
-    node_data["entity_name"] = entity_name
-    return node_data
+    return attach_description_tokens(node_data, global_config["tokenizer"])
 
 
-async def _merge_edges_then_upsert(
+async def _merge_edges(
     src_id: str,
     tgt_id: str,
     edges_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_edge: dict | None,
     global_config: dict,
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
-):
+) -> dict:
+    """Merge the extracted data of a relation into its existing edge (if any) and
+    return the edge data to upsert."""
     already_weights = []
     already_source_ids = []
     already_description = []
     already_keywords = []
     already_file_paths = []
 
-    if await knowledge_graph_inst.has_edge(src_id, tgt_id):
-        already_edge = await knowledge_graph_inst.get_edge(src_id, tgt_id)
-        # Handle the case where get_edge returns None or missing fields
-        if already_edge:
-            # Get weight with default 0.0 if missing
-            already_weights.append(already_edge.get("weight", 0.0))
-
-            # Get source_id with empty string default if missing or None
-            if already_edge.get("source_id") is not None:
-                already_source_ids.extend(
-                    split_string_by_multi_markers(
-                        already_edge["source_id"], [GRAPH_FIELD_SEP]
-                    )
+    # Handle the case where the stored edge is None or misses fields
+    if already_edge:
+        # Get weight with default 0.0 if missing
+        already_weights.append(already_edge.get("weight", 0.0))
+
+        # Get source_id with empty string default if missing or None
+        if already_edge.get("source_id") is not None:
+            already_source_ids.extend(
+                split_string_by_multi_markers(
+                    already_edge["source_id"], [GRAPH_FIELD_SEP]
                 )
+            )
 
-            # Get file_path with empty string default if missing or None
-            if already_edge.get("file_path") is not None:
-                already_file_paths.extend(
-                    split_string_by_multi_markers(
-                        already_edge["file_path"], [GRAPH_FIELD_SEP]
-                    )
+        # Get file_path with empty string default if missing or None
+        if already_edge.get("file_path") is not None:
+            already_file_paths.extend(
+                split_string_by_multi_markers(
+                    already_edge["file_path"], [GRAPH_FIELD_SEP]
                 )
+            )
 
-            # Get description with empty string default if missing or None
-            if already_edge.get("description") is not None:
-                already_description.append(already_edge["description"])
+        # Get description with empty string default if missing or None
+        if already_edge.get("description") is not None:
+            already_description.append(already_edge["description"])
 
-            # Get keywords with empty string default if missing or None
-            if already_edge.get("keywords") is not None:
-                already_keywords.extend(
-                    split_string_by_multi_markers(
-                        already_edge["keywords"], [GRAPH_FIELD_SEP]
-                    )
+        # Get keywords with empty string default if missing or None
+        if already_edge.get("keywords") is not None:
+            already_keywords.extend(
+                split_string_by_multi_markers(
+                    already_edge["keywords"], [GRAPH_FIELD_SEP]
                 )
+            )
 
     # Process edges_data with None checks
     weight = sum([dp["weight"] for dp in edges_data] + already_weights)
@@ -398,29 +582,6 @@ async def _merge_edges_then_upsert(
         )
     )
 
-    for need_insert_id in [src_id, tgt_id]:
-        if not (await knowledge_graph_inst.has_node(need_insert_id)):
-            # # Discard this edge if the node does not exist
-            # if need_insert_id == src_id:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Source node missing"
-            #     )
-            # else:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Target node missing"
-            #     )
-            # return None
-            await knowledge_graph_inst.upsert_node(
-                need_insert_id,
-                node_data={
-                    "entity_id": need_insert_id,
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                    "file_path": file_path,
-                },
-            )
-
     force_llm_summary_on_merge = global_config["force_llm_summary_on_merge"]
 
     num_fragment = description.count(GRAPH_FIELD_SEP) + 1
@@ -452,28 +613,207 @@ async def _merge_edges_then_upsert(
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
 
-    await knowledge_graph_inst.upsert_edge(
-        src_id,
-        tgt_id,
-        edge_data=dict(
+    return attach_description_tokens(
+        dict(
             weight=weight,
             description=description,
             keywords=keywords,
             source_id=source_id,
             file_path=file_path,
         ),
+        global_config["tokenizer"],
     )
 
-    edge_data = dict(
-        src_id=src_id,
-        tgt_id=tgt_id,
-        description=description,
-        keywords=keywords,
-        source_id=source_id,
-        file_path=file_path,
+
+async def _merge_nodes_then_upsert(
+    entity_names: list[str],
+    all_nodes: dict[str, list[dict]],
+    knowledge_graph_inst: BaseGraphStorage,
+    global_config: dict,
+    semaphore: asyncio.Semaphore,
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+    llm_response_cache: BaseKVStorage | None = None,
+) -> list[dict]:
+    """Merge a batch of entities into the knowledge graph: read the existing nodes
+    and write the merged ones in one batch each.
+
+    The merge (and its LLM summaries) runs on a snapshot without the entity locks.
+    Under the locks the nodes are read again, the ones changed meanwhile are merged
+    again from their current data, and the batch is written.
+    """
+
+    async def _merge(entity_name, already_node):
+        async with semaphore:
+            return await _merge_nodes(
+                entity_name,
+                all_nodes[entity_name],
+                already_node,
+                global_config,
+                pipeline_status,
+                pipeline_status_lock,
+                llm_response_cache,
+            )
+
+    already_nodes = _snapshot(await knowledge_graph_inst.get_nodes_batch(entity_names))
+    nodes_data = await _run_all_or_cancel(
+        [_merge(name, already_nodes.get(name)) for name in entity_names]
     )
 
-    return edge_data
+    async with get_graph_node_lock(entity_names):
+        current_nodes = await knowledge_graph_inst.get_nodes_batch(entity_names)
+        stale = [
+            i
+            for i, name in enumerate(entity_names)
+            if current_nodes.get(name) != already_nodes.get(name)
+        ]
+        remerged = await _run_all_or_cancel(
+            [_merge(entity_names[i], current_nodes.get(entity_names[i])) for i in stale]
+        )
+        for i, node_data in zip(stale, remerged):
+            nodes_data[i] = node_data
+        await knowledge_graph_inst.upsert_nodes_batch(
+            list(zip(entity_names, nodes_data))
+        )
+
+    return [
+        {**node_data, "entity_name": entity_name}
+        for entity_name, node_data in zip(entity_names, nodes_data)
+    ]
+
+
+async def _merge_edges_then_upsert(
+    edge_keys: list[tuple[str, str]],
+    all_edges: dict[tuple[str, str], list[dict]],
+    knowledge_graph_inst: BaseGraphStorage,
+    global_config: dict,
+    semaphore: asyncio.Semaphore,
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+    llm_response_cache: BaseKVStorage | None = None,
+) -> list[dict]:
+    """Merge a batch of relations into the knowledge graph, creating the entities
+    they connect if these do not exist yet.
+
+    Like _merge_nodes_then_upsert, the merge runs on a snapshot and only the edges
+    changed meanwhile are merged again while the relation locks are held.
+    """
+
+    async def _merge(src_id, tgt_id, already_edge):
+        async with semaphore:
+            return await _merge_edges(
+                src_id,
+                tgt_id,
+                all_edges[(src_id, tgt_id)],
+                already_edge,
+                global_config,
+                pipeline_status,
+                pipeline_status_lock,
+                llm_response_cache,
+            )
+
+    pairs = [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in edge_keys]
+    already_edges = _snapshot(await knowledge_graph_inst.get_edges_batch(pairs))
+    edges_data = await _run_all_or_cancel(
+        [
+            _merge(src_id, tgt_id, already_edges.get((src_id, tgt_id)))
+            for src_id, tgt_id in edge_keys
+        ]
+    )
+
+    async with get_graph_edge_lock(edge_keys):
+        current_edges = await knowledge_graph_inst.get_edges_batch(pairs)
+        stale = [
+            i
+            for i, edge_key in enumerate(edge_keys)
+            if current_edges.get(edge_key) != already_edges.get(edge_key)
+        ]
+        remerged = await _run_all_or_cancel(
+            [_merge(*edge_keys[i], current_edges.get(edge_keys[i])) for i in stale]
+        )
+        for i, edge_data in zip(stale, remerged):
+            edges_data[i] = edge_data
+
+        endpoints = {}
+        for (src_id, tgt_id), edge_data in zip(edge_keys, edges_data):
+            for need_insert_id in (src_id, tgt_id):
+                if need_insert_id not in endpoints:
+                    endpoints[need_insert_id] = attach_description_tokens(
+                        {
+                            "entity_id": need_insert_id,
+                            "source_id": edge_data["source_id"],
+                            "description": edge_data["description"],
+                            "entity_type": "UNKNOWN",
+                            "file_path": edge_data["file_path"],
+                        },
+                        global_config["tokenizer"],
+                    )
+        # Entities are locked while they are merged, so a missing one can not be
+        # created concurrently by another document
+        async with get_graph_node_lock(endpoints):
+            existing = await knowledge_graph_inst.has_nodes_batch(list(endpoints))
+            missing = [
+                (node_id, node_data)
+                for node_id, node_data in endpoints.items()
+                if node_id not in existing
+            ]
+            if missing:
+                await knowledge_graph_inst.upsert_nodes_batch(missing)
+
+        await knowledge_graph_inst.upsert_edges_batch(
+            [
+                (src_id, tgt_id, edge_data)
+                for (src_id, tgt_id), edge_data in zip(edge_keys, edges_data)
+            ]
+        )
+
+    return [
+        dict(
+            src_id=src_id,
+            tgt_id=tgt_id,
+            description=edge_data["description"],
+            keywords=edge_data["keywords"],
+            source_id=edge_data["source_id"],
+            file_path=edge_data["file_path"],
+        )
+        for (src_id, tgt_id), edge_data in zip(edge_keys, edges_data)
+    ]
+
+
+def _snapshot(items: dict) -> dict:
+    """Copy the nodes or edges read from the graph storage, which may return its
+    live attribute dicts (NetworkX), so later writes do not change the snapshot"""
+    return {key: dict(value) for key, value in items.items() if value is not None}
+
+
+async def _run_all_or_cancel(coros: list) -> list:
+    """Run coroutines concurrently and return their results in order.
+
+    On the first exception the remaining tasks are cancelled (the caller aborts
+    anyway) and the exception is re-raised.
+    """
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    if not tasks:
+        return []
+
+    # Wait for tasks to complete or for the first exception to occur
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+
+    # Check if any task raised an exception
+    for task in done:
+        if task.exception():
+            # If a task failed, cancel all pending tasks
+            for pending_task in pending:
+                pending_task.cancel()
+
+            # Wait for cancellation to complete
+            if pending:
+                await asyncio.wait(pending)
+
+            # Re-raise the exception to notify the caller
+            raise task.exception()
+
+    return [task.result() for task in tasks]
 
 
 async def extract_entities(
@@ -533,11 +873,6 @@ async def extract_entities(
     total_entities_count = 0
     total_relations_count = 0
 
-    # Get lock manager from shared storage
-    from .kg.shared_storage import get_graph_db_lock
-
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-
     # Use the global use_llm_func_with_cache function from utils.py
 
     async def _process_extraction_result(
@@ -682,32 +1017,9 @@ async def extract_entities(
         async with semaphore:
             return await _process_single_content(chunk)
 
-    tasks = []
-    for c in ordered_chunks:
-        task = asyncio.create_task(_process_with_semaphore(c))
-        tasks.append(task)
-
-    # Wait for tasks to complete or for the first exception to occur
-    # This allows us to cancel remaining tasks if any task fails
-    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
-
-    # Check if any task raised an exception
-    for task in done:
-        if task.exception():
-            # If a task failed, cancel all pending tasks
-            # This prevents unnecessary processing since the parent function will abort anyway
-            for pending_task in pending:
-                pending_task.cancel()
-
-            # Wait for cancellation to complete
-            if pending:
-                await asyncio.wait(pending)
-
-            # Re-raise the exception to notify the caller
-            raise task.exception()
-
-    # If all tasks completed successfully, collect results
-    chunk_results = [task.result() for task in tasks]
+    chunk_results = await _run_all_or_cancel(
+        [_process_with_semaphore(c) for c in ordered_chunks]
+    )
 
     # Collect all nodes and edges from all chunks
     all_nodes = defaultdict(list)
@@ -723,89 +1035,104 @@ async def extract_entities(
             sorted_edge_key = tuple(sorted(edge_key))
             all_edges[sorted_edge_key].extend(edges)
 
-    # Centralized processing of all nodes and edges
-    entities_data = []
-    relationships_data = []
-
-    # Use graph database lock to ensure atomic merges and updates
-    async with graph_db_lock:
-        # Process and update all entities at once
-        for entity_name, entities in all_nodes.items():
-            entity_data = await _merge_nodes_then_upsert(
-                entity_name,
-                entities,
-                knowledge_graph_inst,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
-            entities_data.append(entity_data)
-
-        # Process and update all relationships at once
-        for edge_key, edges in all_edges.items():
-            edge_data = await _merge_edges_then_upsert(
-                edge_key[0],
-                edge_key[1],
-                edges,
-                knowledge_graph_inst,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
-            if edge_data is not None:
-                relationships_data.append(edge_data)
-
-        # Update total counts
-        total_entities_count = len(entities_data)
-        total_relations_count = len(relationships_data)
-
-        log_message = f"Updating vector storage: {total_entities_count} entities..."
-        logger.info(log_message)
-        if pipeline_status is not None:
-            async with pipeline_status_lock:
-                pipeline_status["latest_message"] = log_message
-                pipeline_status["history_messages"].append(log_message)
+    # Merge up to llm_model_max_async keys at a time, in batches of the keys that
+    # share a lock, so that other documents can merge other keys meanwhile and
+    # the graph is read and written once per batch. All entities are merged
+    # before the relationships, which may create missing entities.
+    node_batches = defaultdict(list)
+    for entity_name in all_nodes:
+        node_batches[graph_node_lock_stripe(entity_name)].append(entity_name)
+    edge_batches = defaultdict(list)
+    for edge_key in all_edges:
+        edge_batches[graph_edge_lock_stripe(edge_key)].append(edge_key)
+
+    merge_args = (
+        knowledge_graph_inst,
+        global_config,
+        semaphore,
+        pipeline_status,
+        pipeline_status_lock,
+        llm_response_cache,
+    )
+    entities_data = [
+        node_data
+        for batch in await _run_all_or_cancel(
+            [
+                _merge_nodes_then_upsert(entity_names, all_nodes, *merge_args)
+                for entity_names in node_batches.values()
+            ]
+        )
+        for node_data in batch
+    ]
+    relationships_data = [
+        edge_data
+        for batch in await _run_all_or_cancel(
+            [
+                _merge_edges_then_upsert(edge_keys, all_edges, *merge_args)
+                for edge_keys in edge_batches.values()
+            ]
+        )
+        for edge_data in batch
+    ]
 
-        # Update vector databases with all collected data
-        if entity_vdb is not None and entities_data:
-            data_for_vdb = {
-                compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
-                    "entity_name": dp["entity_name"],
-                    "entity_type": dp["entity_type"],
-                    "content": f"{dp['entity_name']}\n{dp['description']}",
-                    "source_id": dp["source_id"],
-                    "file_path": dp.get("file_path", "unknown_source"),
-                }
-                for dp in entities_data
+    # Update total counts
+    total_entities_count = len(entities_data)
+    total_relations_count = len(relationships_data)
+
+    log_message = f"Updating vector storage: {total_entities_count} entities..."
+    logger.info(log_message)
+    if pipeline_status is not None:
+        async with pipeline_status_lock:
+            pipeline_status["latest_message"] = log_message
+            pipeline_status["history_messages"].append(log_message)
+
+    # Update vector databases with all collected data
+    if entity_vdb is not None and entities_data:
+        data_for_vdb = {
+            compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
+                "entity_name": dp["entity_name"],
+                "entity_type": dp["entity_type"],
+                "content": f"{dp['entity_name']}\n{dp['description']}",
+                "source_id": dp["source_id"],
+                "file_path": dp.get("file_path", "unknown_source"),
+            }
+            for dp in entities_data
+        }
+        await entity_vdb.upsert(data_for_vdb)
+
+    log_message = f"Updating vector storage: {total_relations_count} relationships..."
+    logger.info(log_message)
+    if pipeline_status is not None:
+        async with pipeline_status_lock:
+            pipeline_status["latest_message"] = log_message
+            pipeline_status["history_messages"].append(log_message)
+
+    if relationships_vdb is not None and relationships_data:
+        data_for_vdb = {
+            compute_mdhash_id(dp["src_id"] + dp["tgt_id"], prefix="rel-"): {
+                "src_id": dp["src_id"],
+                "tgt_id": dp["tgt_id"],
+                "keywords": dp["keywords"],
+                "content": f"{dp['src_id']}\t{dp['tgt_id']}\n{dp['keywords']}\n{dp['description']}",
+                "source_id": dp["source_id"],
+                "file_path": dp.get("file_path", "unknown_source"),
             }
-            await entity_vdb.upsert(data_for_vdb)
+            for dp in relationships_data
+        }
+        await relationships_vdb.upsert(data_for_vdb)
 
-        log_message = (
-            f"Updating vector storage: {total_relations_count} relationships..."
-        )
-        logger.info(log_message)
-        if pipeline_status is not None:
-            async with pipeline_status_lock:
-                pipeline_status["latest_message"] = log_message
-                pipeline_status["history_messages"].append(log_message)
 
-        if relationships_vdb is not None and relationships_data:
-            data_for_vdb = {
-                compute_mdhash_id(dp["src_id"] + dp["tgt_id"], prefix="rel-"): {
-                    "src_id": dp["src_id"],
-                    "tgt_id": dp["tgt_id"],
-                    "keywords": dp["keywords"],
-                    "content": f"{dp['src_id']}\t{dp['tgt_id']}\n{dp['keywords']}\n{dp['description']}",
-                    "source_id": dp["source_id"],
-                    "file_path": dp.get("file_path", "unknown_source"),
-                }
-                for dp in relationships_data
-            }
-            await relationships_vdb.upsert(data_for_vdb)
+def _log_prompt_tokens(tokenizer: Tokenizer, label: str, prompt: str) -> None:
+    """Log the prompt length; the prompt is only tokenized when debug logging or
+    tracing is on."""
+    if not (logger.isEnabledFor(logging.DEBUG) or tracing_enabled()):
+        return
+    len_of_prompts = len(tokenizer.encode(prompt))
+    logger.debug(f"[{label}]Prompt Tokens: {len_of_prompts}")
+    current_span().set_attribute("prompt_tokens", len_of_prompts)
 
 
+@traced("kg_query")
 async def kg_query(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -827,6 +1154,9 @@ async def kg_query(
     cached_response, quantized, min_val, max_val = await handle_cache(
         hashing_kv, args_hash, query, query_param.mode, cache_type="query"
     )
+    current_span().set_attributes(
+        mode=query_param.mode, cache_hit=cached_response is not None
+    )
     if cached_response is not None:
         return cached_response
 
@@ -890,9 +1220,7 @@ async def kg_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    tokenizer: Tokenizer = global_config["tokenizer"]
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
+    _log_prompt_tokens(global_config["tokenizer"], "kg_query", query + sys_prompt)
 
     response = await use_model_func(
         query,
@@ -961,6 +1289,7 @@ async def get_keywords_from_query(
     return hl_keywords, ll_keywords
 
 
+@traced("extract_keywords")
 async def extract_keywords_only(
     text: str,
     param: QueryParam,
@@ -978,6 +1307,7 @@ async def extract_keywords_only(
     cached_response, quantized, min_val, max_val = await handle_cache(
         hashing_kv, args_hash, text, param.mode, cache_type="keywords"
     )
+    current_span().set_attribute("cache_hit", cached_response is not None)
     if cached_response is not None:
         try:
             keywords_data = json.loads(cached_response)
@@ -1013,9 +1343,7 @@ async def extract_keywords_only(
         query=text, examples=examples, language=language, history=history_context
     )
 
-    tokenizer: Tokenizer = global_config["tokenizer"]
-    len_of_prompts = len(tokenizer.encode(kw_prompt))
-    logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
+    _log_prompt_tokens(global_config["tokenizer"], "kg_query", kw_prompt)
 
     # 5. Call the LLM for keyword extraction
     use_model_func = (
@@ -1061,6 +1389,7 @@ async def extract_keywords_only(
     return hl_keywords, ll_keywords
 
 
+@traced("mix_kg_vector_query")
 async def mix_kg_vector_query(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -1093,6 +1422,7 @@ async def mix_kg_vector_query(
     cached_response, quantized, min_val, max_val = await handle_cache(
         hashing_kv, args_hash, query, "mix", cache_type="query"
     )
+    current_span().set_attribute("cache_hit", cached_response is not None)
     if cached_response is not None:
         return cached_response
 
@@ -1155,8 +1485,11 @@ async def mix_kg_vector_query(
         try:
             # Reduce top_k for vector search in hybrid mode since we have structured information from KG
             mix_topk = min(10, query_param.top_k)
-            results = await chunks_vdb.query(
-                augmented_query, top_k=mix_topk, ids=query_param.ids
+            results = await trace_call(
+                "vector.query",
+                chunks_vdb.query(augmented_query, top_k=mix_topk, ids=query_param.ids),
+                namespace=chunks_vdb.namespace,
+                top_k=mix_topk,
             )
             if not results:
                 return None
@@ -1170,6 +1503,7 @@ async def mix_kg_vector_query(
                     # Merge chunk content and time metadata
                     chunk_with_time = {
                         "content": chunk["content"],
+                        "tokens": chunk.get("tokens"),
                         "created_at": result.get("created_at", None),
                         "file_path": result.get("file_path", None),
                     }
@@ -1181,6 +1515,7 @@ async def mix_kg_vector_query(
             maybe_trun_chunks = truncate_list_by_token_size(
                 valid_chunks,
                 key=lambda x: x["content"],
+                count_key=lambda x: x.get("tokens"),
                 max_token_size=query_param.max_token_for_text_unit,
                 tokenizer=tokenizer,
             )
@@ -1247,8 +1582,7 @@ async def mix_kg_vector_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[mix_kg_vector_query]Prompt Tokens: {len_of_prompts}")
+    _log_prompt_tokens(tokenizer, "mix_kg_vector_query", query + sys_prompt)
 
     # 6. Generate response
     response = await use_model_func(
@@ -1288,6 +1622,7 @@ async def mix_kg_vector_query(
     return response
 
 
+@traced("build_query_context")
 async def _build_query_context(
     ll_keywords: str,
     hl_keywords: str,
@@ -1378,6 +1713,7 @@ async def _build_query_context(
     return result
 
 
+@traced("get_node_data")
 async def _get_node_data(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -1390,20 +1726,32 @@ async def _get_node_data(
         f"Query nodes: {query}, top_k: {query_param.top_k}, cosine: {entities_vdb.cosine_better_than_threshold}"
     )
 
-    results = await entities_vdb.query(
-        query, top_k=query_param.top_k, ids=query_param.ids
+    results = await trace_call(
+        "vector.query",
+        entities_vdb.query(query, top_k=query_param.top_k, ids=query_param.ids),
+        namespace=entities_vdb.namespace,
+        top_k=query_param.top_k,
     )
+    current_span().set_attribute("entities", len(results))
 
     if not len(results):
-        return "", "", ""
+        return [], [], []
 
     # Extract all entity IDs from your results list
     node_ids = [r["entity_name"] for r in results]
 
     # Call the batch node retrieval and degree functions concurrently.
     nodes_dict, degrees_dict = await asyncio.gather(
-        knowledge_graph_inst.get_nodes_batch(node_ids),
-        knowledge_graph_inst.node_degrees_batch(node_ids),
+        trace_call(
+            "graph.get_nodes_batch",
+            knowledge_graph_inst.get_nodes_batch(node_ids),
+            count=len(node_ids),
+        ),
+        trace_call(
+            "graph.node_degrees_batch",
+            knowledge_graph_inst.node_degrees_batch(node_ids),
+            count=len(node_ids),
+        ),
     )
 
     # Now, if you need the node data and degree in order:
@@ -1436,6 +1784,7 @@ async def _get_node_data(
     node_datas = truncate_list_by_token_size(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
     )
@@ -1539,7 +1888,11 @@ async def _find_most_related_text_unit_from_entities(
     ]
 
     node_names = [dp["entity_name"] for dp in node_datas]
-    batch_edges_dict = await knowledge_graph_inst.get_nodes_edges_batch(node_names)
+    batch_edges_dict = await trace_call(
+        "graph.get_nodes_edges_batch",
+        knowledge_graph_inst.get_nodes_edges_batch(node_names),
+        count=len(node_names),
+    )
     # Build the edges list in the same order as node_datas.
     edges = [batch_edges_dict.get(name, []) for name in node_names]
 
@@ -1552,8 +1905,10 @@ async def _find_most_related_text_unit_from_entities(
     all_one_hop_nodes = list(all_one_hop_nodes)
 
     # Batch retrieve one-hop node data using get_nodes_batch
-    all_one_hop_nodes_data_dict = await knowledge_graph_inst.get_nodes_batch(
-        all_one_hop_nodes
+    all_one_hop_nodes_data_dict = await trace_call(
+        "graph.get_nodes_batch",
+        knowledge_graph_inst.get_nodes_batch(all_one_hop_nodes),
+        count=len(all_one_hop_nodes),
     )
     all_one_hop_nodes_data = [
         all_one_hop_nodes_data_dict.get(e) for e in all_one_hop_nodes
@@ -1619,6 +1974,7 @@ async def _find_most_related_text_unit_from_entities(
     all_text_units = truncate_list_by_token_size(
         all_text_units,
         key=lambda x: x["data"]["content"],
+        count_key=lambda x: x["data"].get("tokens"),
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
     )
@@ -1637,7 +1993,11 @@ async def _find_most_related_edges_from_entities(
     knowledge_graph_inst: BaseGraphStorage,
 ):
     node_names = [dp["entity_name"] for dp in node_datas]
-    batch_edges_dict = await knowledge_graph_inst.get_nodes_edges_batch(node_names)
+    batch_edges_dict = await trace_call(
+        "graph.get_nodes_edges_batch",
+        knowledge_graph_inst.get_nodes_edges_batch(node_names),
+        count=len(node_names),
+    )
 
     all_edges = []
     seen = set()
@@ -1658,8 +2018,16 @@ async def _find_most_related_edges_from_entities(
 
     # Call the batched functions concurrently.
     edge_data_dict, edge_degrees_dict = await asyncio.gather(
-        knowledge_graph_inst.get_edges_batch(edge_pairs_dicts),
-        knowledge_graph_inst.edge_degrees_batch(edge_pairs_tuples),
+        trace_call(
+            "graph.get_edges_batch",
+            knowledge_graph_inst.get_edges_batch(edge_pairs_dicts),
+            count=len(edge_pairs_dicts),
+        ),
+        trace_call(
+            "graph.edge_degrees_batch",
+            knowledge_graph_inst.edge_degrees_batch(edge_pairs_tuples),
+            count=len(edge_pairs_tuples),
+        ),
     )
 
     # Reconstruct edge_datas list in the same order as the deduplicated results.
@@ -1681,6 +2049,7 @@ async def _find_most_related_edges_from_entities(
     all_edges_data = truncate_list_by_token_size(
         all_edges_data,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
     )
@@ -1692,6 +2061,7 @@ async def _find_most_related_edges_from_entities(
     return all_edges_data
 
 
+@traced("get_edge_data")
 async def _get_edge_data(
     keywords,
     knowledge_graph_inst: BaseGraphStorage,
@@ -1703,12 +2073,16 @@ async def _get_edge_data(
         f"Query edges: {keywords}, top_k: {query_param.top_k}, cosine: {relationships_vdb.cosine_better_than_threshold}"
     )
 
-    results = await relationships_vdb.query(
-        keywords, top_k=query_param.top_k, ids=query_param.ids
+    results = await trace_call(
+        "vector.query",
+        relationships_vdb.query(keywords, top_k=query_param.top_k, ids=query_param.ids),
+        namespace=relationships_vdb.namespace,
+        top_k=query_param.top_k,
     )
+    current_span().set_attribute("relations", len(results))
 
     if not len(results):
-        return "", "", ""
+        return [], [], []
 
     # Prepare edge pairs in two forms:
     # For the batch edge properties function, use dicts.
@@ -1718,8 +2092,16 @@ async def _get_edge_data(
 
     # Call the batched functions concurrently.
     edge_data_dict, edge_degrees_dict = await asyncio.gather(
-        knowledge_graph_inst.get_edges_batch(edge_pairs_dicts),
-        knowledge_graph_inst.edge_degrees_batch(edge_pairs_tuples),
+        trace_call(
+            "graph.get_edges_batch",
+            knowledge_graph_inst.get_edges_batch(edge_pairs_dicts),
+            count=len(edge_pairs_dicts),
+        ),
+        trace_call(
+            "graph.edge_degrees_batch",
+            knowledge_graph_inst.edge_degrees_batch(edge_pairs_tuples),
+            count=len(edge_pairs_tuples),
+        ),
     )
 
     # Reconstruct edge_datas list in the same order as results.
@@ -1745,6 +2127,7 @@ async def _get_edge_data(
     edge_datas = truncate_list_by_token_size(
         edge_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
     )
@@ -1852,8 +2235,16 @@ async def _find_most_related_entities_from_relationships(
 
     # Batch approach: Retrieve nodes and their degrees concurrently with one query each.
     nodes_dict, degrees_dict = await asyncio.gather(
-        knowledge_graph_inst.get_nodes_batch(entity_names),
-        knowledge_graph_inst.node_degrees_batch(entity_names),
+        trace_call(
+            "graph.get_nodes_batch",
+            knowledge_graph_inst.get_nodes_batch(entity_names),
+            count=len(entity_names),
+        ),
+        trace_call(
+            "graph.node_degrees_batch",
+            knowledge_graph_inst.node_degrees_batch(entity_names),
+            count=len(entity_names),
+        ),
     )
 
     # Rebuild the list in the same order as entity_names
@@ -1873,6 +2264,7 @@ async def _find_most_related_entities_from_relationships(
     node_datas = truncate_list_by_token_size(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
     )
@@ -1933,6 +2325,7 @@ async def _find_related_text_unit_from_relationships(
     truncated_text_units = truncate_list_by_token_size(
         valid_text_units,
         key=lambda x: x["data"]["content"],
+        count_key=lambda x: x["data"].get("tokens"),
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
     )
@@ -1965,6 +2358,7 @@ def combine_contexts(entities, relationships, sources):
     return combined_entities, combined_relationships, combined_sources
 
 
+@traced("naive_query")
 async def naive_query(
     query: str,
     chunks_vdb: BaseVectorStorage,
@@ -1984,11 +2378,15 @@ async def naive_query(
     cached_response, quantized, min_val, max_val = await handle_cache(
         hashing_kv, args_hash, query, query_param.mode, cache_type="query"
     )
+    current_span().set_attribute("cache_hit", cached_response is not None)
     if cached_response is not None:
         return cached_response
 
-    results = await chunks_vdb.query(
-        query, top_k=query_param.top_k, ids=query_param.ids
+    results = await trace_call(
+        "vector.query",
+        chunks_vdb.query(query, top_k=query_param.top_k, ids=query_param.ids),
+        namespace=chunks_vdb.namespace,
+        top_k=query_param.top_k,
     )
     if not len(results):
         return PROMPTS["fail_response"]
@@ -2009,6 +2407,7 @@ async def naive_query(
     maybe_trun_chunks = truncate_list_by_token_size(
         valid_chunks,
         key=lambda x: x["content"],
+        count_key=lambda x: x.get("tokens"),
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
     )
@@ -2051,8 +2450,7 @@ async def naive_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
+    _log_prompt_tokens(tokenizer, "naive_query", query + sys_prompt)
 
     response = await use_model_func(
         query,
@@ -2199,9 +2597,9 @@ async def kg_query_with_keywords(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    tokenizer: Tokenizer = global_config["tokenizer"]
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
+    _log_prompt_tokens(
+        global_config["tokenizer"], "kg_query_with_keywords", query + sys_prompt
+    )
 
     # 6. Generate response
     response = await use_model_func(
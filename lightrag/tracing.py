@@ -0,0 +1,278 @@
+"""Lightweight tracing spans with local JSON and Chrome trace exporters.
+
+Spans follow the OpenTelemetry model (trace id, span id, parent, attributes,
+status) but are kept in an in-process buffer instead of being sent to a
+collector. Tracing is disabled by default and every helper is a no-op until it
+is enabled, either with ``TRACING_ENABLED=true`` or ``configure_tracing()``.
+
+Usage:
+    with span("vector.query", namespace="entities") as s:
+        results = await vdb.query(...)
+        s.set_attribute("results", len(results))
+
+    @traced("kg_query")
+    async def kg_query(...): ...
+
+The finished spans can be written with ``export_json`` or
+``export_chrome_trace`` (open the latter in chrome://tracing or Perfetto).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation. Use it as a context manager to start and end it."""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        attributes: Dict[str, Any],
+    ):
+        parent = _current_span.get()
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = tracer.next_span_id()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(8).hex()
+        self.lane = tracer.lane()
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = 0.0
+        self.duration = 0.0
+        self._start = 0.0
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.status = "error"
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer.finish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled; accepts and discards everything."""
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collects finished spans in a bounded in-memory buffer."""
+
+    def __init__(self, enabled: bool = False, max_spans: int = 100000):
+        self.enabled = enabled
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+        self._lanes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def next_span_id(self) -> int:
+        return next(self._ids)
+
+    def lane(self) -> int:
+        """Chrome trace thread id: one lane per asyncio task or OS thread, so
+        that the spans drawn in a lane are properly nested."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        with self._lock:
+            if key not in self._lanes:
+                self._lanes[key] = len(self._lanes) + 1
+            return self._lanes[key]
+
+    def start_span(self, name: str, **attributes: Any) -> Span | _NoopSpan:
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def finish(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s.trace_id == trace_id]
+        return sorted(spans, key=lambda s: s.start_time)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._lanes.clear()
+
+
+_tracer = Tracer(
+    enabled=os.getenv("TRACING_ENABLED", "false").lower() == "true",
+    max_spans=int(os.getenv("TRACING_MAX_SPANS", 100000)),
+)
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def configure_tracing(enabled: bool = True, max_spans: Optional[int] = None) -> Tracer:
+    """Enable or disable tracing at runtime, optionally resizing the buffer."""
+    _tracer.enabled = enabled
+    if max_spans is not None:
+        with _tracer._lock:
+            _tracer._spans = deque(_tracer._spans, maxlen=max_spans)
+    return _tracer
+
+
+def tracing_enabled() -> bool:
+    return _tracer.enabled
+
+
+def span(name: str, **attributes: Any) -> Span | _NoopSpan:
+    """Start a span as a child of the current one (or a new trace)."""
+    return _tracer.start_span(name, **attributes)
+
+
+def current_span() -> Span | _NoopSpan:
+    """The innermost active span, for adding attributes such as token counts."""
+    current = _current_span.get()
+    return current if current is not None else NOOP_SPAN
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable:
+    """Decorator that wraps every call of a sync or async function in a span."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _tracer.enabled:
+                    return await func(*args, **kwargs)
+                with span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def trace_call(name: str, awaitable: Awaitable, **attributes: Any) -> Any:
+    """Await ``awaitable`` inside a span, handy for calls passed to gather()."""
+    if not _tracer.enabled:
+        return await awaitable
+    with span(name, **attributes):
+        return await awaitable
+
+
+def _write(path: str, data: Any) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+
+
+def export_json(path: str, trace_id: Optional[str] = None) -> int:
+    """Write finished spans (optionally of one trace) as a JSON list.
+
+    Returns the number of spans written.
+    """
+    spans = _tracer.spans(trace_id)
+    _write(path, [s.to_dict() for s in spans])
+    return len(spans)
+
+
+def export_chrome_trace(path: str, trace_id: Optional[str] = None) -> int:
+    """Write finished spans in the Chrome trace event format.
+
+    Returns the number of spans written.
+    """
+    spans = _tracer.spans(trace_id)
+    events = [
+        {
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": s.start_time * 1e6,
+            "dur": s.duration * 1e6,
+            "pid": os.getpid(),
+            "tid": s.lane,
+            "args": {
+                **s.attributes,
+                "trace_id": s.trace_id,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "status": s.status,
+                **({"error": s.error} if s.error else {}),
+            },
+        }
+        for s in spans
+    ]
+    _write(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+    return len(spans)
@@ -15,6 +15,7 @@ from typing import Any, Protocol, Callable, TYPE_CHECKING, List
 import xml.etree.ElementTree as ET
 import numpy as np
 from lightrag.prompt import PROMPTS
+from lightrag.tracing import current_span, span, traced
 from dotenv import load_dotenv
 
 # Use TYPE_CHECKING to avoid circular imports
@@ -199,7 +200,9 @@ class EmbeddingFunc:
     # concurrent_limit: int = 16
 
     async def __call__(self, *args, **kwargs) -> np.ndarray:
-        return await self.func(*args, **kwargs)
+        texts = args[0] if args else kwargs.get("texts")
+        with span("embedding", texts=len(texts) if texts is not None else None):
+            return await self.func(*args, **kwargs)
 
 
 def locate_json_string_body_from_string(content: str) -> str | None:
@@ -284,6 +287,111 @@ def limit_async_func_call(max_size: int):
     return final_decro
 
 
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into full batches.
+
+    Texts submitted by concurrent callers (e.g. the chunk, entity and
+    relationship vector storages of several documents, or query-time lookups)
+    are queued and sent to ``func`` in batches of ``batch_size``. A partial
+    batch is flushed ``max_wait`` seconds after its first text was queued.
+    Identical texts that are queued or being embedded are only embedded once.
+    """
+
+    def __init__(self, func: Callable, batch_size: int, max_wait: float):
+        self.func = func
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._queue: list[str] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def __call__(self, texts: list[str], **kwargs) -> np.ndarray:
+        if kwargs or not texts:
+            # Calls with extra options cannot share a batch with other callers
+            return await self.func(texts, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Futures are bound to their loop, start over on a new one
+            self._loop = loop
+            self._pending, self._queue, self._timer = {}, [], None
+
+        futures = []
+        for text in texts:
+            future = self._pending.get(text)
+            if future is None:
+                future = loop.create_future()
+                self._pending[text] = future
+                self._queue.append(text)
+            futures.append(future)
+
+        self._flush(force=False)
+        if self._queue and self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, True)
+
+        # Shield the shared futures so that a cancelled caller does not cancel
+        # the results other callers are waiting for
+        results = await asyncio.gather(*(asyncio.shield(f) for f in futures))
+        return np.stack(results)
+
+    def _flush(self, force: bool) -> None:
+        while len(self._queue) >= self.batch_size or (force and self._queue):
+            batch = self._queue[: self.batch_size]
+            del self._queue[: self.batch_size]
+            task = asyncio.ensure_future(self._embed(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if not self._queue and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _embed(self, batch: list[str]) -> None:
+        futures = [self._pending[text] for text in batch]
+        try:
+            embeddings = await self.func(batch)
+            if len(embeddings) != len(batch):
+                raise ValueError(
+                    f"Embedding function returned {len(embeddings)} vectors "
+                    f"for {len(batch)} texts"
+                )
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark as retrieved, the callers may all have been cancelled
+                    future.exception()
+        else:
+            for future, embedding in zip(futures, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            for text, future in zip(batch, futures):
+                if self._pending.get(text) is future:
+                    del self._pending[text]
+
+
+def batch_async_embedding_calls(batch_size: int, max_wait: float):
+    """Route calls of an embedding function through a shared EmbeddingBatcher"""
+
+    def final_decro(func):
+        batcher = EmbeddingBatcher(func, batch_size, max_wait)
+
+        @wraps(func)
+        async def wait_func(texts: list[str], **kwargs) -> np.ndarray:
+            return await batcher(texts, **kwargs)
+
+        return wait_func
+
+    return final_decro
+
+
 def wrap_embedding_func_with_attrs(**kwargs):
     """Wrap a function with attributes"""
 
@@ -325,16 +433,31 @@ class Tokenizer:
     A wrapper around a tokenizer to provide a consistent interface for encoding and decoding.
     """
 
-    def __init__(self, model_name: str, tokenizer: TokenizerInterface):
+    def __init__(
+        self,
+        model_name: str,
+        tokenizer: TokenizerInterface,
+        count_cache_size: int = 65536,
+    ):
         """
         Initializes the Tokenizer with a tokenizer model name and a tokenizer instance.
 
         Args:
             model_name: The associated model name for the tokenizer.
             tokenizer: An instance of a class implementing the TokenizerInterface.
+            count_cache_size: Maximum number of token counts kept by `count_tokens`,
+                keyed by the MD5 hash of the text. 0 disables the cache.
         """
         self.model_name: str = model_name
         self.tokenizer: TokenizerInterface = tokenizer
+        self.count_cache_size = count_cache_size
+        self._count_cache: dict[bytes, int] = {}
+
+    def __getstate__(self) -> dict:
+        # Do not ship the count cache to worker processes
+        state = self.__dict__.copy()
+        state["_count_cache"] = {}
+        return state
 
     def encode(self, content: str) -> List[int]:
         """
@@ -360,6 +483,51 @@ class Tokenizer:
         """
         return self.tokenizer.decode(tokens)
 
+    def count_tokens(self, contents: List[str]) -> List[int]:
+        """
+        Counts the tokens of several strings at once.
+
+        Counts are cached by content hash, and the strings that are not cached yet
+        are encoded in one batch when the underlying tokenizer supports it
+        (tiktoken's `encode_batch` encodes them on a thread pool).
+
+        Args:
+            contents: The strings to count.
+
+        Returns:
+            The number of tokens of each string, in the same order.
+        """
+        counts: List[int | None] = [None] * len(contents)
+        missing: dict[bytes, list[int]] = {}
+        for i, content in enumerate(contents):
+            key = md5(content.encode("utf-8", "surrogatepass")).digest()
+            count = self._count_cache.get(key)
+            if count is not None:
+                counts[i] = count
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            texts = [contents[indexes[0]] for indexes in missing.values()]
+            encode_batch = getattr(self.tokenizer, "encode_batch", None)
+            if encode_batch is not None and len(texts) > 1:
+                encoded = encode_batch(texts)
+            else:
+                encoded = [self.tokenizer.encode(text) for text in texts]
+            for (key, indexes), tokens in zip(missing.items(), encoded):
+                for i in indexes:
+                    counts[i] = len(tokens)
+                self._cache_count(key, len(tokens))
+        return counts
+
+    def _cache_count(self, key: bytes, count: int) -> None:
+        if self.count_cache_size <= 0:
+            return
+        if len(self._count_cache) >= self.count_cache_size:
+            # Evict the oldest entry (dicts keep insertion order)
+            self._count_cache.pop(next(iter(self._count_cache)), None)
+        self._count_cache[key] = count
+
 
 class TiktokenTokenizer(Tokenizer):
     """
@@ -429,18 +597,63 @@ def truncate_list_by_token_size(
     key: Callable[[Any], str],
     max_token_size: int,
     tokenizer: Tokenizer,
+    count_key: Callable[[Any], int | None] | None = None,
 ) -> list[int]:
-    """Truncate a list of data by token size"""
+    """Truncate a list of data by token size
+
+    `count_key` returns the token count stored with an item (e.g. a chunk's
+    `tokens`), or None when it has none; only the remaining items are tokenized,
+    in one batch.
+    """
     if max_token_size <= 0:
         return []
+    counts = [None] * len(list_data)
+    if count_key is not None:
+        for i, data in enumerate(list_data):
+            counts[i] = parse_token_count(count_key(data))
+    missing = [i for i, count in enumerate(counts) if count is None]
+    if missing:
+        for i, count in zip(
+            missing, tokenizer.count_tokens([key(list_data[i]) for i in missing])
+        ):
+            counts[i] = count
     tokens = 0
-    for i, data in enumerate(list_data):
-        tokens += len(tokenizer.encode(key(data)))
+    for i, count in enumerate(counts):
+        tokens += count
         if tokens > max_token_size:
             return list_data[:i]
     return list_data
 
 
+def parse_token_count(value: Any) -> int | None:
+    """A stored token count, or None if it is missing or malformed"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        return None
+    return count if count >= 0 else None
+
+
+def attach_description_tokens(
+    data: dict[str, Any], tokenizer: Tokenizer | None
+) -> dict[str, Any]:
+    """Store the token count of a node or edge description in `description_tokens`
+
+    Must be called whenever the description changes, so that query-time truncation
+    can use the stored count instead of tokenizing the description again.
+    """
+    if tokenizer is None:
+        data.pop("description_tokens", None)
+        return data
+    description = data.get("description")
+    data["description_tokens"] = tokenizer.count_tokens(
+        [description if description is not None else ""]
+    )[0]
+    return data
+
+
 def list_of_list_to_json(data: list[list[str]]) -> list[dict[str, str]]:
     if not data or len(data) <= 1:
         return []
@@ -1319,6 +1532,7 @@ def lazy_external_import(module_name: str, class_name: str) -> Callable[..., Any
     return import_class
 
 
+@traced("llm.extract")
 async def use_llm_func_with_cache(
     input_text: str,
     use_llm_func: callable,
@@ -1358,6 +1572,9 @@ async def use_llm_func_with_cache(
             "default",
             cache_type=cache_type,
         )
+        current_span().set_attributes(
+            cache_type=cache_type, cache_hit=bool(cached_return)
+        )
         if cached_return:
             logger.debug(f"Found cache for {arg_hash}")
             statistic_data["llm_cache"] += 1
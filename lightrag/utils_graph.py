@@ -1,14 +1,62 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, cast
-
-from .kg.shared_storage import get_graph_db_lock
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, cast
+
+from .kg.shared_storage import (
+    get_graph_db_lock,
+    get_graph_edge_lock,
+    get_graph_node_lock,
+)
 from .prompt import GRAPH_FIELD_SEP
-from .utils import compute_mdhash_id, logger
+from .utils import attach_description_tokens, compute_mdhash_id, logger
 from .base import StorageNameSpace
 
 
+async def _entity_edges(
+    chunk_entity_relation_graph, entity_names: list[str], renames: dict[str, str]
+) -> set[tuple[str, str]]:
+    """The edges of the given entities, plus the edges they become after renaming"""
+    edges = set()
+    nodes_edges = await chunk_entity_relation_graph.get_nodes_edges_batch(entity_names)
+    for node_edges in nodes_edges.values():
+        for src, tgt in node_edges or []:
+            edges.add((src, tgt))
+            renamed = (renames.get(src, src), renames.get(tgt, tgt))
+            if renamed[0] != renamed[1]:
+                edges.add(renamed)
+    return edges
+
+
+@asynccontextmanager
+async def _lock_entities_with_edges(
+    chunk_entity_relation_graph,
+    entity_names: list[str],
+    renames: dict[str, str] | None = None,
+) -> AsyncIterator[None]:
+    """Hold the graph database lock, the locks of all edges of the given entities
+    (and of the edges they are renamed or merged into) and the entity locks.
+
+    Ingestion merges relations under their edge locks only, so rewriting or
+    deleting an entity's edges must hold those as well. Edge locks are taken
+    before node locks, like ingestion does. The edges are read again once they
+    are locked, and the locks are retaken if new edges appeared meanwhile.
+    """
+    renames = renames or {}
+    async with get_graph_db_lock(enable_logging=False):
+        edges = await _entity_edges(chunk_entity_relation_graph, entity_names, renames)
+        while True:
+            async with get_graph_edge_lock(edges), get_graph_node_lock(entity_names):
+                current = await _entity_edges(
+                    chunk_entity_relation_graph, entity_names, renames
+                )
+                if current <= edges:
+                    yield
+                    return
+            edges |= current
+
+
 async def adelete_by_entity(
     chunk_entity_relation_graph, entities_vdb, relationships_vdb, entity_name: str
 ) -> None:
@@ -20,9 +68,9 @@ async def adelete_by_entity(
         relationships_vdb: Vector database storage for relationships
         entity_name: Name of the entity to delete
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity and edge locks to exclude concurrent merges during ingestion
+    async with _lock_entities_with_edges(chunk_entity_relation_graph, [entity_name]):
         try:
             await entities_vdb.delete_entity(entity_name)
             await relationships_vdb.delete_entity_relation(entity_name)
@@ -69,8 +117,9 @@ async def adelete_by_relation(
         target_entity: Name of the target entity
     """
     graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity or relation lock to exclude concurrent merges during ingestion
+    async with graph_db_lock, get_graph_edge_lock([(source_entity, target_entity)]):
         try:
             # Check if the relation exists
             edge_exists = await chunk_entity_relation_graph.has_edge(
@@ -139,9 +188,14 @@ async def aedit_entity(
     Returns:
         Dictionary containing updated entity information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    new_entity_name = updated_data.get("entity_name", entity_name)
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity and edge locks to exclude concurrent merges during ingestion
+    async with _lock_entities_with_edges(
+        chunk_entity_relation_graph,
+        [entity_name, new_entity_name],
+        {entity_name: new_entity_name},
+    ):
         try:
             # 1. Get current entity information
             node_exists = await chunk_entity_relation_graph.has_node(entity_name)
@@ -171,6 +225,10 @@ async def aedit_entity(
             # 2. Update entity information in the graph
             new_node_data = {**node_data, **updated_data}
             new_node_data["entity_id"] = new_entity_name
+            attach_description_tokens(
+                new_node_data,
+                chunk_entity_relation_graph.global_config.get("tokenizer"),
+            )
 
             if "entity_name" in new_node_data:
                 del new_node_data[
@@ -352,8 +410,9 @@ async def aedit_relation(
         Dictionary containing updated relation information
     """
     graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity or relation lock to exclude concurrent merges during ingestion
+    async with graph_db_lock, get_graph_edge_lock([(source_entity, target_entity)]):
         try:
             # 1. Get current relation information
             edge_exists = await chunk_entity_relation_graph.has_edge(
@@ -377,6 +436,10 @@ async def aedit_relation(
 
             # 2. Update relation information in the graph
             new_edge_data = {**edge_data, **updated_data}
+            attach_description_tokens(
+                new_edge_data,
+                chunk_entity_relation_graph.global_config.get("tokenizer"),
+            )
             await chunk_entity_relation_graph.upsert_edge(
                 source_entity, target_entity, new_edge_data
             )
@@ -466,8 +529,9 @@ async def acreate_entity(
         Dictionary containing created entity information
     """
     graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity or relation lock to exclude concurrent merges during ingestion
+    async with graph_db_lock, get_graph_node_lock([entity_name]):
         try:
             # Check if entity already exists
             existing_node = await chunk_entity_relation_graph.has_node(entity_name)
@@ -481,6 +545,9 @@ async def acreate_entity(
                 "description": entity_data.get("description", ""),
                 "source_id": entity_data.get("source_id", "manual"),
             }
+            attach_description_tokens(
+                node_data, chunk_entity_relation_graph.global_config.get("tokenizer")
+            )
 
             # Add entity to knowledge graph
             await chunk_entity_relation_graph.upsert_node(entity_name, node_data)
@@ -549,8 +616,9 @@ async def acreate_relation(
         Dictionary containing created relation information
     """
     graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity or relation lock to exclude concurrent merges during ingestion
+    async with graph_db_lock, get_graph_edge_lock([(source_entity, target_entity)]):
         try:
             # Check if both entities exist
             source_exists = await chunk_entity_relation_graph.has_node(source_entity)
@@ -577,6 +645,9 @@ async def acreate_relation(
                 "source_id": relation_data.get("source_id", "manual"),
                 "weight": float(relation_data.get("weight", 1.0)),
             }
+            attach_description_tokens(
+                edge_data, chunk_entity_relation_graph.global_config.get("tokenizer")
+            )
 
             # Add relation to knowledge graph
             await chunk_entity_relation_graph.upsert_edge(
@@ -665,9 +736,13 @@ async def amerge_entities(
     Returns:
         Dictionary containing the merged entity information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
-    async with graph_db_lock:
+    # Use graph database lock to ensure atomic graph and vector db operations,
+    # and the entity and edge locks to exclude concurrent merges during ingestion
+    async with _lock_entities_with_edges(
+        chunk_entity_relation_graph,
+        [*source_entities, target_entity],
+        {entity_name: target_entity for entity_name in source_entities},
+    ):
         try:
             # Default merge strategy
             default_strategy = {
@@ -732,6 +807,8 @@ async def amerge_entities(
 
             # 5. Create or update the target entity
             merged_entity_data["entity_id"] = target_entity
+            tokenizer = chunk_entity_relation_graph.global_config.get("tokenizer")
+            attach_description_tokens(merged_entity_data, tokenizer)
             if not target_exists:
                 await chunk_entity_relation_graph.upsert_node(
                     target_entity, merged_entity_data
@@ -787,6 +864,7 @@ async def amerge_entities(
 
             # Apply relationship updates
             for rel_data in relation_updates.values():
+                attach_description_tokens(rel_data["data"], tokenizer)
                 await chunk_entity_relation_graph.upsert_edge(
                     rel_data["src"], rel_data["tgt"], rel_data["data"]
                 )
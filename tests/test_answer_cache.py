@@ -0,0 +1,167 @@
+"""
+Tests for the Text2SQL semantic answer cache, with fixed query embeddings.
+
+Run with: python -m pytest tests/test_answer_cache.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent import answer_cache  # noqa: E402
+from Agent.answer_cache import AnswerCache  # noqa: E402
+
+EMBEDDINGS = {
+    "how many orders": [1.0, 0.0, 0.0],
+    "number of orders": [0.99, 0.1, 0.0],
+    "top customers": [0.0, 1.0, 0.0],
+    "order amounts": [0.7, 0.0, 0.7],
+}
+
+
+async def embed(texts):
+    return np.array([EMBEDDINGS[text] for text in texts], dtype=np.float32)
+
+
+def _cache(**kwargs):
+    return AnswerCache(embed, similarity_threshold=0.95, **kwargs)
+
+
+def test_exact_and_similar_queries_hit():
+    async def run():
+        cache = _cache()
+        await cache.set_version("v1")
+        await cache.put("how many orders", "SELECT COUNT(*) FROM orders")
+        return (
+            await cache.get("how many orders"),
+            await cache.get("number of orders"),
+            await cache.get("top customers"),
+        )
+
+    exact, similar, miss = asyncio.run(run())
+    assert exact["sql"] == "SELECT COUNT(*) FROM orders"
+    assert exact["similarity"] == 1.0
+    assert "result" not in exact
+    assert similar["sql"] == "SELECT COUNT(*) FROM orders"
+    assert 0.95 <= similar["similarity"] < 1.0
+    assert miss is None
+
+
+def test_version_change_clears_the_cache():
+    async def run():
+        cache = _cache()
+        await cache.set_version("v1")
+        await cache.put("how many orders", "SELECT 1")
+        await cache.set_version("v1")
+        kept = await cache.get("how many orders")
+        await cache.set_version("v2")
+        return kept, await cache.get("how many orders")
+
+    kept, cleared = asyncio.run(run())
+    assert kept is not None
+    assert cleared is None
+
+
+def test_expired_entries_are_not_served():
+    async def run():
+        cache = _cache(ttl=60)
+        await cache.put("how many orders", "SELECT 1")
+        for entry in cache._entries.values():
+            entry["created_at"] = time.time() - 120
+        return await cache.get("how many orders")
+
+    assert asyncio.run(run()) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def run():
+        cache = _cache(max_entries=2)
+        await cache.put("how many orders", "SELECT 1")
+        await cache.put("top customers", "SELECT 2")
+        await cache.get("how many orders")
+        await cache.put("order amounts", "SELECT 3")
+        return [
+            await cache.get(query)
+            for query in ("how many orders", "top customers", "order amounts")
+        ]
+
+    kept, evicted, added = asyncio.run(run())
+    assert kept["sql"] == "SELECT 1"
+    assert evicted is None
+    assert added["sql"] == "SELECT 3"
+
+
+def test_entries_are_persisted(tmp_path):
+    cache_path = str(tmp_path / "answer_cache.json")
+
+    async def run():
+        cache = _cache(cache_path=cache_path)
+        await cache.set_version("v1")
+        await cache.put("how many orders", "SELECT COUNT(*) FROM orders")
+
+        reloaded = _cache(cache_path=cache_path)
+        return reloaded.version, await reloaded.get("number of orders")
+
+    version, entry = asyncio.run(run())
+    assert version == "v1"
+    assert entry["sql"] == "SELECT COUNT(*) FROM orders"
+
+
+def test_writes_do_not_block_queries(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "answers.json")
+    writer_threads = []
+    write_json = answer_cache.write_json
+
+    def slow_write_json(data, file_name):
+        writer_threads.append(threading.current_thread())
+        time.sleep(0.2)
+        write_json(data, file_name)
+
+    monkeypatch.setattr(answer_cache, "write_json", slow_write_json)
+
+    async def run():
+        cache = _cache(cache_path=cache_path)
+        await cache.set_version("v1")
+        await cache.put("how many orders", "SELECT 1")
+
+        put = asyncio.create_task(cache.put("top customers", "SELECT 2"))
+        await asyncio.sleep(0.05)
+        # The lookup is served while the file is being written
+        start = time.monotonic()
+        hit = await cache.get("how many orders")
+        elapsed = time.monotonic() - start
+        await put
+        return hit, elapsed
+
+    hit, elapsed = asyncio.run(run())
+    assert hit["sql"] == "SELECT 1"
+    assert elapsed < 0.1
+    assert threading.main_thread() not in writer_threads
+    assert len(_cache(cache_path=cache_path)._entries) == 2
+
+
+def test_concurrent_writes_keep_the_latest_entries(tmp_path):
+    cache_path = str(tmp_path / "answers.json")
+
+    async def run():
+        cache = _cache(cache_path=cache_path)
+        await cache.set_version("v1")
+        await asyncio.gather(
+            cache.put("how many orders", "SELECT 1"),
+            cache.put("top customers", "SELECT 2"),
+            cache.put("order amounts", "SELECT 3"),
+        )
+
+    asyncio.run(run())
+    reloaded = _cache(cache_path=cache_path)
+    assert sorted(entry["sql"] for entry in reloaded._entries.values()) == [
+        "SELECT 1",
+        "SELECT 2",
+        "SELECT 3",
+    ]
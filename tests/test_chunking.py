@@ -0,0 +1,176 @@
+"""
+Tests that the streaming chunker yields the same chunks as the original
+whole-document implementation of chunking_by_token_size.
+
+Run with: python -m pytest tests/test_chunking.py
+"""
+
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.operate import (  # noqa: E402
+    CHUNKING_SEGMENT_SIZE,
+    chunking_by_token_size,
+    init_chunking_worker,
+    iter_chunks_by_token_size,
+)
+from lightrag.utils import Tokenizer  # noqa: E402
+
+
+class ByteTokenizer:
+    def encode(self, content):
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+class BOSByteTokenizer(ByteTokenizer):
+    """Prepends a BOS token, so no document can be encoded in segments"""
+
+    def encode(self, content):
+        return [0] + super().encode(content)
+
+    def decode(self, tokens):
+        return super().decode([token for token in tokens if token != 0])
+
+
+def reference_chunking(
+    tokenizer,
+    content,
+    split_by_character=None,
+    split_by_character_only=False,
+    overlap_token_size=128,
+    max_token_size=1024,
+):
+    """The original chunking_by_token_size, encoding the whole document at once.
+
+    Returns (tokens, content) pairs; tokens is the window size like before,
+    recounted for chunks that stripping changed.
+    """
+
+    def stripped(count, chunk):
+        if chunk.strip() == chunk:
+            return count, chunk
+        return len(tokenizer.encode(chunk.strip())), chunk.strip()
+
+    tokens = tokenizer.encode(content)
+    chunks = []
+    step = max_token_size - overlap_token_size
+    if split_by_character:
+        for chunk in content.split(split_by_character):
+            _tokens = tokenizer.encode(chunk)
+            if split_by_character_only or len(_tokens) <= max_token_size:
+                chunks.append(stripped(len(_tokens), chunk))
+                continue
+            for start in range(0, len(_tokens), step):
+                chunks.append(
+                    stripped(
+                        min(max_token_size, len(_tokens) - start),
+                        tokenizer.decode(_tokens[start : start + max_token_size]),
+                    )
+                )
+    else:
+        for start in range(0, len(tokens), step):
+            chunks.append(
+                stripped(
+                    min(max_token_size, len(tokens) - start),
+                    tokenizer.decode(tokens[start : start + max_token_size]),
+                )
+            )
+    return chunks
+
+
+def _document(size):
+    rng = random.Random(size)
+    words = ["orders", "customers", "数据库", "amount", "表", "temperature", " "]
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+        if rng.random() < 0.1:
+            line = "\n" + line
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def _check(tokenizer, content, **kwargs):
+    chunks = chunking_by_token_size(tokenizer, content, **kwargs)
+    assert [
+        (chunk["tokens"], chunk["content"]) for chunk in chunks
+    ] == reference_chunking(tokenizer, content, **kwargs)
+    assert [chunk["chunk_order_index"] for chunk in chunks] == list(range(len(chunks)))
+    return chunks
+
+
+TOKENIZERS = [
+    Tokenizer("bytes", ByteTokenizer()),
+    Tokenizer("bos-bytes", BOSByteTokenizer()),
+]
+
+
+@pytest.mark.parametrize("tokenizer", TOKENIZERS, ids=lambda t: t.model_name)
+@pytest.mark.parametrize(
+    "overlap_token_size, max_token_size", [(128, 1024), (0, 300), (3, 7), (-3, 7)]
+)
+def test_token_windows_match_the_original(
+    tokenizer, overlap_token_size, max_token_size
+):
+    # Longer than a segment, so the document is tokenized in several pieces
+    content = _document(CHUNKING_SEGMENT_SIZE * 2 + 123)
+    _check(
+        tokenizer,
+        content,
+        overlap_token_size=overlap_token_size,
+        max_token_size=max_token_size,
+    )
+
+
+@pytest.mark.parametrize("split_by_character_only", [False, True])
+def test_split_by_character_matches_the_original(split_by_character_only):
+    tokenizer = TOKENIZERS[0]
+    content = _document(20000).replace("\n\n", "\n##\n")
+    _check(
+        tokenizer,
+        content,
+        split_by_character="##",
+        split_by_character_only=split_by_character_only,
+        overlap_token_size=20,
+        max_token_size=200,
+    )
+
+
+def test_short_and_empty_documents():
+    tokenizer = TOKENIZERS[0]
+    assert _check(tokenizer, "  one short chunk  ") == [
+        {"tokens": 15, "content": "one short chunk", "chunk_order_index": 0}
+    ]
+    assert _check(tokenizer, "") == []
+
+
+def test_overlap_must_be_smaller_than_the_window():
+    with pytest.raises(ValueError):
+        chunking_by_token_size(
+            TOKENIZERS[0], "text", overlap_token_size=100, max_token_size=100
+        )
+
+
+def test_process_pool_yields_the_same_chunks():
+    tokenizer = TOKENIZERS[0]
+    content = _document(CHUNKING_SEGMENT_SIZE * 3)
+    with ProcessPoolExecutor(
+        max_workers=2, initializer=init_chunking_worker, initargs=(tokenizer,)
+    ) as executor:
+        chunks = list(
+            iter_chunks_by_token_size(
+                tokenizer, content, max_token_size=500, executor=executor
+            )
+        )
+    assert chunks == chunking_by_token_size(tokenizer, content, max_token_size=500)
@@ -0,0 +1,161 @@
+"""
+Tests for keeping the prompt of the MCP tool call loop within its token budget:
+compacting large tool results and omitting old ones from the conversation.
+
+Run with: python -m pytest tests/test_context_budget.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.context_budget import (  # noqa: E402
+    OMITTED_RESULT,
+    ContextBudget,
+    parse_rows,
+    summarize_column,
+)
+from lightrag.utils import Tokenizer  # noqa: E402
+
+
+class ByteTokenizer:
+    def encode(self, content):
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+def _budget(**kwargs):
+    return ContextBudget(tokenizer=Tokenizer("bytes", ByteTokenizer()), **kwargs)
+
+
+def _rows(count):
+    return "\n".join(
+        f"{i}. row\nid: {i}\ncity: {'Paris' if i % 2 else 'None'}"
+        for i in range(1, count + 1)
+    )
+
+
+def _conversation(rounds, result_size=300):
+    """A checker conversation laid out like BaseAgent.process_query builds it"""
+    messages = [
+        {"role": "system", "content": "You check SQL. " * 20},
+        {"role": "user", "content": "Does SELECT id FROM orders answer the task?"},
+    ]
+    for turn in range(rounds):
+        call_ids = [f"call-{turn}-a", f"call-{turn}-b"]
+        messages.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {
+                            "name": "execute_query",
+                            "arguments": '{"query": "SELECT id FROM orders"}',
+                        },
+                    }
+                    for call_id in call_ids
+                ],
+            }
+        )
+        for call_id in call_ids:
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": call_id,
+                    "content": f"{turn}" * result_size,
+                }
+            )
+    return messages
+
+
+def _assert_pairs_intact(messages):
+    """Every tool call is answered right after its assistant message, in order"""
+    expected = []
+    for message in messages:
+        if message["role"] == "tool":
+            assert expected, "tool result without a preceding tool call"
+            assert message["tool_call_id"] == expected.pop(0)
+        else:
+            assert not expected, "tool call without its result"
+            expected = [call["id"] for call in message.get("tool_calls") or []]
+    assert not expected
+
+
+def test_rows_are_parsed_and_summarized():
+    rows = parse_rows(_rows(3))
+    assert rows == [
+        {"id": "1", "city": "Paris"},
+        {"id": "2", "city": "None"},
+        {"id": "3", "city": "Paris"},
+    ]
+    assert parse_rows("no rows here") is None
+    assert summarize_column(["1", "5", "3"]) == "3 distinct, min 1, max 5"
+    assert summarize_column(["Paris", "None"]) == "1 distinct, 1 null"
+
+
+def test_large_result_is_compacted():
+    budget = _budget(max_result_tokens=400, sample_rows=3)
+    text = _rows(100)
+    compacted = budget.compact_result(text)
+    assert budget.count_tokens(compacted) <= 400
+    assert compacted.startswith("Result set too large, showing a summary of 100 rows.")
+    assert "id: 100 distinct, min 1, max 100" in compacted
+    assert "3. row" in compacted and "4. row" not in compacted
+
+    assert budget.compact_result("small result") == "small result"
+
+
+def test_conversation_within_budget_is_unchanged():
+    messages = _conversation(rounds=2)
+    budget = _budget(max_prompt_tokens=100000)
+    assert budget.trim_messages(messages) == _conversation(rounds=2)
+
+
+def test_trimmed_conversation_fits_the_budget():
+    messages = _conversation(rounds=4)
+    budget = _budget(max_prompt_tokens=2000)
+    total = sum(budget._message_tokens(message) for message in messages)
+    assert total > 2000
+
+    trimmed = budget.trim_messages(messages)
+    assert sum(budget._message_tokens(message) for message in trimmed) <= 2000
+    # The oldest results went first, and only as many as needed
+    omitted = [m for m in trimmed if m.get("content") == OMITTED_RESULT]
+    assert [m["tool_call_id"] for m in omitted] == [
+        "call-0-a",
+        "call-0-b",
+        "call-1-a",
+        "call-1-b",
+    ]
+
+
+def test_system_prompt_and_latest_results_are_kept():
+    messages = _conversation(rounds=3)
+    original = _conversation(rounds=3)
+    # Far too small to fit, everything that may go is omitted
+    trimmed = _budget(max_prompt_tokens=10).trim_messages(messages)
+
+    assert trimmed[:2] == original[:2]
+    assert trimmed[-2:] == original[-2:]
+    assert all(
+        message["content"] == OMITTED_RESULT
+        for message in trimmed[:-2]
+        if message["role"] == "tool"
+    )
+
+
+def test_tool_call_pairs_are_never_split():
+    for rounds in range(1, 5):
+        for max_prompt_tokens in (10, 800, 1500, 100000):
+            messages = _conversation(rounds)
+            trimmed = _budget(max_prompt_tokens=max_prompt_tokens).trim_messages(
+                messages
+            )
+            assert len(trimmed) == len(_conversation(rounds))
+            _assert_pairs_intact(trimmed)
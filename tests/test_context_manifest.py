@@ -0,0 +1,119 @@
+"""
+Tests for the incremental ingestion of Text2SQL context files, with an in-memory
+stand-in for LightRAG.
+
+Run with: python -m pytest tests/test_context_manifest.py
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.context_manifest import ContextManifest, sync_context_files  # noqa: E402
+from lightrag.base import DocStatus  # noqa: E402
+
+
+class FakeDocStatus:
+    def __init__(self):
+        self.docs = {}
+
+    async def get_by_id(self, doc_id):
+        return self.docs.get(doc_id)
+
+
+class FakeRAG:
+    def __init__(self):
+        self.doc_status = FakeDocStatus()
+        self.inserted = []
+        self.deleted = []
+
+    async def ainsert(self, content, ids=None, file_paths=None):
+        self.inserted.append(file_paths)
+        self.doc_status.docs[ids] = {"status": DocStatus.PROCESSED}
+
+    async def adelete_by_doc_id(self, doc_id):
+        self.deleted.append(doc_id)
+        self.doc_status.docs.pop(doc_id, None)
+
+
+def _write(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return str(path)
+
+
+def _sync(rag, files, tmp_path):
+    return asyncio.run(sync_context_files(rag, files, str(tmp_path / "manifest.json")))
+
+
+def test_unchanged_files_are_not_ingested_again(tmp_path):
+    rag = FakeRAG()
+    files = [
+        _write(tmp_path / "a.txt", "table a"),
+        _write(tmp_path / "b.txt", "table b"),
+    ]
+    first = _sync(rag, files, tmp_path)
+    assert rag.inserted == files
+
+    rag.inserted.clear()
+    second = _sync(rag, files, tmp_path)
+    assert rag.inserted == []
+    assert rag.deleted == []
+    assert second.fingerprint() == first.fingerprint()
+
+
+def test_touched_file_with_same_content_is_not_ingested_again(tmp_path):
+    rag = FakeRAG()
+    path = _write(tmp_path / "a.txt", "table a")
+    _sync(rag, [path], tmp_path)
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    rag.inserted.clear()
+    manifest = _sync(rag, [path], tmp_path)
+
+    assert rag.inserted == []
+    assert manifest.is_unchanged(path)
+
+
+def test_changed_file_replaces_its_document(tmp_path):
+    rag = FakeRAG()
+    path = _write(tmp_path / "a.txt", "table a")
+    first = _sync(rag, [path], tmp_path)
+    old_doc_id = first.get(path)["doc_id"]
+
+    _write(tmp_path / "a.txt", "table a, with more columns")
+    rag.inserted.clear()
+    second = _sync(rag, [path], tmp_path)
+
+    assert rag.deleted == [old_doc_id]
+    assert rag.inserted == [path]
+    assert second.get(path)["doc_id"] != old_doc_id
+    assert second.fingerprint() != first.fingerprint()
+
+
+def test_removed_file_deletes_its_document(tmp_path):
+    rag = FakeRAG()
+    kept = _write(tmp_path / "a.txt", "table a")
+    removed = _write(tmp_path / "b.txt", "table b")
+    first = _sync(rag, [kept, removed], tmp_path)
+    removed_doc_id = first.get(removed)["doc_id"]
+
+    second = _sync(rag, [kept], tmp_path)
+
+    assert rag.deleted == [removed_doc_id]
+    assert second.get(removed) is None
+    assert ContextManifest(str(tmp_path / "manifest.json")).get(removed) is None
+
+
+def test_document_shared_with_a_kept_file_is_not_deleted(tmp_path):
+    rag = FakeRAG()
+    kept = _write(tmp_path / "a.txt", "same content")
+    removed = _write(tmp_path / "b.txt", "same content")
+    _sync(rag, [kept, removed], tmp_path)
+
+    _sync(rag, [kept], tmp_path)
+
+    assert rag.deleted == []
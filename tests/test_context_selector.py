@@ -0,0 +1,169 @@
+"""
+Tests for the per-subtask pruning of the retrieval context.
+
+Run with: python -m pytest tests/test_context_selector.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.context_selector import ContextSelector, parse_context, terms  # noqa: E402
+from lightrag.utils import Tokenizer  # noqa: E402
+
+
+class ByteTokenizer:
+    def encode(self, content):
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+ENTITIES = [
+    {
+        "id": 1,
+        "entity": "orders",
+        "type": "table",
+        "description": "orders placed by customers with amount and date",
+        "rank": 3,
+        "created_at": "2025-01-01",
+        "file_path": "schema.txt",
+    },
+    {
+        "id": 2,
+        "entity": "weather",
+        "type": "table",
+        "description": "daily temperature per city",
+        "rank": 1,
+        "created_at": "2025-01-01",
+        "file_path": "schema.txt",
+    },
+]
+RELATIONSHIPS = [
+    {
+        "id": 1,
+        "source": "orders",
+        "target": "customers",
+        "keywords": "foreign key",
+        "description": "orders.customer_id references customers.id",
+    }
+]
+SOURCES = [{"id": 1, "content": "The weather table stores a temperature per day."}]
+
+
+def _context(entities=ENTITIES, relationships=RELATIONSHIPS, sources=SOURCES):
+    parts = []
+    for title, items in (
+        ("Entities", entities),
+        ("Relationships", relationships),
+        ("Sources", sources),
+    ):
+        parts.append(f"-----{title}-----\n\n```json\n{json.dumps(items)}\n```\n")
+    return "\n".join(parts)
+
+
+def _selector(max_tokens=2000):
+    return ContextSelector(max_tokens, tokenizer=Tokenizer("bytes", ByteTokenizer()))
+
+
+def test_terms_split_words_and_chinese_bigrams():
+    assert terms("Total order_amount in 2023") == [
+        "total",
+        "order_amount",
+        "in",
+        "2023",
+    ]
+    assert terms("平均气温") == ["平均", "均气", "气温"]
+
+
+def test_parse_context():
+    sections = parse_context(_context())
+    assert sections == {
+        "entities": ENTITIES,
+        "relationships": RELATIONSHIPS,
+        "sources": SOURCES,
+    }
+    assert parse_context("plain text") is None
+
+
+def test_relevant_items_are_kept_without_metadata():
+    selected = parse_context(
+        _selector().select(_context(), "total amount of orders by customer")
+    )
+    assert selected["entities"] == [
+        {
+            "entity": "orders",
+            "type": "table",
+            "description": "orders placed by customers with amount and date",
+        }
+    ]
+    assert selected["relationships"][0]["source"] == "orders"
+    assert "sources" not in selected
+
+
+def test_selection_fits_the_token_budget():
+    context = _context()
+    selector = _selector(max_tokens=120)
+    selected = selector.select(context, "orders customers temperature weather")
+    items = [item for items in parse_context(selected).values() for item in items]
+    assert items
+    assert (
+        sum(
+            selector.count_tokens(json.dumps(item, ensure_ascii=False))
+            for item in items
+        )
+        <= 120
+    )
+
+
+def test_unrelated_task_keeps_retrieval_order():
+    selected = parse_context(_selector().select(_context(), "xyz"))
+    assert [item["entity"] for item in selected["entities"]] == ["orders", "weather"]
+
+
+def test_unstructured_context_is_truncated():
+    assert _selector(max_tokens=10).select("a" * 50, "orders") == "a" * 10
+    assert _selector().select("", "orders") == ""
+
+
+def _mix_context(chunks):
+    # The layout of a mix mode query with only_need_context
+    vector_context = "\n--New Chunk--\n".join(
+        f"File path: notes.txt\n{chunk}" for chunk in chunks
+    )
+    return f"""
+        -----Knowledge Graph Context-----
+        {_context()}
+
+        -----Vector Context-----
+        {vector_context}
+        """.strip()
+
+
+def test_mix_context_keeps_the_vector_chunks():
+    chunks = ["Refunds are stored as negative amounts.", "Dates are in UTC."]
+    selected = _selector().select(_mix_context(chunks), "total amount of orders")
+    assert parse_context(selected)["entities"][0]["entity"] == "orders"
+    assert "Knowledge Graph Context" not in selected
+    assert selected.endswith(
+        "-----Vector Context-----\n        File path: notes.txt\n"
+        "Refunds are stored as negative amounts.\n--New Chunk--\n"
+        "File path: notes.txt\nDates are in UTC."
+    )
+
+
+def test_vector_chunks_get_the_remaining_budget():
+    selector = _selector(max_tokens=150)
+    selected = selector.select(_mix_context(["x" * 500]), "total amount of orders")
+    items = parse_context(selected)["entities"] + parse_context(selected).get(
+        "relationships", []
+    )
+    used = sum(
+        selector.count_tokens(json.dumps(item, ensure_ascii=False)) for item in items
+    )
+    rest = selected.split("-----Vector Context-----", 1)[1]
+    assert used > 0
+    assert selector.count_tokens("-----Vector Context-----" + rest) <= 150 - used
@@ -0,0 +1,150 @@
+"""
+Tests for coalescing concurrent embedding calls into shared batches.
+
+Run with: python -m pytest tests/test_embedding_batcher.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import EmbeddingBatcher, batch_async_embedding_calls  # noqa: E402
+
+
+class RecordingEmbedder:
+    """Embeds a text as [len(text), 1] and records every batch it was given"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.kwargs = []
+
+    async def __call__(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        self.kwargs.append(kwargs)
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("embedding service unavailable")
+        return np.array([[len(text), 1.0] for text in texts])
+
+
+def _vectors(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_concurrent_calls_share_batches():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, batch_size=4, max_wait=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            batcher(["a", "bb"]), batcher(["ccc", "dddd"]), batcher(["e", "ff"])
+        )
+
+    results = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert [result.tolist() for result in results] == [
+        _vectors(["a", "bb"]),
+        _vectors(["ccc", "dddd"]),
+        _vectors(["e", "ff"]),
+    ]
+    # The full batch went out at once, the rest after max_wait
+    assert embedder.batches == [["a", "bb", "ccc", "dddd"], ["e", "ff"]]
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, batch_size=100, max_wait=0.05)
+
+    async def run():
+        start = time.monotonic()
+        result = await batcher(["a"])
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert result.tolist() == _vectors(["a"])
+    assert embedder.batches == [["a"]]
+    assert elapsed >= 0.05
+
+
+def test_identical_texts_are_embedded_once():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, batch_size=8, max_wait=0.01)
+
+    async def run():
+        return await asyncio.gather(batcher(["a", "bb", "a"]), batcher(["bb"]))
+
+    first, second = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert first.tolist() == _vectors(["a", "bb", "a"])
+    assert second.tolist() == _vectors(["bb"])
+    assert embedder.batches == [["a", "bb"]]
+
+
+def test_calls_with_options_bypass_the_batcher():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, batch_size=8, max_wait=10)
+
+    result = asyncio.run(asyncio.wait_for(batcher(["a"], dim=2), timeout=5))
+    assert result.tolist() == _vectors(["a"])
+    assert embedder.kwargs == [{"dim": 2}]
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    embedder = RecordingEmbedder(fail=True)
+    batcher = EmbeddingBatcher(embedder, batch_size=2, max_wait=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            batcher(["a"]), batcher(["bb"]), return_exceptions=True
+        )
+
+    results = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    embedder.fail = False
+    result = asyncio.run(asyncio.wait_for(batcher(["a"]), timeout=5))
+    assert result.tolist() == _vectors(["a"])
+
+
+def test_wrong_number_of_vectors_is_an_error():
+    async def embed(texts):
+        return np.zeros((len(texts) - 1, 2))
+
+    batcher = EmbeddingBatcher(embed, batch_size=2, max_wait=0.01)
+    with pytest.raises(ValueError):
+        asyncio.run(asyncio.wait_for(batcher(["a", "bb"]), timeout=5))
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, batch_size=8, max_wait=0.02)
+
+    async def run():
+        cancelled = asyncio.create_task(batcher(["a"]))
+        other = asyncio.create_task(batcher(["a", "bb"]))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await other
+
+    result = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert result.tolist() == _vectors(["a", "bb"])
+
+
+def test_decorator_shares_one_batcher():
+    embedder = RecordingEmbedder()
+
+    @batch_async_embedding_calls(batch_size=3, max_wait=0.05)
+    async def embed(texts, **kwargs):
+        return await embedder(texts, **kwargs)
+
+    async def run():
+        return await asyncio.gather(embed(["a"]), embed(["bb"]), embed(["ccc"]))
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert embedder.batches == [["a", "bb", "ccc"]]
+    assert embed.__name__ == "embed"
@@ -0,0 +1,97 @@
+"""
+Tests for the batch methods of BaseGraphStorage, using the default
+implementations through NetworkXStorage.
+
+Run with: python -m pytest tests/test_graph_batch.py
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.kg.networkx_impl import NetworkXStorage  # noqa: E402
+from lightrag.kg.shared_storage import initialize_share_data  # noqa: E402
+
+
+async def _graph(working_dir):
+    initialize_share_data()
+    graph = NetworkXStorage(
+        namespace="chunk_entity_relation",
+        global_config={"working_dir": str(working_dir)},
+        embedding_func=None,
+    )
+    await graph.initialize()
+    return graph
+
+
+def test_node_batches(tmp_path):
+    async def run():
+        graph = await _graph(tmp_path)
+        await graph.upsert_nodes_batch(
+            [
+                ("orders", {"entity_type": "table", "description": "first"}),
+                ("customers", {"entity_type": "table"}),
+                # Later items win, like consecutive upsert_node calls
+                ("orders", {"entity_type": "table", "description": "second"}),
+            ]
+        )
+        exists = await graph.has_nodes_batch(["orders", "weather", "customers"])
+        nodes = await graph.get_nodes_batch(["orders", "weather"])
+        return exists, nodes
+
+    exists, nodes = asyncio.run(run())
+    assert exists == {"orders", "customers"}
+    assert list(nodes) == ["orders"]
+    assert nodes["orders"]["description"] == "second"
+
+
+def test_empty_batches(tmp_path):
+    async def run():
+        graph = await _graph(tmp_path)
+        await graph.upsert_nodes_batch([])
+        await graph.upsert_edges_batch([])
+        return (
+            await graph.has_nodes_batch([]),
+            await graph.get_nodes_batch([]),
+            await graph.get_edges_batch([]),
+            await graph.get_nodes_edges_batch([]),
+        )
+
+    assert asyncio.run(run()) == (set(), {}, {}, {})
+
+
+def test_edge_batches(tmp_path):
+    async def run():
+        graph = await _graph(tmp_path)
+        await graph.upsert_nodes_batch(
+            [(name, {"entity_type": "table"}) for name in ("a", "b", "c")]
+        )
+        await graph.upsert_edges_batch(
+            [
+                ("a", "b", {"weight": "1.0", "description": "first"}),
+                ("b", "c", {"weight": "2.0"}),
+                ("b", "a", {"weight": "3.0", "description": "second"}),
+            ]
+        )
+        edges = await graph.get_edges_batch(
+            [
+                {"src": "a", "tgt": "b"},
+                {"src": "c", "tgt": "b"},
+                {"src": "a", "tgt": "c"},
+            ]
+        )
+        node_edges = await graph.get_nodes_edges_batch(["b", "missing"])
+        return edges, node_edges
+
+    edges, node_edges = asyncio.run(run())
+    assert list(edges) == [("a", "b"), ("c", "b")]
+    # The graph is undirected, so the reversed upsert updated the same edge
+    assert edges[("a", "b")]["description"] == "second"
+    assert edges[("c", "b")]["weight"] == "2.0"
+    assert {frozenset(edge) for edge in node_edges["b"]} == {
+        frozenset(("a", "b")),
+        frozenset(("b", "c")),
+    }
+    assert node_edges["missing"] == []
@@ -0,0 +1,229 @@
+"""
+Concurrency tests for the keyed graph locks: entity edits and merges of other
+documents run while ingestion merges the same entities and relations.
+
+Run with: python -m pytest tests/test_graph_locks.py
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.kg.networkx_impl import NetworkXStorage  # noqa: E402
+from lightrag.kg.shared_storage import initialize_share_data  # noqa: E402
+from lightrag.operate import (  # noqa: E402
+    _merge_edges_then_upsert,
+    _merge_nodes_then_upsert,
+)
+from lightrag.prompt import GRAPH_FIELD_SEP  # noqa: E402
+from lightrag.utils import Tokenizer, attach_description_tokens  # noqa: E402
+from lightrag.utils_graph import aedit_entity  # noqa: E402
+
+
+class ByteTokenizer:
+    def encode(self, content):
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+class MemoryVectorStorage:
+    """Just enough of a vector storage for the entity edit functions"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def upsert(self, data):
+        self.data.update(data)
+
+    async def delete(self, ids):
+        for id_ in ids:
+            self.data.pop(id_, None)
+
+    async def get_by_id(self, id_):
+        return self.data.get(id_)
+
+    async def index_done_callback(self):
+        pass
+
+
+async def _slow_summary(prompt, **kwargs):
+    # Long enough for the rename to start while the relation is being merged
+    await asyncio.sleep(0.1)
+    return "summarized"
+
+
+def _global_config(working_dir):
+    tokenizer = Tokenizer("bytes", ByteTokenizer())
+    return {
+        "working_dir": str(working_dir),
+        "tokenizer": tokenizer,
+        "llm_model_func": _slow_summary,
+        "llm_model_max_token_size": 32768,
+        "summary_to_max_tokens": 500,
+        "force_llm_summary_on_merge": 2,
+        "addon_params": {},
+    }
+
+
+async def _graph(global_config):
+    initialize_share_data()
+    graph = NetworkXStorage(
+        namespace="chunk_entity_relation",
+        global_config=global_config,
+        embedding_func=None,
+    )
+    await graph.initialize()
+    return graph
+
+
+async def _rename_during_relation_merge(working_dir):
+    global_config = _global_config(working_dir)
+    tokenizer = global_config["tokenizer"]
+    graph = await _graph(global_config)
+
+    for name in ("Alpha", "Xeno"):
+        await graph.upsert_node(
+            name,
+            attach_description_tokens(
+                {
+                    "entity_id": name,
+                    "entity_type": "PERSON",
+                    "description": f"{name} description",
+                    "source_id": "chunk-1",
+                    "file_path": "doc-1",
+                },
+                tokenizer,
+            ),
+        )
+    await graph.upsert_edge(
+        "Alpha",
+        "Xeno",
+        attach_description_tokens(
+            {
+                "weight": 1.0,
+                "description": "stored relation",
+                "keywords": "stored",
+                "source_id": "chunk-1",
+                "file_path": "doc-1",
+            },
+            tokenizer,
+        ),
+    )
+
+    extracted = {
+        ("Alpha", "Xeno"): [
+            {
+                "src_id": "Alpha",
+                "tgt_id": "Xeno",
+                "weight": 1.0,
+                "description": "extracted relation",
+                "keywords": "extracted",
+                "source_id": "chunk-2",
+                "file_path": "doc-2",
+            }
+        ]
+    }
+
+    async def rename():
+        await asyncio.sleep(0.02)
+        await aedit_entity(
+            graph,
+            MemoryVectorStorage(),
+            MemoryVectorStorage(),
+            "Alpha",
+            {"entity_name": "Beta"},
+        )
+
+    await asyncio.gather(
+        _merge_edges_then_upsert(
+            [("Alpha", "Xeno")],
+            extracted,
+            graph,
+            global_config,
+            asyncio.Semaphore(4),
+        ),
+        rename(),
+    )
+    return graph
+
+
+def test_rename_concurrent_with_relation_merge(tmp_path):
+    graph = asyncio.run(_rename_during_relation_merge(tmp_path))
+    nx_graph = graph._graph
+
+    renamed_edge = nx_graph.get_edge_data("Beta", "Xeno")
+    assert renamed_edge is not None
+    if nx_graph.has_node("Alpha"):
+        # The rename ran first: the merge recreated the old name from scratch
+        # and must not have written the stored relation back to it
+        assert nx_graph.get_edge_data("Alpha", "Xeno")["description"] == (
+            "extracted relation"
+        )
+        assert renamed_edge["description"] == "stored relation"
+    else:
+        # The merge ran first: the renamed edge carries the merged relation
+        assert renamed_edge["description"] == "summarized"
+        assert set(renamed_edge["source_id"].split(GRAPH_FIELD_SEP)) == {
+            "chunk-1",
+            "chunk-2",
+        }
+
+
+async def _concurrent_entity_merges(working_dir):
+    global_config = _global_config(working_dir)
+    graph = await _graph(global_config)
+    await graph.upsert_node(
+        "Alpha",
+        attach_description_tokens(
+            {
+                "entity_id": "Alpha",
+                "entity_type": "PERSON",
+                "description": "stored entity",
+                "source_id": "chunk-1",
+                "file_path": "doc-1",
+            },
+            global_config["tokenizer"],
+        ),
+    )
+
+    def extracted(chunk_id):
+        return {
+            "Alpha": [
+                {
+                    "entity_name": "Alpha",
+                    "entity_type": "PERSON",
+                    "description": f"entity from {chunk_id}",
+                    "source_id": chunk_id,
+                    "file_path": "doc-2",
+                }
+            ]
+        }
+
+    # Both documents summarize the same stored node; the one writing last has
+    # to merge again on top of the other one instead of overwriting it
+    await asyncio.gather(
+        *(
+            _merge_nodes_then_upsert(
+                ["Alpha"],
+                extracted(chunk_id),
+                graph,
+                global_config,
+                asyncio.Semaphore(4),
+            )
+            for chunk_id in ("chunk-2", "chunk-3")
+        )
+    )
+    return await graph.get_node("Alpha")
+
+
+def test_concurrent_entity_merges_keep_both_updates(tmp_path):
+    node = asyncio.run(_concurrent_entity_merges(tmp_path))
+    assert set(node["source_id"].split(GRAPH_FIELD_SEP)) == {
+        "chunk-1",
+        "chunk-2",
+        "chunk-3",
+    }
@@ -0,0 +1,147 @@
+"""
+Tests for the striped per-key graph locks: the key to stripe mapping and the
+locking behaviour of KeyedUnifiedLock.
+
+Run with: python -m pytest tests/test_keyed_locks.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.kg import shared_storage  # noqa: E402
+from lightrag.kg.shared_storage import (  # noqa: E402
+    GRAPH_KEY_LOCK_STRIPES,
+    get_graph_edge_lock,
+    get_graph_node_lock,
+    graph_edge_lock_stripe,
+    graph_node_lock_stripe,
+    initialize_share_data,
+)
+
+
+@pytest.fixture(autouse=True)
+def shared_data():
+    initialize_share_data()
+
+
+def _distinct_stripe_names(count):
+    names, stripes = [], set()
+    i = 0
+    while len(names) < count:
+        stripe = graph_node_lock_stripe(f"entity-{i}")
+        if stripe not in stripes:
+            stripes.add(stripe)
+            names.append(f"entity-{i}")
+        i += 1
+    return names
+
+
+def test_stripe_mapping_is_deterministic():
+    for name in ["orders", "customers", "数据库", "\udcff"]:
+        stripe = graph_node_lock_stripe(name)
+        assert stripe == graph_node_lock_stripe(name)
+        assert 0 <= stripe < GRAPH_KEY_LOCK_STRIPES
+
+
+def test_edge_stripes_ignore_direction():
+    assert graph_edge_lock_stripe(("orders", "customers")) == graph_edge_lock_stripe(
+        ("customers", "orders")
+    )
+
+
+def test_stripes_are_taken_once_in_ascending_order():
+    names = _distinct_stripe_names(3)
+    lock = get_graph_node_lock([names[2], names[0], names[1], names[0]])
+    expected = sorted(graph_node_lock_stripe(name) for name in names)
+    assert [inner._name for inner in lock._locks] == [
+        f"graph_node_lock_{i}" for i in expected
+    ]
+
+
+def test_same_key_is_excluded():
+    events = []
+
+    async def hold(tag):
+        async with get_graph_node_lock(["orders"]):
+            events.append(f"{tag} in")
+            await asyncio.sleep(0.05)
+            events.append(f"{tag} out")
+
+    async def run():
+        await asyncio.gather(hold("a"), hold("b"))
+
+    asyncio.run(run())
+    assert events == ["a in", "a out", "b in", "b out"]
+
+
+def test_different_stripes_run_concurrently():
+    first, second = _distinct_stripe_names(2)
+    inside = []
+
+    async def hold(name):
+        async with get_graph_node_lock([name]):
+            inside.append(name)
+            await asyncio.sleep(0.05)
+            return len(inside)
+
+    async def run():
+        return await asyncio.gather(hold(first), hold(second))
+
+    # Both holders were inside at the same time
+    assert asyncio.run(run()) == [2, 2]
+
+
+def test_overlapping_key_sets_do_not_deadlock():
+    names = _distinct_stripe_names(4)
+
+    async def hold(keys):
+        for _ in range(20):
+            async with get_graph_edge_lock([(keys[0], keys[1])]):
+                async with get_graph_node_lock(keys):
+                    await asyncio.sleep(0)
+
+    async def run():
+        await asyncio.wait_for(
+            asyncio.gather(
+                hold(names),
+                hold(list(reversed(names))),
+                hold([names[1], names[3], names[0], names[2]]),
+            ),
+            timeout=5,
+        )
+
+    asyncio.run(run())
+
+
+def test_failed_acquire_releases_taken_stripes():
+    first, second = _distinct_stripe_names(2)
+    lock = get_graph_node_lock([first, second])
+
+    async def run():
+        # Cancel while waiting for the second stripe
+        blocker = get_graph_node_lock(
+            [max((first, second), key=graph_node_lock_stripe)]
+        )
+        async with blocker:
+            task = asyncio.create_task(lock.__aenter__())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Every stripe can be taken again
+        async with get_graph_node_lock([first, second]):
+            pass
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert lock._acquired == []
+    assert not any(
+        shared_storage._graph_key_locks["node"][graph_node_lock_stripe(name)].locked()
+        for name in (first, second)
+    )
@@ -0,0 +1,96 @@
+"""
+Tests for the shared agent LLM client: the per-provider concurrency limit and
+token usage tracking, with a fake client registered in place of OpenAI.
+
+Run with: python -m pytest tests/test_llm_client.py
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent import llm_client  # noqa: E402
+
+
+class FakeClient:
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return SimpleNamespace(
+            content=kwargs["messages"][-1]["content"],
+            usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5),
+        )
+
+    async def close(self):
+        self.closed = True
+
+
+class UsageTracker:
+    def __init__(self):
+        self.usages = []
+
+    def add_usage(self, usage):
+        self.usages.append(usage)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setenv("AGENT_MAX_ASYNC", "2")
+    client = FakeClient()
+    llm_client.register_client("default", client)
+    yield client
+    asyncio.run(llm_client.close_clients())
+
+
+def _ask(content):
+    return llm_client.chat_completion(
+        model="stub", messages=[{"role": "user", "content": content}]
+    )
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        llm_client.get_limiter("unknown")
+
+
+def test_requests_are_limited_per_provider(fake_client):
+    async def run():
+        return await asyncio.gather(*(_ask(str(i)) for i in range(6)))
+
+    responses = asyncio.run(run())
+    assert [response.content for response in responses] == [str(i) for i in range(6)]
+    assert fake_client.max_active == 2
+
+
+def test_usage_is_recorded_in_the_current_tracker(fake_client):
+    tracker = UsageTracker()
+
+    async def run():
+        with llm_client.track_usage(tracker):
+            await asyncio.gather(_ask("a"), _ask("b"))
+        await _ask("untracked")
+
+    asyncio.run(run())
+    assert (
+        tracker.usages
+        == [{"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}] * 2
+    )
+
+
+def test_close_clients_releases_the_shared_client(fake_client):
+    asyncio.run(llm_client.close_clients("default"))
+    assert fake_client.closed
+    assert "default" not in llm_client._clients
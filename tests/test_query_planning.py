@@ -0,0 +1,121 @@
+"""
+Tests for query planning: the simple query fast path, plan parsing and the
+plan cache. The reasoning model call is replaced by a stub.
+
+Run with: python -m pytest tests/test_query_planning.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent import split_query as split_query_module  # noqa: E402
+from Agent.split_query import (  # noqa: E402
+    PlanCache,
+    is_simple_query,
+    parse_plan,
+    plan_query,
+)
+
+TWO_TASK_PLAN = {
+    "task1": {"description": "average amount", "depends_on": []},
+    "task2": {"description": "orders above it", "depends_on": ["task1"]},
+}
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "How many orders were placed in 2023?",
+        "List all customers",
+        "查询上海昨天的平均气温",
+    ],
+)
+def test_simple_queries(query):
+    assert is_simple_query(query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "List the customers and their total order amounts",
+        "Which orders are above average amount?",
+        "Compare sales in 2022 with 2023",
+        "Show " + "very " * 20 + "long query",
+        "查询上海和北京的平均气温, 并比较两者",
+        "统计每个城市的订单数量占比情况以及排名前十的城市名称",
+    ],
+)
+def test_multi_step_queries(query):
+    assert not is_simple_query(query)
+
+
+def test_parse_plan():
+    answer = "```json\n" + json.dumps(TWO_TASK_PLAN) + "\n```"
+    assert parse_plan(answer) == TWO_TASK_PLAN
+    assert parse_plan("not json") is None
+    assert parse_plan("{}") is None
+    assert parse_plan('{"task1": {"description": ""}}') is None
+
+
+@pytest.fixture
+def reasoning_calls(monkeypatch):
+    calls = []
+
+    async def split_query(query, entities=None, provider="dashscope"):
+        calls.append(query)
+        return json.dumps(TWO_TASK_PLAN)
+
+    monkeypatch.setattr(split_query_module, "split_query", split_query)
+    return calls
+
+
+def test_simple_query_skips_the_reasoning_model(reasoning_calls):
+    plan = json.loads(asyncio.run(plan_query("List all customers")))
+    assert reasoning_calls == []
+    assert plan["task1"]["description"] == "List all customers"
+
+
+def test_repeated_query_uses_the_cached_plan(reasoning_calls, tmp_path):
+    cache_path = str(tmp_path / "plans.json")
+    query = "Which orders are above average amount?"
+
+    async def run():
+        cache = PlanCache(cache_path, version="context-1")
+        first = await plan_query(query, cache=cache)
+        # Case and whitespace do not matter
+        second = await plan_query(
+            "  which ORDERS are above average amount? ", cache=cache
+        )
+        reloaded = await plan_query(
+            query, cache=PlanCache(cache_path, version="context-1")
+        )
+        changed = await plan_query(
+            query, cache=PlanCache(cache_path, version="context-2")
+        )
+        return first, second, reloaded, changed
+
+    plans = asyncio.run(run())
+    assert all(json.loads(plan) == TWO_TASK_PLAN for plan in plans)
+    # Only the first query and the one after the context changed were planned
+    assert reasoning_calls == [query, query]
+
+
+def test_plan_cache_evicts_least_recently_used():
+    async def run():
+        cache = PlanCache(max_entries=2)
+        await cache.put("a", {"task1": {"description": "a"}})
+        await cache.put("b", {"task1": {"description": "b"}})
+        cache.get("a")
+        await cache.put("c", {"task1": {"description": "c"}})
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
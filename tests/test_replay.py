@@ -0,0 +1,137 @@
+"""
+Tests for recording and replaying LLM, embedding and MCP calls.
+
+Run with: python -m pytest tests/test_replay.py
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from mcp import types
+from openai.types.chat import ChatCompletion
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent import replay  # noqa: E402
+from lightrag.utils import EmbeddingFunc  # noqa: E402
+
+
+@pytest.fixture
+def cassette_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("AGENT_REPLAY_PATH", str(tmp_path / "cassette.jsonl"))
+    monkeypatch.setenv("AGENT_REPLAY_LATENCY", "0")
+    monkeypatch.setattr(replay, "_cassettes", {})
+
+    def set_mode(mode):
+        monkeypatch.setenv("AGENT_REPLAY_MODE", mode)
+        # Replay from the file rather than from the cassette held in memory
+        monkeypatch.setattr(replay, "_cassettes", {})
+
+    return set_mode
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("AGENT_REPLAY_MODE", "rewind")
+    with pytest.raises(ValueError):
+        replay.replay_mode()
+
+
+def test_lightrag_llm_calls_are_replayed_in_order(cassette_env):
+    answers = iter(["first", "second"])
+
+    async def llm(prompt, system_prompt=None, history_messages=None, **kwargs):
+        return next(answers)
+
+    func = replay.replayable_llm_func(llm)
+
+    cassette_env("record")
+    recorded = [asyncio.run(func("same prompt")) for _ in range(2)]
+
+    cassette_env("replay")
+    replayed = [asyncio.run(func("same prompt")) for _ in range(3)]
+    assert recorded == ["first", "second"]
+    # The last response is repeated once the recordings are used up
+    assert replayed == ["first", "second", "second"]
+    with pytest.raises(replay.ReplayMissError):
+        asyncio.run(func("other prompt"))
+
+
+def test_embeddings_replay_across_different_batches(cassette_env):
+    async def embed(texts):
+        return np.array([[len(text), 1.0] for text in texts])
+
+    func = replay.replayable_embedding_func(
+        EmbeddingFunc(embedding_dim=2, max_token_size=8192, func=embed)
+    )
+
+    cassette_env("record")
+    asyncio.run(func(["a", "bb"]))
+    asyncio.run(func(["ccc"]))
+
+    cassette_env("replay")
+    vectors = asyncio.run(func(["ccc", "a"]))
+    assert vectors.tolist() == [[3.0, 1.0], [1.0, 1.0]]
+    assert func.embedding_dim == 2
+    with pytest.raises(replay.ReplayMissError):
+        asyncio.run(func(["dddd"]))
+
+
+def _completion(content):
+    return ChatCompletion.model_validate(
+        {
+            "id": "recorded",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "stub",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+    )
+
+
+def test_chat_completions_are_replayed_without_a_client(cassette_env):
+    async def create(**kwargs):
+        return _completion("SELECT 1")
+
+    real_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    messages = [{"role": "user", "content": "one"}]
+
+    cassette_env("record")
+    client = replay.ReplayOpenAIClient("default", real_client)
+    asyncio.run(client.chat.completions.create(model="stub", messages=messages))
+
+    cassette_env("replay")
+    client = replay.ReplayOpenAIClient("default")
+    response = asyncio.run(
+        client.chat.completions.create(model="stub", messages=messages)
+    )
+    assert response.choices[0].message.content == "SELECT 1"
+
+
+def test_mcp_tool_calls_are_replayed_without_a_server(cassette_env):
+    class Session:
+        async def call_tool(self, name, arguments=None, **kwargs):
+            return types.CallToolResult(
+                content=[types.TextContent(type="text", text="1 row")]
+            )
+
+    cassette_env("record")
+    asyncio.run(replay.ReplaySession(Session()).call_tool("execute_query", {"q": 1}))
+
+    cassette_env("replay")
+    session = replay.ReplaySession()
+    result = asyncio.run(session.call_tool("execute_query", {"q": 1}))
+    assert result.content[0].text == "1 row"
+    with pytest.raises(replay.ReplayMissError):
+        asyncio.run(session.call_tool("execute_query", {"q": 2}))
@@ -0,0 +1,82 @@
+"""
+Tests for the cached database schema catalog against a SQLite database.
+
+Run with: python -m pytest tests/test_schema_catalog.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent import schema_catalog  # noqa: E402
+from Agent.schema_catalog import SchemaCatalog  # noqa: E402
+from Agent.sql_validator import SQLValidator  # noqa: E402
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    db_path = tmp_path / "shop.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+        INSERT INTO customers VALUES (1, 'Ann'), (2, 'Bob');
+        """
+    )
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{db_path}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A host that booted a few seconds ago, well within the refresh interval
+    now = [5.0]
+    monkeypatch.setattr(schema_catalog.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_never_loaded_catalog_is_loaded(db_url, clock):
+    catalog = SchemaCatalog(db_url, refresh_interval=300)
+    try:
+        schema = asyncio.run(catalog.relevant_schema("list the customers"))
+        assert "Table customers (2 rows)" in schema
+        assert catalog.version == 1
+
+        # Within the interval the structure is not read again
+        clock[0] += 10
+        assert not asyncio.run(catalog.refresh())
+        assert asyncio.run(catalog.refresh(force=True)) is False
+        assert catalog.version == 1
+    finally:
+        catalog.close()
+
+
+def test_validator_knows_tables_of_a_new_catalog(db_url, clock):
+    catalog = SchemaCatalog(db_url, refresh_interval=300)
+    try:
+        validator = SQLValidator(catalog)
+        assert asyncio.run(validator.validate("SELECT name FROM customers")) is None
+    finally:
+        catalog.close()
+
+
+def test_cached_structure_is_reused(db_url, clock, tmp_path):
+    cache_path = str(tmp_path / "schema.json")
+    first = SchemaCatalog(db_url, cache_path=cache_path)
+    asyncio.run(first.refresh())
+    first.close()
+
+    second = SchemaCatalog(db_url, cache_path=cache_path)
+    try:
+        assert second.table_names() == ["customers"]
+        # The structure is unchanged, so the cached row counts are kept
+        assert asyncio.run(second.refresh()) is False
+        assert second.tables["customers"]["row_count"] == 2
+    finally:
+        second.close()
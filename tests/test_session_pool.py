@@ -0,0 +1,150 @@
+"""
+Tests for the MCP session pool, using in-process clients instead of stdio servers.
+
+Run with: python -m pytest tests/test_session_pool.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.SessionPool import MCPSessionPool  # noqa: E402
+
+
+class FakeSession:
+    def __init__(self):
+        self.healthy = True
+
+    async def send_ping(self):
+        if not self.healthy:
+            raise ConnectionError("server is gone")
+
+
+class FakeClient:
+    connected = 0
+    cleaned_up = 0
+    fail_connect = False
+
+    def __init__(self):
+        self.session = None
+
+    async def connect_to_server(self, command, args, env=None):
+        if FakeClient.fail_connect:
+            raise OSError("can not start server")
+        FakeClient.connected += 1
+        self.session = FakeSession()
+
+    async def cleanup(self):
+        FakeClient.cleaned_up += 1
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_client():
+    FakeClient.connected = 0
+    FakeClient.cleaned_up = 0
+    FakeClient.fail_connect = False
+
+
+def _pool(size=2):
+    return MCPSessionPool("mcp", [], size=size, client_cls=FakeClient)
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        _pool(size=0)
+
+
+def test_leases_reuse_the_started_sessions():
+    async def run():
+        pool = _pool(size=2)
+        seen = set()
+        for _ in range(5):
+            async with pool.lease() as client:
+                seen.add(id(client))
+        await pool.close()
+        return seen
+
+    seen = asyncio.run(run())
+    assert len(seen) <= 2
+    assert FakeClient.connected == 2
+    assert FakeClient.cleaned_up == 2
+
+
+def test_leases_are_limited_to_the_pool_size():
+    async def run():
+        pool = _pool(size=2)
+        active = 0
+        max_active = 0
+
+        async def task():
+            nonlocal active, max_active
+            async with pool.lease():
+                active += 1
+                max_active = max(max_active, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(task() for _ in range(6)))
+        await pool.close()
+        return max_active
+
+    assert asyncio.run(run()) == 2
+
+
+def test_unhealthy_session_is_replaced():
+    async def run():
+        pool = _pool(size=1)
+        async with pool.lease() as client:
+            client.session.healthy = False
+        async with pool.lease() as replacement:
+            healthy = replacement.session.healthy
+        await pool.close()
+        return client, replacement, healthy
+
+    client, replacement, healthy = asyncio.run(run())
+    assert replacement is not client
+    assert healthy
+    assert FakeClient.connected == 2
+    assert FakeClient.cleaned_up == 2
+
+
+def test_start_failure_is_reported():
+    FakeClient.fail_connect = True
+
+    async def run():
+        pool = _pool(size=2)
+        with pytest.raises(RuntimeError):
+            await pool.start()
+        return pool.started
+
+    assert asyncio.run(run()) is False
+
+
+def test_close_during_a_lease():
+    async def run():
+        pool = _pool(size=1)
+
+        async def streamed_request():
+            async with pool.lease():
+                await asyncio.sleep(0.05)
+                return "answer"
+
+        request = asyncio.create_task(streamed_request())
+        await asyncio.sleep(0.01)
+        await pool.close()
+        # The request keeps its own result, the stopped server is not returned
+        result = await request
+
+        # A closed pool starts again on the next lease
+        async with pool.lease() as client:
+            restarted = client.session is not None
+        await pool.close()
+        return result, restarted
+
+    assert asyncio.run(run()) == ("answer", True)
+    assert FakeClient.connected == 2
+    assert FakeClient.cleaned_up == 2
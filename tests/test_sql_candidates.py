@@ -0,0 +1,127 @@
+"""
+Tests for generating several SQL candidates and picking one by executing them
+against a local SQLite database. SQL generation is replaced by a stub.
+
+Run with: python -m pytest tests/test_sql_candidates.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.SQLAgent import SQLAgent  # noqa: E402
+from Agent.manage import TaskManager  # noqa: E402
+from Agent.schema_catalog import SchemaCatalog  # noqa: E402
+from Agent.sql_validator import SQLValidator  # noqa: E402
+
+CANCELLED = "SELECT 'cancelled'"
+
+
+class CancellingValidator(SQLValidator):
+    """Cancels the local execution of one particular candidate"""
+
+    async def execute(self, sql, max_rows=100, timeout=10.0):
+        if sql == CANCELLED:
+            raise asyncio.CancelledError()
+        return await super().execute(sql, max_rows, timeout)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    db_path = tmp_path / "shop.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, amount REAL);
+        INSERT INTO orders VALUES (1, 10.0), (2, 5.0), (3, 7.5);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    catalog = SchemaCatalog(f"sqlite:///{db_path}")
+    manager = TaskManager()
+    manager.schema_catalog = catalog
+    manager.sql_validator = CancellingValidator(catalog)
+    yield manager
+    catalog.close()
+
+
+def _select(manager, candidates):
+    return asyncio.run(manager._select_candidate(candidates))
+
+
+def test_the_most_agreed_result_wins(manager):
+    candidates = [
+        "SELECT id FROM orders WHERE amount > 8",
+        "SELECT id FROM orders WHERE amount > 6",
+        # Same rows in a different order count as agreeing
+        "SELECT id FROM orders WHERE amount > 6 ORDER BY id DESC",
+    ]
+    sql, report = _select(manager, candidates)
+    assert sql == candidates[1]
+    assert [entry["rows"] for entry in report] == [1, 2, 2]
+
+
+def test_ties_go_to_the_earlier_candidate(manager):
+    candidates = ["SELECT COUNT(*) FROM orders", "SELECT SUM(amount) FROM orders"]
+    assert _select(manager, candidates)[0] == candidates[0]
+
+
+def test_failed_and_cancelled_candidates_are_skipped(manager):
+    candidates = [
+        "SELECT total FROM orders",
+        CANCELLED,
+        "SELECT id FROM orders",
+    ]
+    sql, report = _select(manager, candidates)
+    assert sql == "SELECT id FROM orders"
+    assert "Column 'total' does not exist" in report[0]["error"]
+    assert report[1] == {"sql": CANCELLED, "error": "CancelledError"}
+    assert report[2]["error"] is None
+
+
+def test_without_a_working_candidate_the_first_is_kept(manager):
+    candidates = ["SELECT total FROM orders", CANCELLED]
+    assert _select(manager, candidates)[0] == candidates[0]
+
+
+class StubSQLAgent(SQLAgent):
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = outcomes
+
+    async def generate_sql(
+        self, descriptions, prev_sqls, index, context, schema=None, temperature=None
+    ):
+        outcome = self.outcomes[temperature]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def _generate(agent, k):
+    return asyncio.run(agent.generate_candidates(["task"], [], 0, "context", k=k))
+
+
+def test_generation_failures_and_duplicates_are_dropped():
+    agent = StubSQLAgent(
+        {
+            None: "SELECT id FROM orders;",
+            0.5: RuntimeError("rate limited"),
+            0.75: asyncio.CancelledError(),
+            1.0: "select id\n  from orders",
+        }
+    )
+    assert _generate(agent, k=4) == ["SELECT id FROM orders;"]
+
+
+def test_generation_fails_when_no_candidate_is_left():
+    agent = StubSQLAgent({None: RuntimeError("rate limited"), 0.5: RuntimeError("x")})
+    with pytest.raises(RuntimeError, match="rate limited"):
+        _generate(agent, k=2)
@@ -0,0 +1,109 @@
+"""
+Tests for the local SQL pre-validation against a SQLite database.
+
+Run with: python -m pytest tests/test_sql_validator.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.schema_catalog import SchemaCatalog  # noqa: E402
+from Agent.sql_validator import SQLValidator  # noqa: E402
+
+
+@pytest.fixture
+def validator(tmp_path):
+    db_path = tmp_path / "shop.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY,
+            customer_id INTEGER REFERENCES customers(id),
+            amount REAL
+        );
+        INSERT INTO customers VALUES (1, 'Ann'), (2, 'Bob');
+        INSERT INTO orders VALUES (1, 1, 10.0), (2, 1, 5.0), (3, 2, 7.5);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    catalog = SchemaCatalog(f"sqlite:///{db_path}")
+    yield SQLValidator(catalog)
+    catalog.close()
+
+
+def _validate(validator, sql):
+    return asyncio.run(validator.validate(sql))
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT name FROM customers;",
+        "SELECT c.name, SUM(o.amount) AS total FROM customers c "
+        "JOIN orders o ON o.customer_id = c.id GROUP BY c.name ORDER BY total",
+        "WITH big AS (SELECT customer_id, amount FROM orders WHERE amount > 6) "
+        "SELECT customer_id FROM big",
+        "SELECT t.n FROM (SELECT COUNT(*) AS n FROM orders) t",
+    ],
+)
+def test_valid_queries_pass(validator, sql):
+    assert _validate(validator, sql) is None
+
+
+@pytest.mark.parametrize(
+    "sql, message",
+    [
+        ("SELECT name FROM customer", "Table 'customer' does not exist"),
+        ("SELECT c.email FROM customers c", "Column 'email' does not exist"),
+        ("SELECT x.name FROM customers c", "unknown table or alias 'x'"),
+        ("SELECT total FROM orders", "Column 'total' does not exist"),
+        ("SELECT name FROM customers WHERE", "SQL syntax error"),
+        ("SELECT 1; SELECT 2", "Expected exactly one SQL statement"),
+        ("SELECT no_such_function(id) FROM orders", "The database rejected"),
+    ],
+)
+def test_invalid_queries_are_reported(validator, sql, message):
+    assert message in _validate(validator, sql)
+
+
+def test_execute_returns_rows(validator):
+    rows, error = asyncio.run(
+        validator.execute("SELECT id FROM orders ORDER BY id", max_rows=2)
+    )
+    assert error is None
+    assert rows == [(1,), (2,)]
+
+
+def test_execute_rejects_writes(validator):
+    rows, error = asyncio.run(validator.execute("DELETE FROM orders"))
+    assert rows is None
+    assert error == "Only SELECT queries can be executed locally."
+
+    rows, _ = asyncio.run(validator.execute("SELECT COUNT(*) FROM orders"))
+    assert rows == [(3,)]
+
+
+def test_colons_in_literals_are_not_bind_parameters(validator):
+    sql = "SELECT name FROM customers WHERE name <> ':name' AND name <> '10:30'"
+    assert _validate(validator, sql) is None
+    rows, error = asyncio.run(validator.execute(sql + " ORDER BY id"))
+    assert error is None
+    assert rows == [("Ann",), ("Bob",)]
+
+
+def test_untokenizable_sql_is_left_to_the_checker(validator):
+    # Not a definite error, so no feedback is produced locally
+    assert _validate(validator, "SELECT name FROM customers WHERE name = 'Ann") is None
+    rows, error = asyncio.run(validator.execute("SELECT 'Ann"))
+    assert rows is None
+    assert error == "The SQL could not be parsed for local execution."
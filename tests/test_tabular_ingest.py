@@ -0,0 +1,212 @@
+"""
+Tests for ingesting CSV tables as schema entities and relations. Tables are
+written into a real LightRAG instance with local storages through
+ainsert_custom_kg; only the embedding and LLM functions are stubs.
+
+Run with: python -m pytest tests/test_tabular_ingest.py
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.context_manifest import sync_context_files  # noqa: E402
+from Agent.tabular_ingest import (  # noqa: E402
+    build_custom_kg,
+    find_foreign_keys,
+    ingest_table,
+    profile_csv,
+)
+from lightrag import LightRAG  # noqa: E402
+from lightrag.base import DocStatus  # noqa: E402
+from lightrag.kg.shared_storage import (  # noqa: E402
+    finalize_share_data,
+    initialize_pipeline_status,
+)
+from lightrag.utils import EmbeddingFunc, Tokenizer  # noqa: E402
+
+CUSTOMERS = 'id,name,city\n1,"Smith, Ann",Paris\n2,"Bob ""B"" Lee",\n3,Cy,Rome\n'
+ORDERS = "id,customer_id,amount,ordered_at\n1,1,10.5,2024-01-02\n2,3,,2024-02-03\n"
+
+
+class ByteTokenizer:
+    def encode(self, content):
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+async def embed(texts):
+    return np.array([[len(text), 1.0, 0.5] for text in texts], dtype=np.float32)
+
+
+async def no_llm(prompt, **kwargs):
+    raise AssertionError("tables are ingested without the LLM")
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_storage():
+    # Storages keep their data in process-wide shared namespaces
+    finalize_share_data()
+    yield
+    finalize_share_data()
+
+
+async def _rag(working_dir):
+    rag = LightRAG(
+        working_dir=str(working_dir),
+        embedding_func=EmbeddingFunc(embedding_dim=3, max_token_size=8192, func=embed),
+        llm_model_func=no_llm,
+        tokenizer=Tokenizer("bytes", ByteTokenizer()),
+    )
+    await rag.initialize_storages()
+    await initialize_pipeline_status()
+    return rag
+
+
+def test_header_and_rows_are_profiled():
+    profile = profile_csv(CUSTOMERS, "customers")
+    assert [column.name for column in profile.columns] == ["id", "name", "city"]
+    assert profile.row_count == 3
+    assert profile.primary_key == "id"
+
+    id_, name, city = profile.columns
+    assert (id_.data_type, id_.min_value, id_.max_value) == ("INTEGER", 1, 3)
+    # Quoted commas and escaped quotes stay inside one cell
+    assert name.samples == ["Smith, Ann", 'Bob "B" Lee', "Cy"]
+    # Empty cells are counted as nulls, not as values
+    assert (city.non_null, city.nulls, city.samples) == (2, 1, ["Paris", "Rome"])
+    assert not city.is_unique
+
+
+def test_types_and_empty_cells():
+    profile = profile_csv(ORDERS, "orders")
+    types = {column.name: column.data_type for column in profile.columns}
+    assert types == {
+        "id": "INTEGER",
+        "customer_id": "INTEGER",
+        "amount": "REAL",
+        "ordered_at": "DATETIME",
+    }
+    amount = profile.columns[2]
+    assert (amount.non_null, amount.nulls) == (1, 1)
+
+    with pytest.raises(ValueError):
+        profile_csv("", "empty")
+
+
+def test_rows_become_table_and_column_entities():
+    customers = profile_csv(CUSTOMERS, "customers")
+    orders = profile_csv(ORDERS, "orders")
+    tables = {"customers": customers.summary(), "orders": orders.summary()}
+    foreign_keys = find_foreign_keys(orders, tables)
+    assert foreign_keys == [
+        {"column": "customer_id", "ref_table": "customers", "ref_column": "id"}
+    ]
+
+    custom_kg = build_custom_kg(orders, foreign_keys)
+    assert [entity["entity_name"] for entity in custom_kg["entities"]] == [
+        "orders",
+        "orders.id",
+        "orders.customer_id",
+        "orders.amount",
+        "orders.ordered_at",
+    ]
+    assert (
+        "Foreign key: orders.customer_id references customers.id"
+        in custom_kg["chunks"][0]["content"]
+    )
+    assert custom_kg["relationships"][-1]["tgt_id"] == "customers.id"
+
+
+def test_tables_are_written_through_ainsert_custom_kg(tmp_path):
+    async def run():
+        rag = await _rag(tmp_path / "rag")
+        try:
+            customers = profile_csv(CUSTOMERS, "customers")
+            orders = profile_csv(ORDERS, "orders")
+            tables = {"customers": customers.summary(), "orders": orders.summary()}
+            await ingest_table(rag, customers, [], "doc-customers", "customers.csv")
+            await ingest_table(
+                rag,
+                orders,
+                find_foreign_keys(orders, tables),
+                "doc-orders",
+                "orders.csv",
+            )
+
+            graph = rag.chunk_entity_relation_graph
+            return (
+                await graph.get_node("customers.name"),
+                await graph.get_edge("customers", "customers.city"),
+                await graph.get_edge("orders.customer_id", "customers.id"),
+                await rag.doc_status.get_by_id("doc-orders"),
+                await rag.entities_vdb.query("customers.name", top_k=20),
+            )
+        finally:
+            await rag.finalize_storages()
+
+    name, has_column, foreign_key, status, entities = asyncio.run(run())
+    assert name["entity_type"] == "column"
+    assert 'sample values: Smith, Ann, Bob "B" Lee, Cy' in name["description"]
+    assert name["source_id"].startswith("chunk-")
+    assert has_column["keywords"] == "table column, schema"
+    assert foreign_key["keywords"] == "foreign key, join"
+    assert status["status"] == DocStatus.PROCESSED
+    assert status["chunks_count"] == 1
+    assert "customers.name" in {entity["entity_name"] for entity in entities}
+
+
+def test_reingesting_a_table_file(tmp_path):
+    csv_path = str(tmp_path / "customers.csv")
+    manifest_path = str(tmp_path / "manifest.json")
+
+    def write(content):
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    async def sync(rag):
+        await sync_context_files(rag, [csv_path], manifest_path)
+        graph = rag.chunk_entity_relation_graph
+        nodes = await graph.get_all_labels()
+        return sorted(node for node in nodes if node.startswith("customers"))
+
+    async def run():
+        rag = await _rag(tmp_path / "rag")
+        try:
+            write(CUSTOMERS)
+            first = await sync(rag)
+            # The same file again is left as it is
+            again = await sync(rag)
+            chunks = await rag.text_chunks.get_all()
+            # A changed file replaces the document of the old version
+            write(CUSTOMERS.replace(",city", ",country"))
+            changed = await sync(rag)
+            return first, again, len(chunks), changed
+        finally:
+            await rag.finalize_storages()
+
+    first, again, chunk_count, changed = asyncio.run(run())
+    assert (
+        first
+        == again
+        == [
+            "customers",
+            "customers.city",
+            "customers.id",
+            "customers.name",
+        ]
+    )
+    assert chunk_count == 1
+    assert changed == [
+        "customers",
+        "customers.country",
+        "customers.id",
+        "customers.name",
+    ]
@@ -0,0 +1,110 @@
+"""
+Tests for the dependency-aware subtask scheduler of the Text2SQL TaskManager.
+Task execution is replaced by a stub, so no LLM or MCP server is needed.
+
+Run with: python -m pytest tests/test_task_scheduler.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Agent.manage import TaskManager  # noqa: E402
+
+
+def test_dependencies_default_to_plan_order():
+    tasks = {"a": {}, "b": {}, "c": {}}
+    assert TaskManager._resolve_dependencies(tasks) == {
+        "a": [],
+        "b": ["a"],
+        "c": ["a", "b"],
+    }
+
+
+def test_invalid_and_duplicate_dependencies_are_dropped():
+    tasks = {
+        "a": {"depends_on": ["a", "missing"]},
+        "b": {"depends_on": "a"},
+        "c": {"depends_on": ["a", "b", "a"]},
+    }
+    assert TaskManager._resolve_dependencies(tasks) == {
+        "a": [],
+        "b": ["a"],
+        "c": ["a", "b"],
+    }
+
+
+def test_cyclic_dependencies_fall_back_to_plan_order():
+    tasks = {
+        "a": {"depends_on": ["c"]},
+        "b": {"depends_on": ["a"]},
+        "c": {"depends_on": ["b"]},
+    }
+    assert TaskManager._resolve_dependencies(tasks) == {
+        "a": [],
+        "b": ["a"],
+        "c": ["a", "b"],
+    }
+
+
+def test_final_task_is_the_last_sink():
+    assert TaskManager._final_task_id({"final": ["a", "b"], "a": [], "b": []}) == (
+        "final"
+    )
+    assert TaskManager._final_task_id({"a": [], "b": [], "c": ["a"]}) == "c"
+
+
+class StubTaskManager(TaskManager):
+    def __init__(self, fail=None):
+        super().__init__()
+        self.fail = fail
+        self.events = []
+        self.cancelled = []
+
+    async def _execute_task(
+        self, tasks, task_id, parents, context, query_idx=None, on_event=None
+    ):
+        self.events.append(("start", task_id))
+        try:
+            await asyncio.sleep(0.05 if task_id == "slow" else 0.01)
+        except asyncio.CancelledError:
+            self.cancelled.append(task_id)
+            raise
+        if task_id == self.fail:
+            raise RuntimeError(f"{task_id} failed")
+        tasks[task_id]["sql"] = f"SELECT '{task_id}'"
+        tasks[task_id]["result"] = task_id
+        self.events.append(("end", task_id))
+
+
+def test_independent_tasks_run_concurrently():
+    manager = StubTaskManager()
+    tasks = {
+        "final": {"description": "", "depends_on": ["a", "b"]},
+        "a": {"description": ""},
+        "b": {"description": ""},
+    }
+    result = asyncio.run(manager.execute_tasks(tasks, "context"))
+
+    assert result == ("SELECT 'final'", "final")
+    # a and b both start before either finishes, final starts after both
+    assert manager.events[:2] == [("start", "a"), ("start", "b")]
+    assert manager.events[-2:] == [("start", "final"), ("end", "final")]
+
+
+def test_failure_cancels_the_remaining_tasks():
+    manager = StubTaskManager(fail="a")
+    tasks = {
+        "a": {"description": "", "depends_on": []},
+        "slow": {"description": "", "depends_on": []},
+        "final": {"description": "", "depends_on": ["a", "slow"]},
+    }
+    with pytest.raises(RuntimeError):
+        asyncio.run(manager.execute_tasks(tasks, "context"))
+
+    assert manager.cancelled == ["slow"]
+    assert ("start", "final") not in manager.events
@@ -0,0 +1,125 @@
+"""
+Tests for batched and cached token counting and the stored token counts used
+to truncate query context.
+
+Run with: python -m pytest tests/test_token_counting.py
+"""
+
+import os
+import pickle
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import (  # noqa: E402
+    Tokenizer,
+    attach_description_tokens,
+    parse_token_count,
+    truncate_list_by_token_size,
+)
+
+
+class CountingTokenizer:
+    """Splits on whitespace and records which texts were encoded"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, content):
+        self.encoded.append(content)
+        return content.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class BatchTokenizer(CountingTokenizer):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def encode_batch(self, contents):
+        self.batches.append(list(contents))
+        return [content.split() for content in contents]
+
+
+def test_counts_are_cached_by_content():
+    inner = CountingTokenizer()
+    tokenizer = Tokenizer("words", inner)
+
+    assert tokenizer.count_tokens(["a b", "c", "a b"]) == [2, 1, 2]
+    assert tokenizer.count_tokens(["c", "a b", "d e f"]) == [1, 2, 3]
+    # Every distinct text was encoded exactly once
+    assert inner.encoded == ["a b", "c", "d e f"]
+
+
+def test_missing_counts_are_encoded_in_one_batch():
+    inner = BatchTokenizer()
+    tokenizer = Tokenizer("words", inner)
+
+    tokenizer.count_tokens(["a", "b c"])
+    tokenizer.count_tokens(["a", "d", "e f g"])
+    assert inner.batches == [["a", "b c"], ["d", "e f g"]]
+    assert inner.encoded == []
+
+
+def test_cache_is_bounded_and_can_be_disabled():
+    inner = CountingTokenizer()
+    tokenizer = Tokenizer("words", inner, count_cache_size=2)
+    tokenizer.count_tokens(["a"])
+    tokenizer.count_tokens(["b"])
+    tokenizer.count_tokens(["c"])
+    tokenizer.count_tokens(["a"])
+    assert inner.encoded == ["a", "b", "c", "a"]
+    assert len(tokenizer._count_cache) == 2
+
+    inner = CountingTokenizer()
+    tokenizer = Tokenizer("words", inner, count_cache_size=0)
+    tokenizer.count_tokens(["a"])
+    tokenizer.count_tokens(["a"])
+    assert inner.encoded == ["a", "a"]
+
+
+def test_cache_is_not_pickled():
+    tokenizer = Tokenizer("words", CountingTokenizer())
+    tokenizer.count_tokens(["a b"])
+    assert pickle.loads(pickle.dumps(tokenizer))._count_cache == {}
+
+
+def test_description_tokens():
+    tokenizer = Tokenizer("words", CountingTokenizer())
+    data = attach_description_tokens({"description": "one two three"}, tokenizer)
+    assert data["description_tokens"] == 3
+    assert attach_description_tokens({}, tokenizer)["description_tokens"] == 0
+    assert "description_tokens" not in attach_description_tokens(data, None)
+
+
+def test_parse_token_count():
+    assert parse_token_count(3) == 3
+    assert parse_token_count("4") == 4
+    for value in (None, True, -1, "many", 1.5j):
+        assert parse_token_count(value) is None
+
+
+def test_truncation_uses_stored_counts():
+    inner = CountingTokenizer()
+    tokenizer = Tokenizer("words", inner)
+    items = [
+        {"content": "a b c", "tokens": 3},
+        {"content": "d e", "tokens": None},
+        {"content": "f g h i", "tokens": "4"},
+        {"content": "j", "tokens": 1},
+    ]
+
+    kept = truncate_list_by_token_size(
+        items,
+        key=lambda item: item["content"],
+        max_token_size=9,
+        tokenizer=tokenizer,
+        count_key=lambda item: item["tokens"],
+    )
+    assert kept == items[:3]
+    # Only the item without a stored count was tokenized
+    assert inner.encoded == ["d e"]
+
+    assert truncate_list_by_token_size(items, str, 0, tokenizer) == []